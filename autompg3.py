@@ -3,11 +3,479 @@ import os
 import csv
 from collections import namedtuple
 import logging
-import requests
 import argparse
-from collections import defaultdict
+import shlex
+from collections import defaultdict, Counter
+import re
 import sys
-import matplotlib.pyplot as plt
+import time
+import operator
+import io
+import gzip
+import json
+import hashlib
+import heapq
+import itertools
+import contextlib
+import math
+import threading
+import pickle
+import tempfile
+import tracemalloc
+from urllib.parse import urlsplit, parse_qs, quote
+from array import array
+import numpy as np
+
+# requests, matplotlib, asyncio, concurrent.futures and http.server are imported by the code paths that use them (download,
+# plot, fetchShards, parallel_aggregate, serve), so that commands which never touch them start quickly; see bench_autompg3.measureStartup
+
+# Use collections.namedtuple to define the 'Record' class; having nine attributes that correspond to the 9 fields in the data file
+Record = namedtuple('Record', ['mpg', 'cylinders', 'displacement', 'horsepower', 'weight', 'acceleration', 'modelYear', 'origin', 'carName'])
+
+# Dictionary for correcting incorrect car makes; the default alias table of MakeNormalizer
+CORRECT_MAKES = {
+    "chevroelt": "chevrolet",
+    "chevy": "chevrolet",
+    "maxda": "mazda",
+    "mercedes-benz": "mercedes",
+    "toyouta": "toyota",
+    "vokswagen": "volkswagen",
+    "vw": "volkswagen"
+}
+
+# Log a DEBUG line for every AutoMPG object built and every make alias applied; off by default because it dominates load time
+TRACE_RECORDS = False
+
+# Version of the layout of the binary cache (auto-mpg.cache.npz); caches with another version are rebuilt
+CACHE_VERSION = 3
+
+# Version of the layout of the incremental aggregate state (auto-mpg.state.json)
+STATE_VERSION = 1
+
+# Number of bytes before the processed offset whose hash detects a rewritten (rather than appended) data file
+STATE_CHECK_BYTES = 4096
+
+# Mirrors of the raw data file, tried in order, and the SHA-256 hash of its contents (that of the copy in this repository)
+DATA_URLS = ("https://archive.ics.uci.edu/ml/machine-learning-databases/auto-mpg/auto-mpg.data",)
+DATA_SHA256 = "48b830e11feee5572525f8f1691ddb9d38d3d7b7063edcd8fca672c2a5e17d8d"
+
+# Downloads: bytes written at a time, seconds to wait for the server, retries after a dropped connection or a
+# server error, and the delay before the first retry (doubled for every further retry)
+FETCH_CHUNK_SIZE = 1 << 16
+FETCH_TIMEOUT = 30
+FETCH_RETRIES = 3
+FETCH_BACKOFF = 0.5
+
+# Buffer size of output files
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+# Number of rows aggregated at a time, which bounds the temporary memory of aggregate
+AGGREGATE_CHUNK_SIZE = 1 << 20
+
+# Default memory budget of the external sort of print (--external), the estimated memory one row takes while
+# sorting, and the number of rows written to (and read back from) a run file at a time
+EXTERNAL_SORT_BUDGET = 64 << 20
+SPILL_ROW_BYTES = 256
+SPILL_BLOCK_ROWS = 4096
+
+# Columns that each sort order sorts by, most significant first
+SORT_ORDERS = {
+    'default': ('make', 'model', 'year', 'mpg'),
+    'year': ('year', 'make', 'model', 'mpg'),
+    'mpg': ('mpg', 'make', 'model', 'year'),
+}
+
+# Typed storage of each column: (NumPy dtype, array typecode used while parsing). make and model are stored as
+# int32 codes into the make and model dictionaries; a missing horsepower ('?') is stored as NaN
+COLUMN_TYPES = {
+    'mpg': (np.float64, 'd'),
+    'cylinders': (np.int8, 'b'),
+    'displacement': (np.float64, 'd'),
+    'horsepower': (np.float64, 'd'),
+    'weight': (np.float64, 'd'),
+    'acceleration': (np.float64, 'd'),
+    'year': (np.int16, 'h'),
+    'origin': (np.int8, 'b'),
+    'makeCodes': (np.int32, 'i'),
+    'modelCodes': (np.int32, 'i'),
+}
+
+# Columns holding numbers, in the order of the data file
+NUMERIC_COLUMNS = ('mpg', 'cylinders', 'displacement', 'horsepower', 'weight', 'acceleration', 'year', 'origin')
+
+# All columns that can be sorted or grouped on
+COLUMNS = NUMERIC_COLUMNS + ('make', 'model')
+
+# Field of the Record namedtuple that each numeric column is parsed from
+RECORD_FIELDS = {column: ('modelYear' if column == 'year' else column) for column in NUMERIC_COLUMNS}
+
+# Internal column (or columns) that each of COLUMNS is stored in
+STORAGE_COLUMNS = dict({column: column for column in NUMERIC_COLUMNS}, make='makeCodes', model='modelCodes')
+
+# Files of the fixed-width binary form of the dataset written by AutoMPGData.write_binary: one per column, plus the dictionaries
+BINARY_COLUMNS = tuple(COLUMN_TYPES) + ('makes', 'models')
+
+# Columns of the rollup cube of mpg (AutoMPGData.rollup), and the version of its file auto-mpg.cube.npz
+ROLLUP_COLUMNS = ('make', 'year', 'origin', 'cylinders')
+ROLLUP_VERSION = 1
+
+# Columns the dataset can be partitioned on by AutoMPGData.write_partitioned, and the version of its manifest
+PARTITION_COLUMNS = ('year', 'make', 'origin', 'cylinders')
+MANIFEST_VERSION = 1
+
+# Define class ProfileStage; one timed run of a stage of the program
+class ProfileStage:
+    """
+    Description:
+    Context manager that times one run of a stage (e.g. parse or sort) and adds it to the totals of
+    its Profiler: the wall time, the rows handled, the peak RSS of the process and, when the profiler
+    traces memory, the peak of the memory allocated while the stage ran. Code inside the stage sets
+    the rows attribute once it knows how many rows it handled.
+
+    Methods:
+        __init__(self, profiler, name, rows=None):
+            Initializes a run of the named stage.
+
+        __enter__(self):
+            Starts the clock and, when tracing memory, the allocation peak of the stage.
+
+        __exit__(self, *exception):
+            Stops the clock and records the run with the profiler.
+    """
+
+    # Define __init__
+    def __init__(self, profiler, name, rows=None):
+        '''
+        Description:
+        Initializes a run of a stage.
+
+        Arguments:
+        self.
+        profiler (Profiler): the profiler to record the run with.
+        name (str): the name of the stage.
+        rows (int or None): the number of rows the stage handles, if known up front.
+
+        Returns:
+        None.
+        '''
+        self.profiler = profiler
+        self.name = name
+        self.rows = rows
+        return None
+
+    # Define __enter__
+    def __enter__(self):
+        '''
+        Description:
+        Starts the clock. When tracing memory, the peak so far is handed to the enclosing stage before the
+        peak is restarted for this one, so nested stages do not hide the peaks of their parents.
+
+        Arguments:
+        self.
+
+        Returns:
+        self.
+        '''
+        stack = self.profiler._stack()
+        self._tracing = self.profiler.memory and tracemalloc.is_tracing()
+        if self._tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1]._peak = max(stack[-1]._peak, peak)
+            tracemalloc.reset_peak()
+            self._base = self._peak = current
+        stack.append(self)
+        self._started = time.perf_counter()
+        return self
+
+    # Define __exit__
+    def __exit__(self, *exception):
+        '''
+        Description:
+        Stops the clock and records the run; exceptions are not suppressed.
+
+        Arguments:
+        self.
+        *exception: the exception raised inside the stage, if any.
+
+        Returns:
+        bool: False.
+        '''
+        seconds = time.perf_counter() - self._started
+        self.profiler._stack().pop()
+        peakAllocated = max(self._peak, tracemalloc.get_traced_memory()[1]) - self._base if self._tracing else None
+        self.profiler._record(self.name, seconds, self.rows, peakAllocated)
+        return False
+
+# Define class NullStage; the stage handed out by a disabled Profiler
+class NullStage:
+    """
+    Description:
+    Stage that records nothing. A disabled Profiler returns one shared NullStage, so instrumented code
+    pays a method call and an attribute check per stage, and nothing per row.
+
+    Methods:
+        __enter__(self):
+            Returns self.
+
+        __exit__(self, *exception):
+            Does nothing.
+    """
+
+    # Rows set by the instrumented code are ignored
+    rows = None
+
+    # Define __enter__
+    def __enter__(self):
+        '''
+        Description:
+        Returns the stage itself, so that code can set its rows attribute.
+
+        Arguments:
+        self.
+
+        Returns:
+        self.
+        '''
+        return self
+
+    # Define __exit__
+    def __exit__(self, *exception):
+        '''
+        Description:
+        Does nothing; exceptions are not suppressed.
+
+        Arguments:
+        self.
+        *exception: the exception raised inside the stage, if any.
+
+        Returns:
+        bool: False.
+        '''
+        return False
+
+# Define class Profiler; wall time, rows/sec and peak memory per stage of a run, and counters of events
+class Profiler:
+    """
+    Description:
+    Collects the timings of the stages of a run (fetch, clean, parse, normalize, construct, sort,
+    aggregate, write, plot, ...) and counters of events such as cache hits. The module keeps one
+    Profiler, PROFILER, which is disabled unless --profile is used; the code paths are instrumented
+    with "with PROFILER.stage(name):" and PROFILER.count(name), which cost next to nothing when it is
+    disabled. A stage that runs inside another is counted in both.
+
+    Methods:
+        __init__(self):
+            Initializes a disabled profiler.
+
+        enable(self, memory=False):
+            Clears the totals and starts recording.
+
+        disable(self):
+            Stops recording.
+
+        stage(self, name, rows=None):
+            Returns the context manager that times one run of a stage.
+
+        count(self, name, amount=1):
+            Adds to a counter.
+
+        report(self):
+            Returns the totals of the stages and the counters.
+
+        log_summary(self):
+            Logs one line per stage.
+    """
+
+    # Define __init__
+    def __init__(self):
+        '''
+        Description:
+        Initializes a disabled profiler.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.
+        '''
+        self.enabled = False
+        self.memory = False
+        self.stages = {}
+        self.counters = Counter()
+        self._started = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        return None
+
+    # Define enable
+    def enable(self, memory=False):
+        '''
+        Description:
+        Clears the totals and starts recording. Tracing memory (tracemalloc) gives the peak allocation of
+        every stage but slows the Python-level stages down several times.
+
+        Arguments:
+        self.
+        memory (bool): also trace the memory allocated by each stage.
+
+        Returns:
+        None.
+        '''
+        self.stages, self.counters = {}, Counter()
+        self.enabled, self.memory = True, memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self._started = time.perf_counter()
+        return None
+
+    # Define disable
+    def disable(self):
+        '''
+        Description:
+        Stops recording, and stops tracing memory if enable started it; the totals are kept.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.
+        '''
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.enabled = self.memory = False
+        return None
+
+    # Define stage
+    def stage(self, name, rows=None):
+        '''
+        Description:
+        Returns the context manager that times one run of a stage; the shared NullStage when disabled.
+
+        Arguments:
+        self.
+        name (str): the name of the stage.
+        rows (int or None): the number of rows the stage handles, if known up front.
+
+        Returns:
+        ProfileStage or NullStage object.
+        '''
+        if not self.enabled:
+            return NULL_STAGE
+        return ProfileStage(self, name, rows)
+
+    # Define count
+    def count(self, name, amount=1):
+        '''
+        Description:
+        Adds to a counter; does nothing when disabled.
+
+        Arguments:
+        self.
+        name (str): the name of the counter.
+        amount (int): the amount to add.
+
+        Returns:
+        None.
+        '''
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += amount
+        return None
+
+    # Define _stack; the stages open in the current thread, innermost last
+    def _stack(self):
+        '''
+        Description:
+        Returns the list of the stages open in the current thread (the server and fetchShards run stages in threads).
+
+        Arguments:
+        self.
+
+        Returns:
+        list of ProfileStage objects.
+        '''
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    # Define _record; add one run of a stage to the totals
+    def _record(self, name, seconds, rows, peakAllocated):
+        '''
+        Description:
+        Adds one run of a stage to its totals, together with the peak RSS of the process so far.
+
+        Arguments:
+        self.
+        name (str): the name of the stage.
+        seconds (float): the wall time of the run.
+        rows (int or None): the rows the run handled.
+        peakAllocated (int or None): the peak bytes allocated during the run, if memory is traced.
+
+        Returns:
+        None.
+        '''
+        # Peak RSS is only available on Unix; ru_maxrss is in KiB on Linux
+        try:
+            import resource
+            peakRss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        except ImportError:
+            peakRss = None
+
+        with self._lock:
+            totals = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'rows': None, 'peakRssBytes': None, 'peakAllocatedBytes': None})
+            totals['calls'] += 1
+            totals['seconds'] += seconds
+            if rows is not None:
+                totals['rows'] = (totals['rows'] or 0) + rows
+            totals['peakRssBytes'] = peakRss
+            if peakAllocated is not None:
+                totals['peakAllocatedBytes'] = max(totals['peakAllocatedBytes'] or 0, peakAllocated)
+        return None
+
+    # Define report
+    def report(self):
+        '''
+        Description:
+        Returns the totals as plain values, ready for json.dump: the wall time since enable, and per stage
+        the number of runs, seconds, rows, rows per second, peak RSS and peak allocation (None when unknown).
+
+        Arguments:
+        self.
+
+        Returns:
+        dictionary with the keys 'seconds', 'stages' and 'counters'.
+        '''
+        with self._lock:
+            stages = {name: dict(totals, rowsPerSecond=totals['rows'] / totals['seconds'] if totals['rows'] is not None and totals['seconds'] else None)
+                      for name, totals in self.stages.items()}
+            counters = dict(self.counters)
+        return {'seconds': time.perf_counter() - self._started if self._started is not None else None, 'stages': stages, 'counters': counters}
+
+    # Define log_summary
+    def log_summary(self):
+        '''
+        Description:
+        Logs one line per stage and one line of counters at INFO level.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.
+        '''
+        logger = logging.getLogger()
+        report = self.report()
+        for name, totals in report['stages'].items():
+            rate = f", {totals['rowsPerSecond']:.0f} rows/s" if totals['rowsPerSecond'] else ""
+            logger.info(f"Stage {name}: {totals['calls']} call(s), {totals['seconds']:.3f} s{rate}")
+        if report['counters']:
+            logger.info("Counters: " + ', '.join(f"{name}={count}" for name, count in sorted(report['counters'].items())))
+        return None
+
+# The shared stage of disabled profilers, and the profiler of the program (enabled by --profile)
+NULL_STAGE = NullStage()
+PROFILER = Profiler()
 
 # Implement a class that represents the attributes that are available for each record in the dataset
 class AutoMPG:
@@ -15,7 +483,9 @@ class AutoMPG:
     Description: 
     Initializes a car record from a dataset; makes objects of the class AutoMPG printable
     using __str__ and __repr__; makes objects of the class AutoMPG comparable using __eq__ 
-    and __lt__; makes objects of the class AutoMPG hashable using __hash__.
+    and __lt__; makes objects of the class AutoMPG hashable using __hash__. Objects are
+    immutable and use __slots__ instead of a per-instance __dict__; the comparison key and
+    the hash are computed once, when the object is created.
 
     Arguments:
         make (str): The car's make.
@@ -41,8 +511,17 @@ class AutoMPG:
 
         __hash__(self):
             Returns a hash value based on the object's attributes (neccessary becasue of __eq__)
+
+        __setattr__(self, name, value), __delattr__(self, name):
+            Refuse to change the object after it is created.
+
+        __reduce__(self):
+            Lets objects be pickled despite being immutable.
     """
 
+    # Store the attributes in slots; _key is the comparison tuple and _hash its hash
+    __slots__ = ('make', 'model', 'year', 'mpg', '_key', '_hash')
+
     # Define __init__ and initialize specified variables: make, model, year, mpg
     def __init__(self, make, model, year, mpg):
         '''
@@ -57,14 +536,20 @@ class AutoMPG:
 
         Returns: None
         '''
-        self.make = str(make)       # first token of "car name" field in dataset
-        self.model = str(model)     # all other tokens in the "car name" field of the datset except the first
-        self.year = int(year)       # four digit-year year that corresponds to the "model year" field of the dataset
-        self.mpg = float(mpg)       # miles per gallon, corresponding to the mpg field of the dataset
+        # The object is immutable, so the attributes are set through object.__setattr__
+        key = (str(make), str(model), int(year), float(mpg))
+        object.__setattr__(self, 'make', key[0])     # first token of "car name" field in dataset
+        object.__setattr__(self, 'model', key[1])    # all other tokens in the "car name" field of the datset except the first
+        object.__setattr__(self, 'year', key[2])     # four digit-year year that corresponds to the "model year" field of the dataset
+        object.__setattr__(self, 'mpg', key[3])      # miles per gallon, corresponding to the mpg field of the dataset
 
-        # Call the logger
-        logger = logging.getLogger()
-        logger.debug(f"AutoMPG Object Created: Make = {make}, Model = {model}, Year = {year}, MPG = {mpg} ")
+        # Precompute the comparison key and the hash used by __eq__, __lt__ and __hash__
+        object.__setattr__(self, '_key', key)
+        object.__setattr__(self, '_hash', hash(key))
+
+        # Log every object only when per-record tracing is turned on (--trace)
+        if TRACE_RECORDS:
+            logging.getLogger().debug(f"AutoMPG Object Created: Make = {make}, Model = {model}, Year = {year}, MPG = {mpg} ")
 
         return None
     
@@ -112,8 +597,8 @@ class AutoMPG:
         '''
         # Make sure objects compared are of the smae type
         if type(other) == type(self):
-            # Compare the objects
-            return (self.make, self.model, self.year, self.mpg) == (other.make, other.model, other.year, other.mpg)
+            # Compare the precomputed keys
+            return self._key == other._key
         else:
             # If types are not comparable, return NotImplemented
             return NotImplemented
@@ -133,8 +618,8 @@ class AutoMPG:
         '''
         # Make sure objects compared are of the same type
         if type(other) == type(self):
-            # Compare the objects in order given
-            return (self.make, self.model, self.year, self.mpg) < (other.make, other.model, other.year, other.mpg)
+            # Compare the precomputed keys (make, model, year, mpg) in order
+            return self._key < other._key
         else:
             # If types are not comparable, return NotImplemented
             return NotImplemented
@@ -151,322 +636,3602 @@ class AutoMPG:
         Returns:
         Hash value based on the object's attributes (neccessary becasue of __eq__)
         '''
-        # Since there are multiple values, I returned the tuple with the hash of all values
-        return hash((self.make, self.model, self.year, self.mpg))
-
-# Define AutoMPGData class with single attribute, 'data', which is a list of AutoMPG objects
-class AutoMPGData:
-    """
-    Description:
-    Loads and cleans the AutoMPG dataset, and initalizes an AutoMPGData object
-
-    Attributes:
-        data (list): A list of AutoMPG objects representing car records.
-
-    Methods:
-        __init__(self):
-            Initializes an AutoMPGData object using a cleaned dataset.
-
-        __iter__(self):
-            Makes the AutoMPGData class iterable by returning an iterator over the data list.
+        # The hash of the tuple of all values, computed once in __init__
+        return self._hash
 
-        _load_data(self):
-            Loads data from a cleaned file (auto-mpg.clean.txt).
-
-        _clean_data(self):
-            Reads the original data file (auto-mpg.data.txt) and converts tab characters to spaces.
-            Cleans line by line to create a cleaned file (auto-mpg.clean.txt).
-    """
-    
-    # Define __init__ constructor that takes no arguments, but calls the _load_data method
-    def __init__(self):
+    # Define __setattr__; objects cannot be changed after they are created
+    def __setattr__(self, name, value):
         '''
         Description:
-        Initializes an AutoMPGData object using a cleaned dataset.
+        Refuses to change the object after it is created (the cached key and hash would go stale).
 
         Arguments:
         self.
+        name (str): the attribute being set.
+        value: the value being set.
 
         Returns:
-        None.
+        None; always raises AttributeError.
         '''
-        # Initialize the data list as an instance variable (make the single 'data' attribute mentioned above)
-        self.data = []
-        # Call _load_data to fill the data attribute
-        self._load_data()
-        return None
-    
-    # Define __iter__ method to make class iterable; should return an iterator over the data list
-    def __iter__(self):
+        raise AttributeError(f"AutoMPG objects are immutable; cannot set {name}")
+
+    # Define __delattr__; objects cannot be changed after they are created
+    def __delattr__(self, name):
         '''
         Description:
-        Makes the AutoMPGData class iterable by returning an iterator over the data list.
+        Refuses to delete attributes of the object.
 
         Arguments:
         self.
+        name (str): the attribute being deleted.
 
         Returns:
-        An iterator over the data list.
+        None; always raises AttributeError.
         '''
-        return iter(self.data)
+        raise AttributeError(f"AutoMPG objects are immutable; cannot delete {name}")
 
-    # Define _load_data method; load the cleaned file (auto-mpg.clean.txt) and instantiate objects and add them to the data attribute
-    def _load_data(self):
+    # Define __reduce__; rebuild the object through __init__ when unpickling
+    def __reduce__(self):
         '''
         Description:
-        Loads data from a cleaned file (auto-mpg.clean.txt).
+        Lets objects be pickled: they are rebuilt through __init__ instead of by setting their slots.
 
         Arguments:
         self.
 
         Returns:
-        None.
+        tuple (class, constructor arguments).
         '''
-        # Call logger
-        logger = logging.getLogger()
-        logger.info("Starting to load data...")
-        
-        # Define the file paths
-        cleanFilePath = "auto-mpg.clean.txt"
-        dirtyFilePath = "auto-mpg.data.txt"
+        return (AutoMPG, self._key)
 
-        # If dirty pathd doesn't exist, get data from the internet
-        if not os.path.exists(dirtyFilePath):
-            logger.info("Getting data")
-            self._get_data()
-            logger.info("Got data from url: https://archive.ics.uci.edu/ml/machine-learning-databases/auto-mpg/auto-mpg.data")
-
-        # If clean path doesn't exist, clean the data
-        if not os.path.exists(cleanFilePath):
-            self._clean_data()
-            logger.info(f"Cleaned {dirtyFilePath}, creating {cleanFilePath}")
-
-        # If path exists, parse the data
-        with open(cleanFilePath, newline='') as file:
-            # Use skipinitialspace to ignore 'multiple sequential delimiters'; gives a list of the 9 columns
-            # Use quotechar to handle strings with spaces
-            reader = csv.reader(file, delimiter=' ', skipinitialspace=True, quotechar='"')
-
-            # Use collections.namedtuple to defined 'Record' class; having nine attributes that correspond to the 9 fields in the same file
-            Record = namedtuple('Record', ['mpg', 'cylinders', 'displacement', 'horsepower', 'weight', 'acceleration', 'modelYear', 'origin', 'carName'])
-
-            # Use tuple packing/unpacking, assign the list returned by the csv module for a row to create a Record object
-            for row in reader:
-                record = Record(*row)
-
-                # Split the car name into a list of strings
-                carName = record.carName.split()
-
-                # Create variables for make and model
-                make = carName[0]               # The first string is the make
-                model = ' '.join(carName[1:])   # All other strings in the list are the model
-
-                # Create dictionary for correcting incorrect car makes
-                correctMakes = {
-                    "chevroelt": "chevrolet",
-                    "chevy": "chevrolet",
-                    "maxda": "mazda",
-                    "mercedes-benz": "mercedes",
-                    "toyouta": "toyota",
-                    "vokswagen": "volkswagen",
-                    "vw": "volkswagen"
-                }
-
-                # Correct the typos in makes
-                if make in correctMakes:
-                    logger.info(f"Cleaning typo: {make}")
-                    make = correctMakes[make]
-                    logger.info(f"Typo cleaned to: {make}")
-            
-                # Use the attributes of the Record object to pass the appropriate values to the constructor for AutoMPG.
-                self.data.append(AutoMPG(make, model, record.modelYear, record.mpg))
+# Use collections.namedtuple to define the 'Predicate' class; a filter such as year >= 76 on one column
+Predicate = namedtuple('Predicate', ['column', 'op', 'value'])
 
-        # End logger
-        logger.info("Finished loading data")
+# Comparison operators that predicates can use
+PREDICATE_OPERATORS = {
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
 
-        return None
+# Define Column class; lets predicates be written as Python comparisons, e.g. col('year') >= 76
+class Column:
+    """
+    Description:
+    Names a column of the dataset so that comparing it with a value builds a Predicate,
+    e.g. col('year') >= 76 or col('make') == 'ford'.
 
-    # Define _clean_data method to read original data file (auto-mpg.data.txt) line by line and use expandtabs method to convert TAB character to spaces
-    def _clean_data(self):
+    Arguments:
+        name (str): one of COLUMNS.
+
+    Methods:
+        __eq__, __ne__, __lt__, __le__, __gt__, __ge__(self, value):
+            Return the Predicate comparing the column with value.
+    """
+
+    # Define __init__; store the column name
+    def __init__(self, name):
         '''
         Description:
-        Reads the original data file (auto-mpg.data.txt) and converts tab characters to spaces.
-        Cleans line by line to create a cleaned file (auto-mpg.clean.txt).
+        Initializes a Column.
 
         Arguments:
-        self.
+        name (str): one of COLUMNS.
 
         Returns:
         None.
         '''
+        if name not in COLUMNS:
+            raise ValueError(f"Unknown column: {name}")
+        self.name = name
+        return None
 
-        # Call logger
-        logger = logging.getLogger()
-        logger.info("Cleaning data...")
+    # Define the comparisons; each one builds a Predicate instead of comparing
+    def __eq__(self, value):
+        return Predicate(self.name, '==', value)
 
-        # Define an input and output path (was having trouble finding the files)
-        inPath = 'auto-mpg.data.txt'
-        outPath = 'auto-mpg.clean.txt'
+    def __ne__(self, value):
+        return Predicate(self.name, '!=', value)
 
-        # Read auto-mpg.data.txt line by line, write auto-mpg.clean.txt with expanded tabs
-        with open(inPath, 'r') as inFile, open(outPath, 'w') as outFile:
-            # Read the line in the auto-mpg-data.txt, clean it using expand tabs, write the cleaned line to auto-mpg.clean.txt
-            for line in inFile:
-                cleanedLine = str(line).expandtabs()
-                outFile.write(cleanedLine)
+    def __lt__(self, value):
+        return Predicate(self.name, '<', value)
+
+    def __le__(self, value):
+        return Predicate(self.name, '<=', value)
+
+    def __gt__(self, value):
+        return Predicate(self.name, '>', value)
+
+    def __ge__(self, value):
+        return Predicate(self.name, '>=', value)
+
+    # Columns are not meant to be hashed (__eq__ does not compare)
+    __hash__ = None
+
+# Define col; shorthand for Column
+def col(name):
+    '''
+    Description:
+    Returns a Column, so that predicates can be written as col('year') >= 76.
+
+    Arguments:
+    name (str): one of COLUMNS.
+
+    Returns:
+    Column object.
+    '''
+    return Column(name)
+
+# Define parsePredicate; turn text such as "year>=76" or "make==ford" into a Predicate
+def parsePredicate(predicate):
+    '''
+    Description:
+    Turns a predicate written as text, such as "year>=76", "origin==1" or "make=ford", into a
+    Predicate. Predicate objects are returned unchanged. Values of make and model are strings
+    (surrounding quotes are removed); values of every other column are numbers.
+
+    Arguments:
+    predicate (str or Predicate): the predicate.
+
+    Returns:
+    Predicate object.
+    '''
+    if isinstance(predicate, Predicate):
+        if predicate.column not in COLUMNS or predicate.op not in PREDICATE_OPERATORS:
+            raise ValueError(f"Invalid predicate: {predicate}")
+        return predicate
+
+    # Split the text into column, operator and value
+    match = re.fullmatch(r"\s*(\w+)\s*(==|!=|<=|>=|<|>|=)\s*(.+?)\s*", predicate)
+    if not match or match.group(1) not in COLUMNS:
+        raise ValueError(f"Invalid predicate: {predicate!r}; expected <column><operator><value>, e.g. year>=76")
+    column, op, value = match.groups()
+
+    # Type the value like the column
+    if column in ('make', 'model'):
+        value = value.strip('\'"')
+    else:
+        value = float(value)
+    return Predicate(column, '==' if op == '=' else op, value)
+
+# Define MakeNormalizer class; the stage that maps raw makes onto canonical makes
+class MakeNormalizer:
+    """
+    Description:
+    The make-normalization stage of loading. Makes are dictionary-encoded while the data file is
+    parsed, with the makes exactly as written; this stage then maps each distinct raw make through
+    an alias table (e.g. "vw" -> "volkswagen") and recodes the rows, so the table is looked up once
+    per distinct make rather than once per row. The number of rows each alias applied to is counted.
+    Any object with the same methods can be passed to AutoMPGData as its normalizer.
+
+    Arguments:
+        aliases (dict or None): canonical make per alias; CORRECT_MAKES if None.
+
+    Methods:
+        from_file(cls, path):
+            Reads the alias table from a file.
+
+        normalize(self, make):
+            Returns the canonical make of a single raw make.
+
+        apply(self, makes, codes):
+            Maps a make dictionary and the codes of its rows onto canonical makes.
+
+        fingerprint(self):
+            Returns a hash of the alias table.
+    """
+
+    # Define __init__; store the alias table
+    def __init__(self, aliases=None):
+        '''
+        Description:
+        Initializes a MakeNormalizer.
+
+        Arguments:
+        self.
+        aliases (dict or None): canonical make per alias; CORRECT_MAKES if None.
+
+        Returns:
+        None.
+        '''
+        self.aliases = dict(CORRECT_MAKES if aliases is None else aliases)
+        return None
+
+    # Define from_file; read an alias table
+    @classmethod
+    def from_file(cls, path):
+        '''
+        Description:
+        Reads an alias table with one "alias,make" pair per line; blank lines and lines starting
+        with # are skipped. The aliases replace CORRECT_MAKES rather than adding to it.
+
+        Arguments:
+        cls.
+        path (str): the alias file.
+
+        Returns:
+        MakeNormalizer object.
+        '''
+        aliases = {}
+        with open(path, newline='') as file:
+            for lineNumber, row in enumerate(csv.reader(file), 1):
+                if not row or not ''.join(row).strip() or row[0].lstrip().startswith('#'):
+                    continue
+                if len(row) != 2:
+                    raise ValueError(f"{path}, line {lineNumber}: expected alias,make")
+                aliases[row[0].strip()] = row[1].strip()
+
+        logging.getLogger().info(f"Read {len(aliases)} make aliases from {path}")
+        return cls(aliases)
+
+    # Define normalize; the canonical make of a single make
+    def normalize(self, make):
+        '''
+        Description:
+        Returns the canonical make of a single raw make (the make itself if it has no alias).
+
+        Arguments:
+        self.
+        make (str): the raw make.
+
+        Returns:
+        str: the canonical make.
+        '''
+        return self.aliases.get(make, make)
+
+    # Define apply; map a make dictionary and its codes onto canonical makes
+    def apply(self, makes, codes):
+        '''
+        Description:
+        Maps a dictionary of raw makes onto canonical makes and recodes the rows in one vectorized step.
+        Aliases of the same make (and the make itself) share one code; canonical makes keep the order
+        in which their first raw make appears in the dictionary.
+
+        Arguments:
+        self.
+        makes (list): the raw makes, indexed by code.
+        codes (numpy.ndarray): the raw make code of every row.
+
+        Returns:
+        tuple (makes, codes, hits): the canonical makes, the canonical code of every row, and a Counter
+        of the rows each alias applied to.
+        '''
+        # Look up every distinct raw make once, giving each canonical make the next free code
+        index = {}
+        remap = np.fromiter((index.setdefault(self.normalize(make), len(index)) for make in makes), dtype=np.int32, count=len(makes))
+
+        # Count the rows of each aliased make from the codes instead of row by row
+        rows = np.bincount(codes, minlength=len(makes)).tolist() if len(makes) else []
+        hits = Counter({make: count for make, count in zip(makes, rows) if count and make in self.aliases})
+        return list(index), remap[codes], hits
+
+    # Define fingerprint; a hash of the alias table
+    def fingerprint(self):
+        '''
+        Description:
+        Returns a hash of the alias table, so that results normalized with another table can be recognized.
+
+        Arguments:
+        self.
+
+        Returns:
+        str: the hex digest.
+        '''
+        return hashlib.sha256(json.dumps(sorted(self.aliases.items())).encode('utf-8')).hexdigest()
+
+# Define AutoMPGView class; a read-only, list-like view over the columns of an AutoMPGData object
+class AutoMPGView:
+    """
+    Description:
+    A read-only sequence of AutoMPG objects backed by the columns of an AutoMPGData object.
+    AutoMPG objects are only built when a row is indexed or iterated over, so the dataset itself
+    never holds one object per row.
+
+    Arguments:
+        dataset (AutoMPGData): The dataset whose columns back the view.
+        order (numpy.ndarray or None): Row indexes in the order they should be returned; None for file order.
+
+    Methods:
+        __len__(self):
+            Returns the number of rows in the view.
+
+        __getitem__(self, index):
+            Returns the AutoMPG object at a position, or a new view for a slice.
+
+        __iter__(self):
+            Lazily yields AutoMPG objects in the order of the view.
+
+        iter_chunks(self):
+            Yields the rows as lists of plain tuples, a chunk at a time, for bulk output.
+    """
+
+    # Number of rows converted from the columns at a time while iterating
+    CHUNK_SIZE = 65536
+
+    # Define __init__; store the dataset and the row order
+    def __init__(self, dataset, order=None):
+        '''
+        Description:
+        Initializes an AutoMPGView over the columns of dataset.
+
+        Arguments:
+        dataset (AutoMPGData): The dataset whose columns back the view.
+        order (numpy.ndarray or None): Row indexes in the order they should be returned; None for file order.
+
+        Returns:
+        None.
+        '''
+        self._dataset = dataset
+        self._order = order
+        return None
+
+    # Define __len__
+    def __len__(self):
+        '''
+        Description:
+        Returns the number of rows in the view.
+
+        Arguments:
+        self.
+
+        Returns:
+        int: the number of rows in the view.
+        '''
+        if self._order is None:
+            return len(self._dataset)
+        return len(self._order)
+
+    # Define __getitem__; build a single AutoMPG object, or a narrower view for a slice
+    def __getitem__(self, index):
+        '''
+        Description:
+        Returns the AutoMPG object at a position, or a new view for a slice.
+
+        Arguments:
+        self.
+        index (int or slice): the position(s) to return.
+
+        Returns:
+        AutoMPG for an int index, AutoMPGView for a slice.
+        '''
+        # Resolve the order into explicit row indexes for slicing
+        if isinstance(index, slice):
+            rows = np.arange(len(self)) if self._order is None else self._order
+            return AutoMPGView(self._dataset, rows[index])
+
+        # Map the position onto a row of the columns
+        row = range(len(self))[index]
+        if self._order is not None:
+            row = int(self._order[row])
+        return self._dataset._row(row)
+
+    # Define __iter__; convert the columns chunk by chunk instead of all at once
+    def __iter__(self):
+        '''
+        Description:
+        Lazily yields AutoMPG objects in the order of the view.
+
+        Arguments:
+        self.
+
+        Returns:
+        A generator of AutoMPG objects.
+        '''
+        for chunk in self.iter_chunks():
+            for make, model, year, mpg in chunk:
+                yield AutoMPG(make, model, year, mpg)
+
+    # Define iter_chunks; the rows of the view as plain tuples, a chunk at a time
+    def iter_chunks(self):
+        '''
+        Description:
+        Yields the rows of the view in order as lists of (make, model, year, mpg) tuples of plain
+        Python values, CHUNK_SIZE rows at a time, without building AutoMPG objects. Used for bulk output.
+
+        Arguments:
+        self.
+
+        Returns:
+        A generator of lists of tuples.
+        '''
+        dataset = self._dataset
+        columns = dataset._columns
+        makes, models = dataset._makes, dataset._models
+
+        for start in range(0, len(self), self.CHUNK_SIZE):
+            # Pick out the rows of this chunk from each column
+            if self._order is None:
+                rows = slice(start, start + self.CHUNK_SIZE)
+            else:
+                rows = self._order[start:start + self.CHUNK_SIZE]
+
+            # Convert to Python values once per chunk; decode make and model through the dictionaries
+            yield list(zip([makes[code] for code in columns['makeCodes'][rows].tolist()],
+                           [models[code] for code in columns['modelCodes'][rows].tolist()],
+                           columns['year'][rows].tolist(), columns['mpg'][rows].tolist()))
+
+# Define AutoMPGData class; stores the dataset column by column and exposes the rows as AutoMPG objects
+class AutoMPGData:
+    """
+    Description:
+    Loads and cleans the AutoMPG dataset, and initalizes an AutoMPGData object. The records are
+    held in columns: typed NumPy arrays for the eight numeric fields (see COLUMN_TYPES), and
+    dictionary-encoded integer codes for make and model. AutoMPG objects are only built when
+    the data is read.
+
+    Attributes:
+        data (AutoMPGView): A read-only sequence of AutoMPG objects representing car records, in the current sort order.
+
+    Methods:
+        __init__(self, dataPath='auto-mpg.data.txt', load=True, cache=True, where=(), normalizer=None):
+            Initializes an AutoMPGData object from the raw dataset, keeping only the rows that match where.
+
+        __iter__(self):
+            Makes the AutoMPGData class iterable by returning an iterator over the data.
+
+        __len__(self):
+            Returns the number of records in the dataset.
+
+        iter_records(self, start=0, end=None):
+            Streams the raw data file (auto-mpg.data.txt) one Record at a time, in a single pass.
+
+        stream_aggregate(self, key, start=0, end=None, column='mpg'):
+            Computes the same statistics as aggregate straight from the record stream, in constant memory.
+
+        incremental_aggregate(self, key, column='mpg'):
+            Computes the same statistics as stream_aggregate, parsing only the rows appended since the last call.
+
+        parallel_aggregate(self, key, workers, column='mpg'):
+            Computes the same statistics as stream_aggregate over byte ranges of the data file in worker processes.
+
+        _load_data(self):
+            Loads data from the raw data file (auto-mpg.data.txt) into the columns, through the binary cache.
+
+        write_binary(self, directory):
+            Writes the columns to a directory in a fixed-width binary form that can be memory-mapped.
+
+        column(self, name):
+            Returns one column of the data (any of the nine fields) in file order.
+
+        sort_by(self, *columns):
+            Sorts the data by any columns.
+
+        external_sort(self, sortOrder='default', memoryBudget=EXTERNAL_SORT_BUDGET, directory=None):
+            Yields the rows of the data file in a sort order, spilling sorted runs to disk to bound memory.
+
+        aggregate(self, key, column='mpg'):
+            Groups the data on a column and computes count, sum, mean, min, max and variance of another.
+
+        mpg_by_year(self, stream=False, workers=1, incremental=False, rollup=False), mpg_by_make(...):
+            Return the average mpg per year or per make.
+
+        rollup(self):
+            Returns the RollupCube of mpg over make, year, origin and cylinders, kept in auto-mpg.cube.npz.
+
+        top_k(self, key, k, by=None, largest=True, stream=False):
+            Returns the k cars with the highest (or lowest) values of a column, without sorting the data.
+
+        quantiles(self, column, qs, by=None, stream=False):
+            Returns quantiles of a column, exactly from the columns or approximately while streaming.
+
+        where(self, *predicates), group_by(self, keys):
+            Start an AutoMPGQuery that filters, groups and aggregates the loaded rows.
+
+        ordered(self, sortOrder='default'):
+            Returns a view of the data in a sort order without changing the order of the dataset.
+
+        from_binary(cls, directory, where=()):
+            Opens a dataset written by write_binary through memory maps, without loading it into memory.
+
+        write_arrow(self, path):
+            Writes the columns to an Arrow IPC (Feather) or Parquet file.
+
+        from_arrow(cls, path, columns=None, where=()):
+            Reads a file written by write_arrow, optionally only some of its columns.
+
+        write_partitioned(self, directory, by=('year',)):
+            Writes the columns to one directory per partition, with a manifest of per-partition mpg statistics.
+
+        from_partitioned(cls, directory, columns=None, where=(), load=True):
+            Reads a directory written by write_partitioned, skipping the partitions where cannot match.
+
+        _load_cache(self):
+            Fills the columns from the binary cache (auto-mpg.cache.npz) if it is still up to date.
+
+        _write_cache(self):
+            Writes the columns to the binary cache (auto-mpg.cache.npz).
+
+        _clean_data(self):
+            Reads the original data file (auto-mpg.data.txt) and converts tab characters to spaces.
+            Cleans line by line to create a cleaned file (auto-mpg.clean.txt).
+    """
+
+    # Define __init__ constructor; calls the _load_data method unless only streaming is wanted
+    def __init__(self, dataPath='auto-mpg.data.txt', load=True, cache=True, where=(), normalizer=None):
+        '''
+        Description:
+        Initializes an AutoMPGData object from the raw dataset.
+
+        Arguments:
+        self.
+        dataPath (str): path of the raw data file; downloaded if it does not exist.
+        load (bool): load the data into the columns; pass False to only use the streaming methods.
+        cache (bool): read and write the binary cache of the parsed columns next to the data file.
+        where (iterable): predicates (Predicate objects or text such as "year>=76") that rows must all
+        match to be kept; they are checked while the file is parsed, so other rows are never stored.
+        normalizer (MakeNormalizer or None): the make-normalization stage; MakeNormalizer() (the
+        CORRECT_MAKES aliases) if None.
+
+        Returns:
+        None.
+        '''
+        # Path of the raw data file, whether the parsed columns are cached next to it, the filters pushed into the loader,
+        # and the stage that maps raw makes onto canonical makes
+        self.dataPath = dataPath
+        self.cache = cache
+        self._where = tuple(parsePredicate(predicate) for predicate in where)
+        self.normalizer = MakeNormalizer() if normalizer is None else normalizer
+
+        # Initialize the columns; make and model are stored as codes into the _makes and _models lists
+        self._columns = {column: np.empty(0, dtype=dtype) for column, (dtype, _) in COLUMN_TYPES.items()}
+        self._makes = []
+        self._models = []
+
+        # Row order set by the sort_by_* methods; None keeps the order of the file
+        self._order = None
+
+        # Sort indexes already computed, keyed by the tuple of sort columns
+        self._sortIndexes = {}
+
+        # Aggregates already computed, keyed by the (key, column) pair
+        self._aggregates = {}
+
+        # Manifest of the partitions read by from_partitioned (only those the filters can match); None otherwise
+        self._manifest = None
+
+        # Number of rows each make alias applied to during the last load or pass over the data file
+        self._corrections = Counter()
+
+        # Call _load_data to fill the columns
+        if load:
+            self._load_data()
+        return None
+
+    # Define data property; a view over the columns in the current sort order
+    @property
+    def data(self):
+        '''
+        Description:
+        Returns a read-only, list-like view of AutoMPG objects in the current sort order.
+
+        Arguments:
+        self.
+
+        Returns:
+        AutoMPGView over the dataset.
+        '''
+        return AutoMPGView(self, self._order)
+
+    # Define __iter__ method to make class iterable; should return an iterator over the data
+    def __iter__(self):
+        '''
+        Description:
+        Makes the AutoMPGData class iterable by returning an iterator over the data.
+
+        Arguments:
+        self.
+
+        Returns:
+        An iterator over the data.
+        '''
+        return iter(self.data)
+
+    # Define __len__
+    def __len__(self):
+        '''
+        Description:
+        Returns the number of records in the dataset.
+
+        Arguments:
+        self.
+
+        Returns:
+        int: the number of records.
+        '''
+        # Datasets read with a column projection may not hold every column; all columns have one value per row
+        return len(next(iter(self._columns.values())))
+
+    # Define _row; build the AutoMPG object for a single row of the columns
+    def _row(self, row):
+        '''
+        Description:
+        Builds the AutoMPG object stored at a row of the columns.
+
+        Arguments:
+        self.
+        row (int): the row index in file order.
+
+        Returns:
+        AutoMPG object for the row.
+        '''
+        columns = self._columns
+        return AutoMPG(self._makes[columns['makeCodes'][row]], self._models[columns['modelCodes'][row]],
+                       int(columns['year'][row]), float(columns['mpg'][row]))
+
+    # Define column; read a whole column
+    def column(self, name):
+        '''
+        Description:
+        Returns one column of the data in file order. Numeric columns are returned as read-only NumPy
+        arrays (missing horsepower values are NaN); make and model are decoded into string arrays.
+
+        Arguments:
+        self.
+        name (str): one of COLUMNS.
+
+        Returns:
+        numpy.ndarray with one value per row.
+        '''
+        if name == 'make':
+            return np.array(self._makes, dtype=str)[self._columns['makeCodes']]
+        if name == 'model':
+            return np.array(self._models, dtype=str)[self._columns['modelCodes']]
+        if name not in NUMERIC_COLUMNS:
+            raise ValueError(f"Unknown column: {name}")
+        if name not in self._columns:
+            raise ValueError(f"Column was not read: {name}")
+
+        values = self._columns[name].view()
+        values.flags.writeable = False
+        return values
+
+    # Define _ranks; turn dictionary codes into ranks that sort the same way as the strings they encode
+    @staticmethod
+    def _ranks(values):
+        '''
+        Description:
+        Returns an array mapping each dictionary code to the rank of its string in sorted order,
+        so that sorting on ranks matches sorting on the strings themselves.
+
+        Arguments:
+        values (list): the dictionary of strings, indexed by code.
+
+        Returns:
+        numpy.ndarray of ranks, indexed by code.
+        '''
+        ranks = np.empty(len(values), dtype=np.int32)
+        ranks[sorted(range(len(values)), key=values.__getitem__)] = np.arange(len(values), dtype=np.int32)
+        return ranks
+
+    # Define _sort_order; stable sort of the rows over several columns, most significant first
+    def _sort_order(self, *columns):
+        '''
+        Description:
+        Returns the row order that sorts the dataset by the given columns, most significant first.
+        The order is computed once per combination of columns and then reused; the returned array is
+        read-only because it is shared by every caller.
+
+        Arguments:
+        self.
+        *columns (str): column names out of COLUMNS.
+
+        Returns:
+        numpy.ndarray of row indexes.
+        '''
+        # Reuse the index if this order was asked for before
+        if columns in self._sortIndexes:
+            PROFILER.count('sort_indexes_reused')
+            return self._sortIndexes[columns]
+
+        # Sort make and model by the rank of their strings, and every other column by its values (NaN last)
+        def sortKey(column):
+            if column == 'make':
+                return self._ranks(self._makes)[self._columns['makeCodes']]
+            if column == 'model':
+                return self._ranks(self._models)[self._columns['modelCodes']]
+            if column not in NUMERIC_COLUMNS:
+                raise ValueError(f"Cannot sort by unknown column: {column}")
+            return self._columns[column]
+
+        # np.lexsort treats its last key as the most significant one
+        with PROFILER.stage('sort', rows=len(self)):
+            order = np.lexsort([sortKey(column) for column in reversed(columns)])
+        order.flags.writeable = False
+        self._sortIndexes[columns] = order
+        return order
+
+    # Define ordered; a view of the data in a sort order, leaving the dataset's own order alone
+    def ordered(self, sortOrder='default'):
+        '''
+        Description:
+        Returns a view of the data in one of the sort orders of SORT_ORDERS, without changing the order
+        used by iteration and without copying or moving any records. Several views in different orders
+        can be held at once; each order is only sorted the first time it is asked for.
+
+        Arguments:
+        self.
+        sortOrder (str): 'default', 'year' or 'mpg'.
+
+        Returns:
+        AutoMPGView over the dataset in that order.
+        '''
+        return AutoMPGView(self, self._sort_order(*SORT_ORDERS[sortOrder]))
+
+    # Define _sibling_path; name a file that lives next to the raw data file
+    def _sibling_path(self, suffix):
+        '''
+        Description:
+        Returns the path of a file derived from the raw data file, e.g. auto-mpg.clean.txt for auto-mpg.data.txt.
+
+        Arguments:
+        self.
+        suffix (str): the suffix replacing '.data.txt' (or the extension) of the raw data file.
+
+        Returns:
+        str: the derived path.
+        '''
+        root = self.dataPath[:-len('.data.txt')] if self.dataPath.endswith('.data.txt') else os.path.splitext(self.dataPath)[0]
+        return root + suffix
+
+    # Define _split_car_name; split the car name into make and model
+    def _split_car_name(self, carName):
+        '''
+        Description:
+        Splits a car name into its make (first word) and model (all other words). The make is returned
+        as written; typos are corrected later, once per distinct make, by the normalizer.
+
+        Arguments:
+        self.
+        carName (str): the "car name" field of a record.
+
+        Returns:
+        tuple (make, model) of strings.
+        '''
+        # Split the car name into a list of strings
+        carName = carName.split()
+
+        # Create variables for make and model
+        make = carName[0]               # The first string is the make
+        model = ' '.join(carName[1:])   # All other strings in the list are the model
+
+        return make, model
+
+    # Define _normalize_makes; the make-normalization stage over the loaded columns
+    def _normalize_makes(self):
+        '''
+        Description:
+        Replaces the raw make dictionary and make codes with canonical ones through the normalizer,
+        and records the rows each alias applied to in self._corrections.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.
+        '''
+        with PROFILER.stage('normalize', rows=len(self._columns['makeCodes'])):
+            self._makes, self._columns['makeCodes'], self._corrections = self.normalizer.apply(self._makes, self._columns['makeCodes'])
+        if TRACE_RECORDS:
+            for make, count in sorted(self._corrections.items()):
+                logging.getLogger().debug(f"Cleaning typo: {make} -> {self.normalizer.normalize(make)} ({count} rows)")
+        return None
+
+    # Define _ensure_data; download the raw data file if it is missing
+    def _ensure_data(self):
+        '''
+        Description:
+        Gets the raw data file from the internet if it does not exist locally.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.
+        '''
+        # Datasets opened from the binary form have no data file to fall back on
+        if self.dataPath is None:
+            raise ValueError("This dataset was not loaded from a data file")
+
+        # If dirty path doesn't exist, get data from the internet
+        if not os.path.exists(self.dataPath):
+            logger = logging.getLogger()
+            logger.info("Getting data")
+            self._get_data()
+            logger.info(f"Got data into {self.dataPath}")
+        return None
+
+    # Define iter_records; parse the raw, tab/space-mixed file directly, one line at a time
+    def iter_records(self, start=0, end=None):
+        '''
+        Description:
+        Streams the raw data file (auto-mpg.data.txt) one Record at a time, in a single pass. Each line
+        holds eight whitespace-separated fields followed by the quoted car name, so the line is split on
+        the quote instead of being rewritten with expandtabs first. A byte range can be given to read
+        part of the file: a line belongs to the range in which it starts, so ranges that split the file
+        at arbitrary bytes still yield every line exactly once.
+
+        Arguments:
+        self.
+        start (int): byte offset to start reading at.
+        end (int or None): byte offset to stop reading at; None for the end of the file.
+
+        Returns:
+        A generator of Record namedtuples whose fields are the strings of the file.
+        '''
+        self._ensure_data()
+
+        with open(self.dataPath, 'rb') as file:
+            # Move to the first line that starts inside the range
+            position = start
+            if start > 0:
+                file.seek(start - 1)
+                position += len(file.readline()) - 1
+
+            for line in file:
+                # Stop at the first line that starts after the range
+                if end is not None and position >= end:
+                    break
+                lineStart, position = position, position + len(line)
+
+                # Split the line into the numeric fields and the quoted car name
+                fields, _, carName = line.decode().partition('"')
+                fields = fields.split()
+
+                # Skip blank lines; refuse lines that do not have all nine fields
+                if not fields and not carName:
+                    continue
+                if len(fields) != 8 or not carName:
+                    raise ValueError(f"{self.dataPath}, byte {lineStart}: expected 9 fields, got {line!r}")
+
+                yield Record(*fields, carName.rpartition('"')[0])
+
+    # Define _record_matches; check the predicates against a Record of the stream
+    def _record_matches(self, record, predicates):
+        '''
+        Description:
+        Checks whether a Record matches all the predicates. Missing values never match.
+
+        Arguments:
+        self.
+        record (Record): a record from iter_records.
+        predicates (tuple): Predicate objects.
+
+        Returns:
+        bool: True if every predicate matches.
+        '''
+        for predicate in predicates:
+            value = self._record_value(record, predicate.column)
+            if isinstance(value, float) and math.isnan(value) or not PREDICATE_OPERATORS[predicate.op](value, predicate.value):
+                return False
+        return True
+
+    # Define _record_value; read one column out of a Record of the stream
+    def _record_value(self, record, column):
+        '''
+        Description:
+        Returns the value of one column of a Record, typed as in the columns (make and model as strings,
+        make normalized).
+
+        Arguments:
+        self.
+        record (Record): a record from iter_records.
+        column (str): one of COLUMNS.
+
+        Returns:
+        str, int or float.
+        '''
+        if column == 'make':
+            return self.normalizer.normalize(self._split_car_name(record.carName)[0])
+        if column == 'model':
+            return self._split_car_name(record.carName)[1]
+        return self._parse_value(column, getattr(record, RECORD_FIELDS[column]))
+
+    # Define stream_aggregate; the constant-memory counterpart of aggregate
+    def stream_aggregate(self, key, start=0, end=None, column='mpg'):
+        '''
+        Description:
+        Computes the same statistics as aggregate straight from the record stream, without loading
+        the columns. Memory use depends on the number of groups, not on the number of rows.
+
+        Arguments:
+        self.
+        key (str): the column to group on; one of COLUMNS.
+        start (int): byte offset of the data file to start reading at.
+        end (int or None): byte offset to stop reading at; None for the end of the file.
+        column (str): the numeric column to aggregate; missing values are skipped.
+
+        Returns:
+        dictionary where the keys are the values of the key column present in the data and the values are
+        dictionaries with the keys 'count', 'sum', 'mean', 'min', 'max' and 'var'.
+        '''
+        if key not in COLUMNS:
+            raise ValueError(f"Cannot group by unknown column: {key}")
+        if column not in NUMERIC_COLUMNS:
+            raise ValueError(f"Cannot aggregate unknown column: {column}")
+
+        # Running count, sum, min, max and Welford's mean/sum of squared deviations per group
+        groups = defaultdict(lambda: {'count': 0, 'sum': 0.0, 'min': float('inf'), 'max': float('-inf'), 'runningMean': 0.0, 'squares': 0.0})
+
+        # The group of each make as written, and whether it is an alias
+        rawGroups = {}
+
+        started = time.perf_counter()
+        self._corrections = Counter()
+        rows = 0
+        with PROFILER.stage('aggregate') as stage:
+            for rows, record in enumerate(self.iter_records(start, end), 1):
+                # Skip rows that fail the filters
+                if self._where and not self._record_matches(record, self._where):
+                    continue
+
+                # Pick the value of the record; missing values (NaN) are not counted
+                value = self._record_value(record, column)
+                if value != value:
+                    continue
+
+                # Find the record's group; a make is normalized the first time it is seen, then found through rawGroups
+                if key == 'make':
+                    make = self._split_car_name(record.carName)[0]
+                    if make not in rawGroups:
+                        canonical = self.normalizer.normalize(make)
+                        rawGroups[make] = (groups[canonical], canonical != make)
+                    stats, aliased = rawGroups[make]
+                    if aliased:
+                        self._corrections[make] += 1
+                else:
+                    stats = groups[self._record_value(record, key)]
+
+                # Update the running statistics of the group
+                stats['count'] += 1
+                stats['sum'] += value
+                stats['min'] = min(stats['min'], value)
+                stats['max'] = max(stats['max'], value)
+                delta = value - stats['runningMean']
+                stats['runningMean'] += delta / stats['count']
+                stats['squares'] += delta * (value - stats['runningMean'])
+            stage.rows = rows
+
+        # Log one summary of the pass, then finish the statistics of each group
+        self._log_load_summary("Streamed", started, rows)
+        return {group: {'count': stats['count'], 'sum': stats['sum'], 'mean': stats['sum'] / stats['count'],
+                        'min': stats['min'], 'max': stats['max'], 'var': stats['squares'] / stats['count']}
+                for group, stats in groups.items()}
+
+    # Define parallel_aggregate; split the data file into byte ranges and aggregate them in worker processes
+    def parallel_aggregate(self, key, workers, column='mpg'):
+        '''
+        Description:
+        Computes the same statistics as stream_aggregate using several processes. The data file is split
+        into one byte range per worker; each range is parsed and aggregated in a ProcessPoolExecutor, and the
+        partial statistics are merged in file order. Because the sums are added up per range, means can
+        differ from stream_aggregate in the last digits.
+
+        Arguments:
+        self.
+        key (str): the column to group on; one of COLUMNS.
+        workers (int): the number of worker processes.
+        column (str): the numeric column to aggregate; missing values are skipped.
+
+        Returns:
+        dictionary where the keys are the values of the key column present in the data and the values are
+        dictionaries with the keys 'count', 'sum', 'mean', 'min', 'max' and 'var'.
+        '''
+        logger = logging.getLogger()
+        self._ensure_data()
+
+        # Split the file into equal byte ranges; iter_records moves each boundary to the next line
+        size = os.path.getsize(self.dataPath)
+        bounds = [size * part // workers for part in range(workers + 1)]
+        logger.info(f"Aggregating {self.dataPath} by {key} with {workers} workers")
+
+        # Aggregate the ranges in parallel, then merge the partial results in file order
+        from concurrent.futures import ProcessPoolExecutor
+        with PROFILER.stage('aggregate'), ProcessPoolExecutor(max_workers=workers) as executor:
+            partials = executor.map(_stream_aggregate_range, [self.dataPath] * workers, [key] * workers, bounds[:-1], bounds[1:],
+                                    [column] * workers, [self._where] * workers, [self.normalizer] * workers)
+            merged = {}
+            for partial in partials:
+                for group, stats in partial.items():
+                    merged[group] = _merge_stats(merged[group], stats) if group in merged else stats
+
+        return merged
+
+    # Define _complete_lines_end; the offset just past the last complete line of the data file
+    def _complete_lines_end(self):
+        '''
+        Description:
+        Returns the byte offset just past the last newline of the data file, so that a row that is
+        still being appended is not read until its line is complete.
+
+        Arguments:
+        self.
+
+        Returns:
+        int: the offset.
+        '''
+        with open(self.dataPath, 'rb') as file:
+            end = file.seek(0, os.SEEK_END)
+            while end > 0:
+                start = max(0, end - 65536)
+                file.seek(start)
+                newline = file.read(end - start).rfind(b'\n')
+                if newline >= 0:
+                    return start + newline + 1
+                end = start
+        return 0
+
+    # Define _prefix_hash; hash the bytes just before an offset of the data file
+    def _prefix_hash(self, offset):
+        '''
+        Description:
+        Returns the SHA-256 hex digest of the STATE_CHECK_BYTES bytes before offset; if they change,
+        the data file was rewritten rather than appended to.
+
+        Arguments:
+        self.
+        offset (int): the byte offset.
+
+        Returns:
+        str: the hex digest.
+        '''
+        with open(self.dataPath, 'rb') as file:
+            file.seek(max(0, offset - STATE_CHECK_BYTES))
+            return hashlib.sha256(file.read(min(offset, STATE_CHECK_BYTES))).hexdigest()
+
+    # Define incremental_aggregate; update persisted aggregates with only the rows appended since the last run
+    def incremental_aggregate(self, key, column='mpg'):
+        '''
+        Description:
+        Computes the same statistics as stream_aggregate, but remembers them in auto-mpg.state.json
+        together with the byte offset of the data file they cover. Later calls only parse the rows
+        appended after that offset and merge them into the remembered statistics, so a daily append
+        costs O(new rows). If the data file shrank, was rewritten before the offset, or the filters or
+        make aliases differ, the statistics are recomputed from the start.
+
+        Arguments:
+        self.
+        key (str): the column to group on; one of COLUMNS.
+        column (str): the numeric column to aggregate.
+
+        Returns:
+        dictionary where the keys are the values of the key column present in the data and the values are
+        dictionaries with the keys 'count', 'sum', 'mean', 'min', 'max' and 'var'.
+        '''
+        logger = logging.getLogger()
+        self._ensure_data()
+        statePath = self._sibling_path('.state.json')
+        stateKey = f"{key}:{column}"
+        where = [list(predicate) for predicate in self._where]
+        aliases = self.normalizer.fingerprint()
+
+        # Read the state of earlier runs; an unreadable or outdated state starts over
+        state = {'version': STATE_VERSION, 'aggregates': {}}
+        if os.path.exists(statePath):
+            try:
+                with open(statePath) as file:
+                    loaded = json.load(file)
+                if loaded.get('version') == STATE_VERSION:
+                    state = loaded
+            except (OSError, ValueError) as error:
+                logger.warning(f"Ignoring unreadable state {statePath}: {error}")
+
+        # Check that the file still starts with the rows already aggregated
+        entry = state['aggregates'].get(stateKey)
+        size = os.path.getsize(self.dataPath)
+        if entry and (entry['where'] != where or entry.get('aliases') != aliases or entry['offset'] > size or entry['prefixHash'] != self._prefix_hash(entry['offset'])):
+            logger.info(f"{self.dataPath} changed before offset {entry['offset']}; recomputing {stateKey}")
+            entry = None
+        if entry is None:
+            entry = {'offset': 0, 'prefixHash': self._prefix_hash(0), 'where': where, 'aliases': aliases, 'groups': []}
+
+        # Aggregate the complete lines appended since the last run, and merge them into the remembered statistics
+        stats = {group: groupStats for group, groupStats in entry['groups']}
+        end = self._complete_lines_end()
+        if end > entry['offset']:
+            logger.info(f"Aggregating {end - entry['offset']} new bytes of {self.dataPath} by {key}")
+            for group, groupStats in self.stream_aggregate(key, entry['offset'], end, column).items():
+                stats[group] = _merge_stats(stats[group], groupStats) if group in stats else groupStats
+
+        # Remember the new state; write a temporary file first so that readers never see a partial state
+        state['aggregates'][stateKey] = {'offset': max(end, entry['offset']), 'prefixHash': self._prefix_hash(max(end, entry['offset'])),
+                                         'where': where, 'aliases': aliases, 'groups': [[group, groupStats] for group, groupStats in stats.items()]}
+        try:
+            with open(statePath + '.tmp', 'w') as file:
+                json.dump(state, file)
+            os.replace(statePath + '.tmp', statePath)
+        except OSError as error:
+            logger.warning(f"Could not write state {statePath}: {error}")
+
+        return stats
+
+    # Define _top_rows; select the best k of a set of rows without sorting them all
+    @staticmethod
+    def _top_rows(values, rows, k, largest):
+        '''
+        Description:
+        Selects the k rows with the largest (or smallest) values with np.partition, in O(n), and sorts
+        only those. Ties are broken in favour of the row that comes first in the file.
+
+        Arguments:
+        values (numpy.ndarray): the values of the candidate rows, without missing values.
+        rows (numpy.ndarray): the candidate row indexes, in file order.
+        k (int): the number of rows to select.
+        largest (bool): select the largest values rather than the smallest.
+
+        Returns:
+        numpy.ndarray of the selected row indexes, best first.
+        '''
+        keyed = -values if largest else values
+        if k < len(keyed):
+            # Everything better than the k-th best value, then as many rows equal to it as still fit
+            threshold = np.partition(keyed, k - 1)[k - 1]
+            better = np.flatnonzero(keyed < threshold)
+            chosen = np.concatenate([better, np.flatnonzero(keyed == threshold)[:k - len(better)]])
+        else:
+            chosen = np.arange(len(keyed))
+        return rows[chosen[np.lexsort((rows[chosen], keyed[chosen]))]]
+
+    # Define top_k; the best cars by a column, overall or per group
+    def top_k(self, key, k, by=None, largest=True, stream=False):
+        '''
+        Description:
+        Returns the k cars with the highest (or lowest) values of a numeric column, overall or per group,
+        without sorting the dataset: the loaded columns are searched with np.partition in O(n), and the
+        record stream with one heap of k cars per group, in memory that depends only on k and the number
+        of groups. Cars with missing values are left out; ties go to the car that comes first in the file.
+
+        Arguments:
+        self.
+        key (str): the numeric column to rank by; one of NUMERIC_COLUMNS.
+        k (int): the number of cars to return (per group).
+        by (str or None): the column to group on; one of COLUMNS.
+        largest (bool): return the highest values; False for the lowest.
+        stream (bool): select straight from the record stream instead of the loaded columns.
+
+        Returns:
+        list of (value, AutoMPG) pairs, best first; with by, a dictionary of such lists per group.
+        '''
+        if key not in NUMERIC_COLUMNS:
+            raise ValueError(f"Cannot rank by unknown column: {key}")
+        if by is not None and by not in COLUMNS:
+            raise ValueError(f"Cannot group by unknown column: {by}")
+        if k < 1:
+            raise ValueError(f"k must be at least 1, not {k}")
+        with PROFILER.stage('aggregate', rows=None if stream else len(self)):
+            if stream:
+                return self._stream_top_k(key, k, by, largest)
+            return self._compute_top_k(key, k, by, largest)
+
+    # Define _compute_top_k; the selection of top_k over the loaded columns
+    def _compute_top_k(self, key, k, by, largest):
+        '''
+        Description:
+        Selects the rows of top_k from the loaded columns with np.partition.
+
+        Arguments:
+        self.
+        key (str): the numeric column to rank by.
+        k (int): the number of cars to return (per group).
+        by (str or None): the column to group on.
+        largest (bool): return the highest values; False for the lowest.
+
+        Returns:
+        list of (value, AutoMPG) pairs, best first; with by, a dictionary of such lists per group.
+        '''
+
+        # Candidate rows: every row with a value
+        values = self._columns[key].astype(np.float64)
+        rows = np.flatnonzero(~np.isnan(values))
+        if by is None:
+            chosen = self._top_rows(values[rows], rows, k, largest)
+            return [(value, self._row(row)) for value, row in zip(values[chosen].tolist(), chosen.tolist())]
+
+        # Split the candidates by group with a stable sort of the group codes, then select within each group
+        labels, codesFor = self._grouping(by)
+        codes = np.asarray(codesFor(rows))
+        order = np.argsort(codes, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(labels)))])
+        results = {}
+        for code, label in enumerate(labels):
+            groupRows = rows[order[bounds[code]:bounds[code + 1]]]
+            if len(groupRows):
+                chosen = self._top_rows(values[groupRows], groupRows, k, largest)
+                results[label] = [(value, self._row(row)) for value, row in zip(values[chosen].tolist(), chosen.tolist())]
+        return results
+
+    # Define _stream_top_k; heap selection over the record stream
+    def _stream_top_k(self, key, k, by, largest):
+        '''
+        Description:
+        The streaming path of top_k: keeps a heap of the best k records of each group while reading the
+        data file once.
+
+        Arguments:
+        self.
+        key (str): the numeric column to rank by.
+        k (int): the number of cars per group.
+        by (str or None): the column to group on.
+        largest (bool): return the highest values.
+
+        Returns:
+        the same as top_k.
+        '''
+        # Min-heaps of (rank, -row, record): the worst kept record is on top, and earlier rows rank higher on ties
+        heaps = defaultdict(list)
+        started = time.perf_counter()
+        self._corrections = Counter()
+        rows = 0
+        for rows, record in enumerate(self.iter_records(), 1):
+            if self._where and not self._record_matches(record, self._where):
+                continue
+            value = self._record_value(record, key)
+            if value != value:
+                continue
+            heap = heaps[None if by is None else self._record_value(record, by)]
+            entry = (value if largest else -value, -rows, record)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+        self._log_load_summary("Streamed", started, rows)
+
+        # Build AutoMPG objects for the kept records only, best first
+        def best(heap):
+            return [(self._record_value(record, key), AutoMPG(*(self._record_value(record, column) for column in ('make', 'model', 'year', 'mpg'))))
+                    for _, _, record in sorted(heap, key=lambda entry: entry[:2], reverse=True)]
+        if by is None:
+            return best(heaps[None])
+        return {group: best(heap) for group, heap in heaps.items()}
+
+    # Define quantiles; quantiles of a column, overall or per group
+    def quantiles(self, column, qs, by=None, stream=False):
+        '''
+        Description:
+        Returns quantiles of a numeric column, overall or per group, leaving out missing values. From the
+        loaded columns they are exact (np.quantile, which partitions rather than sorts); from the record
+        stream they are estimated with one QuantileSketch per group, within its relative accuracy, in
+        memory that does not grow with the number of rows.
+
+        Arguments:
+        self.
+        column (str): one of NUMERIC_COLUMNS.
+        qs (iterable): the quantiles, each between 0 and 1, e.g. (0.25, 0.5, 0.75).
+        by (str or None): the column to group on; one of COLUMNS.
+        stream (bool): estimate from the record stream instead of the loaded columns.
+
+        Returns:
+        dictionary of the value per quantile; with by, a dictionary of such dictionaries per group.
+        '''
+        qs = [float(q) for q in qs]
+        if column not in NUMERIC_COLUMNS:
+            raise ValueError(f"Cannot compute quantiles of unknown column: {column}")
+        if by is not None and by not in COLUMNS:
+            raise ValueError(f"Cannot group by unknown column: {by}")
+        if not all(0 <= q <= 1 for q in qs):
+            raise ValueError("Quantiles must be between 0 and 1")
+
+        with PROFILER.stage('aggregate', rows=None if stream else len(self)):
+            if stream:
+                # One sketch per group, filled while reading the data file once
+                sketches = defaultdict(QuantileSketch)
+                started = time.perf_counter()
+                self._corrections = Counter()
+                rows = 0
+                for rows, record in enumerate(self.iter_records(), 1):
+                    if self._where and not self._record_matches(record, self._where):
+                        continue
+                    value = self._record_value(record, column)
+                    if value == value:
+                        sketches[None if by is None else self._record_value(record, by)].add(value)
+                self._log_load_summary("Streamed", started, rows)
+                results = {group: {q: sketch.quantile(q) for q in qs} for group, sketch in sketches.items()}
+            else:
+                # Exact quantiles per group of the rows with a value
+                values = self._columns[column].astype(np.float64)
+                rows = np.flatnonzero(~np.isnan(values))
+                if by is None:
+                    groups = {None: rows}
+                else:
+                    labels, codesFor = self._grouping(by)
+                    codes = np.asarray(codesFor(rows))
+                    order = np.argsort(codes, kind='stable')
+                    bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(labels)))])
+                    groups = {label: rows[order[bounds[code]:bounds[code + 1]]] for code, label in enumerate(labels) if bounds[code + 1] > bounds[code]}
+                results = {group: dict(zip(qs, np.quantile(values[groupRows], qs).tolist())) for group, groupRows in groups.items() if len(groupRows)}
+
+        if by is None:
+            return results.get(None, {q: float('nan') for q in qs})
+        return results
+
+    # Define _load_data method; parse the raw file (auto-mpg.data.txt) straight into the columns
+    def _load_data(self):
+        '''
+        Description:
+        Loads data from the raw data file (auto-mpg.data.txt) into the columns, in one pass, then runs
+        the make-normalization stage. When an up-to-date binary cache exists the file is not parsed at
+        all; otherwise the cache is rewritten after parsing. The cache holds the makes as written, so it
+        stays valid when the alias table changes.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.
+        '''
+        # Call logger
+        logger = logging.getLogger()
+        started = time.perf_counter()
+
+        # Use the binary cache if it still matches the data file
+        self._ensure_data()
+        if self.cache and self._load_cache():
+            PROFILER.count('cache_hits')
+
+            # Normalize the cached makes, then filter the cached columns without building any rows
+            self._normalize_makes()
+            if self._where:
+                self._keep_rows(self._mask(self._where))
+            self._log_load_summary("Loaded", started, fromCache=True)
+            return None
+
+        if self.cache:
+            PROFILER.count('cache_misses')
+
+        # Compact typed buffers for the columns, and the dictionaries that encode make (as written) and model
+        buffers = {column: array(typecode) for column, (_, typecode) in COLUMN_TYPES.items()}
+        makeIndex, modelIndex = {}, {}
+
+        # Fill the columns from the record stream
+        with PROFILER.stage('parse') as stage:
+            for record in self.iter_records():
+                # Skip rows that fail the filters before storing anything
+                if self._where and not self._record_matches(record, self._where):
+                    continue
+                make, model = self._split_car_name(record.carName)
+
+                # Convert the numeric fields, then give new makes and models the next free code
+                for column in NUMERIC_COLUMNS:
+                    buffers[column].append(self._parse_value(column, getattr(record, RECORD_FIELDS[column])))
+                buffers['makeCodes'].append(makeIndex.setdefault(make, len(makeIndex)))
+                buffers['modelCodes'].append(modelIndex.setdefault(model, len(modelIndex)))
+            stage.rows = len(buffers['mpg'])
+
+        # Wrap the buffers as NumPy arrays without copying them; dicts keep insertion order, so the keys line up with the codes
+        with PROFILER.stage('construct', rows=len(buffers['mpg'])):
+            self._columns = {column: np.frombuffer(buffers[column], dtype=dtype) for column, (dtype, _) in COLUMN_TYPES.items()}
+            self._makes = list(makeIndex)
+            self._models = list(modelIndex)
+        self._order = None
+        self._sortIndexes = {}
+        self._aggregates = {}
+
+        # Save the parsed columns for the next run, with the makes as written; a filtered load does not have every row to save
+        if self.cache and not self._where:
+            with PROFILER.stage('write_cache', rows=len(self)):
+                self._write_cache()
+
+        # Map the raw makes onto canonical makes, once per distinct make
+        self._normalize_makes()
+
+        # Log one summary of the load
+        self._log_load_summary("Loaded", started)
+
+        return None
+
+    # Define _parse_value; convert one field of the data file to the type of its column
+    @staticmethod
+    def _parse_value(column, text):
+        '''
+        Description:
+        Converts one numeric field of the data file to the type of its column; '?' (a missing value) becomes NaN.
+
+        Arguments:
+        column (str): one of NUMERIC_COLUMNS.
+        text (str): the field as written in the file.
+
+        Returns:
+        int for integer columns, float otherwise.
+        '''
+        if COLUMN_TYPES[column][1] == 'd':
+            return float('nan') if text == '?' else float(text)
+        return int(text)
+
+    # Define _log_load_summary; one log line per pass over the data file instead of one per record
+    def _log_load_summary(self, action, started, rows=None, fromCache=False):
+        '''
+        Description:
+        Logs a single summary of a pass over the data file: the number of rows, the number of rows each
+        make alias applied to and the elapsed time.
+
+        Arguments:
+        self.
+        action (str): what the pass did, e.g. "Loaded" or "Streamed".
+        started (float): time.perf_counter() at the start of the pass.
+        rows (int or None): number of rows read; defaults to the number of rows in the columns.
+        fromCache (bool): the rows came from the binary cache of the data file.
+
+        Returns:
+        None.
+        '''
+        rows = len(self) if rows is None else rows
+        corrections = ', '.join(f"{make} -> {self.normalizer.normalize(make)}: {count}" for make, count in sorted(self._corrections.items()))
+        source = f"cache of {self.dataPath}" if fromCache else self.dataPath
+        logging.getLogger().info(f"{action} {rows} rows from {source} in {time.perf_counter() - started:.3f} s; "
+                                 f"typo corrections: {corrections or 'none'}")
+        return None
+
+    # Define _mask; evaluate predicates over whole columns
+    def _mask(self, predicates):
+        '''
+        Description:
+        Evaluates predicates over the columns at once. Predicates on make and model are evaluated
+        once per dictionary entry and then spread to the rows through the codes. Missing values never match.
+
+        Arguments:
+        self.
+        predicates (iterable): Predicate objects.
+
+        Returns:
+        numpy.ndarray of bools, True for the rows that match every predicate.
+        '''
+        mask = np.ones(len(self), dtype=bool)
+        for predicate in predicates:
+            compare = PREDICATE_OPERATORS[predicate.op]
+            if predicate.column in ('make', 'model'):
+                names = self._makes if predicate.column == 'make' else self._models
+                matches = np.fromiter((compare(name, predicate.value) for name in names), dtype=bool, count=len(names))
+                mask &= matches[self._columns[predicate.column + 'Codes']]
+            else:
+                values = self._columns[predicate.column]
+                mask &= compare(values, predicate.value)
+                if values.dtype.kind == 'f':
+                    mask &= ~np.isnan(values)
+        return mask
+
+    # Define _keep_rows; drop the rows that are not selected
+    def _keep_rows(self, mask):
+        '''
+        Description:
+        Keeps only the rows selected by mask in every column, and forgets sort orders of the old rows.
+
+        Arguments:
+        self.
+        mask (numpy.ndarray): one bool per row.
+
+        Returns:
+        None.
+        '''
+        self._columns = {column: values[mask] for column, values in self._columns.items()}
+        self._order = None
+        self._sortIndexes = {}
+        self._aggregates = {}
+        return None
+
+    # Define where; start a query that filters the loaded rows
+    def where(self, *predicates):
+        '''
+        Description:
+        Starts a query over the rows matching all the predicates, e.g.
+        data.where("year>=76", col('origin') == 1).group_by(["make", "year"]).agg(mpg="mean").
+
+        Arguments:
+        self.
+        *predicates (str or Predicate): the filters.
+
+        Returns:
+        AutoMPGQuery object.
+        '''
+        return AutoMPGQuery(self).where(*predicates)
+
+    # Define group_by; start a query that groups the loaded rows
+    def group_by(self, keys):
+        '''
+        Description:
+        Starts a query grouping all rows on one or more columns, e.g. data.group_by(["make", "year"]).agg(mpg="mean").
+
+        Arguments:
+        self.
+        keys (str or list): the column(s) to group on.
+
+        Returns:
+        AutoMPGQuery object.
+        '''
+        return AutoMPGQuery(self).group_by(keys)
+
+    # Define write_binary; save the columns as .npy files that can be memory-mapped
+    def write_binary(self, directory):
+        '''
+        Description:
+        Writes the columns to a directory in a fixed-width binary form: one .npy file per column
+        (mpg.npy, cylinders.npy, ..., makeCodes.npy, modelCodes.npy) plus the make and model
+        dictionaries (makes.npy, models.npy). The rows are written in file order.
+
+        Arguments:
+        self.
+        directory (str): the directory to write to; created if it does not exist.
+
+        Returns:
+        None.
+        '''
+        os.makedirs(directory, exist_ok=True)
+        columns = dict(self._columns, makes=np.array(self._makes, dtype=str), models=np.array(self._models, dtype=str))
+        with PROFILER.stage('write', rows=len(self)):
+            for name in BINARY_COLUMNS:
+                np.save(os.path.join(directory, name + '.npy'), columns[name])
+
+        logging.getLogger().info(f"Wrote binary dataset to {directory}")
+        return None
+
+    # Define from_binary; open the columns written by write_binary as memory maps
+    @classmethod
+    def from_binary(cls, directory, where=()):
+        '''
+        Description:
+        Opens a dataset written by write_binary. The columns are numpy.memmap objects, so rows are paged
+        in from disk only when iteration, sorting or aggregation reads them; only the make and model
+        dictionaries are loaded into memory. Sorting still keeps one row index per row in memory.
+
+        Arguments:
+        cls.
+        directory (str): the directory written by write_binary.
+        where (iterable): predicates that rows must match; the matching rows are copied into memory.
+
+        Returns:
+        AutoMPGData backed by the memory-mapped columns.
+        '''
+        dataset = cls(dataPath=None, load=False)
+        with PROFILER.stage('construct') as stage:
+            dataset._columns = {column: np.load(os.path.join(directory, column + '.npy'), mmap_mode='r') for column in COLUMN_TYPES}
+            dataset._makes = np.load(os.path.join(directory, 'makes.npy')).tolist()
+            dataset._models = np.load(os.path.join(directory, 'models.npy')).tolist()
+            stage.rows = len(dataset)
+        dataset._where = tuple(parsePredicate(predicate) for predicate in where)
+        if dataset._where:
+            dataset._keep_rows(dataset._mask(dataset._where))
+
+        logging.getLogger().info(f"Opened binary dataset {directory} with {len(dataset)} rows")
+        return dataset
+
+    # Define write_arrow; save the columns as an Arrow IPC or Parquet file
+    def write_arrow(self, path):
+        '''
+        Description:
+        Writes the dataset to a columnar file: Parquet if the path ends in .parquet, otherwise Arrow IPC
+        (Feather). The file has one column per name in COLUMNS; make and model are written as
+        dictionary-encoded strings. The rows are written in file order. Requires the pyarrow package.
+
+        Arguments:
+        self.
+        path (str): the file to write.
+
+        Returns:
+        None.
+        '''
+        pa, feather, parquet = _pyarrow()
+
+        # Numeric columns are written with their own types; make and model reuse the codes and dictionaries
+        arrays = [pa.array(np.asarray(self._columns[column])) for column in NUMERIC_COLUMNS]
+        arrays += [pa.DictionaryArray.from_arrays(np.asarray(self._columns['makeCodes']), pa.array(self._makes, type=pa.string())),
+                   pa.DictionaryArray.from_arrays(np.asarray(self._columns['modelCodes']), pa.array(self._models, type=pa.string()))]
+        table = pa.Table.from_arrays(arrays, names=list(COLUMNS))
+
+        with PROFILER.stage('write', rows=len(self)):
+            if path.endswith('.parquet'):
+                parquet.write_table(table, path)
+            else:
+                feather.write_feather(table, path)
+
+        logging.getLogger().info(f"Wrote Arrow dataset to {path}")
+        return None
+
+    # Define from_arrow; read a file written by write_arrow, optionally only some of its columns
+    @classmethod
+    def from_arrow(cls, path, columns=None, where=()):
+        '''
+        Description:
+        Reads a dataset written by write_arrow, without parsing text. If columns are given only those
+        (and the columns the where filters need) are read from the file, e.g. ('year', 'mpg') for
+        mpg_by_year; the other columns are then unavailable. Iteration and print need make, model,
+        year and mpg. Requires the pyarrow package.
+
+        Arguments:
+        cls.
+        path (str): the Arrow IPC (Feather) or Parquet file; Parquet if the name ends in .parquet.
+        columns (iterable or None): names out of COLUMNS to read; None reads every column.
+        where (iterable): predicates that rows must match.
+
+        Returns:
+        AutoMPGData holding the columns read.
+        '''
+        pa, feather, parquet = _pyarrow()
+        dataset = cls(dataPath=None, load=False)
+        dataset._where = tuple(parsePredicate(predicate) for predicate in where)
+
+        # Read only the projected columns, in the order of COLUMNS
+        wanted = set(COLUMNS if columns is None else columns) | {predicate.column for predicate in dataset._where}
+        unknown = wanted.difference(COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+        names = [column for column in COLUMNS if column in wanted]
+        with PROFILER.stage('construct') as stage:
+            if path.endswith('.parquet'):
+                table = parquet.read_table(path, columns=names)
+            else:
+                table = feather.read_table(path, columns=names, memory_map=True)
+
+            # Convert to the typed columns; strings are dictionary-encoded if the file did not keep the encoding
+            dataset._columns = {}
+            for name in names:
+                values = table.column(name).combine_chunks()
+                if name in ('make', 'model'):
+                    if not pa.types.is_dictionary(values.type):
+                        values = values.dictionary_encode()
+                    dictionary = values.dictionary.to_pylist()
+                    if name == 'make':
+                        dataset._makes = dictionary
+                    else:
+                        dataset._models = dictionary
+                    values = values.indices
+                dtype = COLUMN_TYPES[STORAGE_COLUMNS[name]][0]
+                dataset._columns[STORAGE_COLUMNS[name]] = values.to_numpy(zero_copy_only=False).astype(dtype, copy=False)
+            stage.rows = len(dataset)
+
+        if dataset._where:
+            dataset._keep_rows(dataset._mask(dataset._where))
+
+        logging.getLogger().info(f"Read Arrow dataset {path} with {len(dataset)} rows ({', '.join(names)})")
+        return dataset
+
+    # Define write_partitioned; save the rows in one directory per partition, with a manifest of their statistics
+    def write_partitioned(self, directory, by=('year',)):
+        '''
+        Description:
+        Writes the dataset partitioned on one or more columns of PARTITION_COLUMNS: one directory per
+        combination of values present, e.g. year=76/make=ford, holding the rows of that partition in the
+        binary form of write_binary plus their row numbers in the file (rows.npy), and a manifest.json
+        listing every partition with its values, its row count and the count, sum, mean, min, max and
+        variance of mpg. from_partitioned then reads only the partitions that filters can match, and
+        aggregate answers mpg grouped by a partition column from the manifest alone. The makes are
+        written normalized.
+
+        Arguments:
+        self.
+        directory (str): the directory to write to; created if it does not exist.
+        by (iterable): the columns to partition on, outermost first.
+
+        Returns:
+        None.
+        '''
+        by = list(by)
+        unknown = [key for key in by if key not in PARTITION_COLUMNS]
+        if not by or unknown:
+            raise ValueError(f"Cannot partition by: {', '.join(unknown) or 'no columns'}; expected some of {', '.join(PARTITION_COLUMNS)}")
+
+        # Combine the group codes of the partition columns into one code per row, and gather the rows of each code in file order
+        groupings = [self._grouping(key) for key in by]
+        dims = [max(len(labels), 1) for labels, _ in groupings]
+        combined = np.ravel_multi_index([np.asarray(codesFor(slice(None)), dtype=np.intp) for _, codesFor in groupings], dims)
+        order = np.argsort(combined, kind='stable')
+        codes, starts = np.unique(combined[order], return_index=True)
+        bounds = starts.tolist() + [len(order)]
+
+        os.makedirs(directory, exist_ok=True)
+        partitions = []
+        with PROFILER.stage('write', rows=len(self)):
+            for index, code in enumerate(codes.tolist()):
+                rows = order[bounds[index]:bounds[index + 1]]
+                values = {key: labels[int(keyCode)] for key, (labels, _), keyCode in zip(by, groupings, np.unravel_index(code, dims))}
+                path = '/'.join(f"{key}={quote(str(value), safe='')}" for key, value in values.items())
+
+                # The partition as a dataset of its own, whose make and model dictionaries hold only its own values
+                part = type(self)(dataPath=None, load=False)
+                part._columns = {column: np.asarray(columnValues)[rows] for column, columnValues in self._columns.items()}
+                usedMakes, makeCodes = np.unique(part._columns['makeCodes'], return_inverse=True)
+                usedModels, modelCodes = np.unique(part._columns['modelCodes'], return_inverse=True)
+                part._columns['makeCodes'], part._columns['modelCodes'] = makeCodes.astype(np.int32), modelCodes.astype(np.int32)
+                part._makes = [self._makes[makeCode] for makeCode in usedMakes.tolist()]
+                part._models = [self._models[modelCode] for modelCode in usedModels.tolist()]
+
+                # Write its columns, dictionaries and row numbers, and describe it in the manifest
+                partitionDirectory = os.path.join(directory, *path.split('/'))
+                os.makedirs(partitionDirectory, exist_ok=True)
+                columns = dict(part._columns, makes=np.array(part._makes, dtype=str), models=np.array(part._models, dtype=str), rows=rows)
+                for name in BINARY_COLUMNS + ('rows',):
+                    np.save(os.path.join(partitionDirectory, name + '.npy'), columns[name])
+                partitions.append({'path': path, 'values': values, 'rows': len(rows), 'mpg': part._compute_aggregate(by[0], 'mpg').get(values[by[0]])})
+
+            # Write the manifest last, through a temporary file, so that readers never see a partial one
+            manifestPath = os.path.join(directory, 'manifest.json')
+            with open(manifestPath + '.tmp', 'w') as file:
+                json.dump({'version': MANIFEST_VERSION, 'by': by, 'rows': len(self), 'partitions': partitions}, file, indent=1)
+            os.replace(manifestPath + '.tmp', manifestPath)
+
+        logging.getLogger().info(f"Wrote {len(partitions)} partitions by {', '.join(by)} to {directory}")
+        return None
+
+    # Define from_partitioned; read the partitions written by write_partitioned that filters can match
+    @classmethod
+    def from_partitioned(cls, directory, columns=None, where=(), load=True):
+        '''
+        Description:
+        Opens a dataset written by write_partitioned. Partitions whose values (or whose mpg range) cannot
+        match the where filters are left out without being read; the rows of the others are read (only
+        the columns asked for), put back in the order of the data file and filtered. With load=False no
+        rows are read at all, which is enough for aggregates the manifest answers (see aggregate; means
+        merged over several partitions can differ from those of the rows in the last digits).
+
+        Arguments:
+        cls.
+        directory (str): the directory written by write_partitioned.
+        columns (iterable or None): names out of COLUMNS to read; None reads every column.
+        where (iterable): predicates that rows must match.
+        load (bool): read the rows of the matching partitions.
+
+        Returns:
+        AutoMPGData holding the rows of the matching partitions.
+        '''
+        dataset = cls(dataPath=None, load=False)
+        dataset._where = tuple(parsePredicate(predicate) for predicate in where)
+        with open(os.path.join(directory, 'manifest.json')) as file:
+            manifest = json.load(file)
+        if manifest.get('version') != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported manifest version in {directory}: {manifest.get('version')}")
+
+        # Keep the partitions that every filter can match
+        partitions = [partition for partition in manifest['partitions'] if all(cls._partition_may_match(partition, predicate) for predicate in dataset._where)]
+        dataset._manifest = dict(manifest, directory=directory, partitions=partitions)
+        PROFILER.count('partitions_pruned', len(manifest['partitions']) - len(partitions))
+        logging.getLogger().info(f"Partitioned dataset {directory}: {len(partitions)} of {len(manifest['partitions'])} partitions match")
+
+        if load:
+            dataset._load_partitions(columns)
+        return dataset
+
+    # Define _partition_may_match; whether a partition can hold rows matching a predicate
+    @staticmethod
+    def _partition_may_match(partition, predicate):
+        '''
+        Description:
+        Checks a predicate against the manifest entry of a partition: exactly for a partition column,
+        against the mpg range for mpg, and not at all (True) for other columns.
+
+        Arguments:
+        partition (dict): the manifest entry of the partition.
+        predicate (Predicate): the predicate.
+
+        Returns:
+        bool: False if no row of the partition can match.
+        '''
+        if predicate.column in partition['values']:
+            return PREDICATE_OPERATORS[predicate.op](partition['values'][predicate.column], predicate.value)
+        if predicate.column == 'mpg':
+            # Missing values never match, so a partition without mpg values matches nothing
+            if partition['mpg'] is None:
+                return False
+            low, high, value = partition['mpg']['min'], partition['mpg']['max'], predicate.value
+            return {'==': low <= value <= high, '!=': not low == high == value, '<': low < value,
+                    '<=': low <= value, '>': high > value, '>=': high >= value}[predicate.op]
+        return True
+
+    # Define _load_partitions; read the rows of the partitions kept in the manifest
+    def _load_partitions(self, columns=None):
+        '''
+        Description:
+        Reads the rows of the partitions of self._manifest into the columns, re-encoding make and model
+        into shared dictionaries, restores the order of the data file and applies the where filters.
+
+        Arguments:
+        self.
+        columns (iterable or None): names out of COLUMNS to read; None reads every column.
+
+        Returns:
+        None.
+        '''
+        directory = self._manifest['directory']
+        wanted = set(COLUMNS if columns is None else columns) | {predicate.column for predicate in self._where}
+        unknown = wanted.difference(COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+        storage = [STORAGE_COLUMNS[name] for name in COLUMNS if name in wanted]
+
+        parts = {column: [] for column in storage}
+        rowNumbers = []
+        indexes = {'makeCodes': ({}, 'makes'), 'modelCodes': ({}, 'models')}
+        with PROFILER.stage('construct') as stage:
+            for partition in self._manifest['partitions']:
+                partitionDirectory = os.path.join(directory, *partition['path'].split('/'))
+                rowNumbers.append(np.load(os.path.join(partitionDirectory, 'rows.npy')))
+                for column in storage:
+                    values = np.load(os.path.join(partitionDirectory, column + '.npy'))
+
+                    # Make and model codes are translated into dictionaries shared by every partition
+                    if column in indexes:
+                        index, names = indexes[column]
+                        mapping = [index.setdefault(name, len(index)) for name in np.load(os.path.join(partitionDirectory, names + '.npy')).tolist()]
+                        values = np.array(mapping, dtype=np.int32)[values]
+                    parts[column].append(values)
+
+            # Put the rows back in the order of the data file
+            order = np.argsort(np.concatenate(rowNumbers), kind='stable') if rowNumbers else np.zeros(0, dtype=np.intp)
+            self._columns = {column: np.concatenate(parts[column])[order] if parts[column] else np.empty(0, dtype=COLUMN_TYPES[column][0])
+                             for column in storage}
+            self._makes, self._models = list(indexes['makeCodes'][0]), list(indexes['modelCodes'][0])
+            stage.rows = len(order)
+        self._order = None
+        self._sortIndexes = {}
+        self._aggregates = {}
+
+        if self._where:
+            self._keep_rows(self._mask(self._where))
+        logging.getLogger().info(f"Read {len(self)} rows from {len(self._manifest['partitions'])} partitions of {directory}")
+        return None
+
+    # Define _manifest_covers; whether the manifest alone answers an aggregate
+    def _manifest_covers(self, key, column):
+        '''
+        Description:
+        Checks whether aggregate(key, column) can be answered from the manifest: the dataset was read
+        by from_partitioned, mpg is aggregated by a partition column, and every filter is on a
+        partition column (so the kept partitions hold exactly the matching rows).
+
+        Arguments:
+        self.
+        key (str): the column to group on.
+        column (str): the column to aggregate.
+
+        Returns:
+        bool.
+        '''
+        return (self._manifest is not None and column == 'mpg' and key in self._manifest['by']
+                and all(predicate.column in self._manifest['by'] for predicate in self._where))
+
+    # Define _manifest_aggregate; aggregate mpg by a partition column from the manifest
+    def _manifest_aggregate(self, key):
+        '''
+        Description:
+        Merges the mpg statistics of the kept partitions per value of a partition column, without reading any rows.
+        Sums merged over several partitions can differ from sums over the rows in the last digits.
+
+        Arguments:
+        self.
+        key (str): a partition column.
+
+        Returns:
+        dictionary as returned by aggregate.
+        '''
+        results = {}
+        for partition in self._manifest['partitions']:
+            stats, label = partition['mpg'], partition['values'][key]
+            if stats:
+                results[label] = _merge_stats(results[label], stats) if label in results else dict(stats)
+        return results
+
+    # Define _file_hash; hash a file in large chunks
+    @staticmethod
+    def _file_hash(path):
+        '''
+        Description:
+        Returns the SHA-256 hex digest of a file, read in 1 MiB chunks.
+
+        Arguments:
+        path (str): the file to hash.
+
+        Returns:
+        str: the hex digest.
+        '''
+        digest = hashlib.sha256()
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(1 << 20), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    # Define _load_cache; fill the columns from auto-mpg.cache.npz if it is still up to date
+    def _load_cache(self):
+        '''
+        Description:
+        Fills the columns from the binary cache (auto-mpg.cache.npz) if it is still up to date. The cache
+        is stale when the data file's size differs, or when its modification time differs and its
+        SHA-256 hash does too.
+
+        Arguments:
+        self.
+
+        Returns:
+        bool: True if the columns were loaded from the cache.
+        '''
+        logger = logging.getLogger()
+        cachePath = self._sibling_path('.cache.npz')
+        if not os.path.exists(cachePath):
+            return False
+
+        try:
+            with np.load(cachePath, allow_pickle=False) as cache:
+                # Check the cache against the current data file
+                if int(cache['version']) != CACHE_VERSION or not self._source_unchanged(cache):
+                    logger.info(f"Cache {cachePath} is stale")
+                    return False
+
+                # Copy the columns out of the cache
+                with PROFILER.stage('construct', rows=int(cache['mpg'].shape[0])):
+                    self._columns = {column: cache[column] for column in COLUMN_TYPES}
+                    self._makes = cache['makes'].tolist()
+                    self._models = cache['models'].tolist()
+                self._order = None
+                self._sortIndexes = {}
+                self._aggregates = {}
+        except (OSError, ValueError, KeyError) as error:
+            # An unreadable cache is rebuilt from the data file
+            logger.warning(f"Ignoring unreadable cache {cachePath}: {error}")
+            return False
+
+        return True
+
+    # Define _source_signature; what the files derived from the data file remember about it
+    def _source_signature(self):
+        '''
+        Description:
+        Returns the size, modification time and SHA-256 hash of the data file, which the binary cache and
+        the rollup cube store so that they can tell whether the data file changed since.
+
+        Arguments:
+        self.
+
+        Returns:
+        dictionary with the keys 'sourceSize', 'sourceMtime' and 'sourceHash'.
+        '''
+        source = os.stat(self.dataPath)
+        return {'sourceSize': source.st_size, 'sourceMtime': source.st_mtime_ns, 'sourceHash': self._file_hash(self.dataPath)}
+
+    # Define _source_unchanged; compare a stored signature with the data file
+    def _source_unchanged(self, stored):
+        '''
+        Description:
+        Checks a signature stored by _source_signature against the data file. The file changed if its
+        size differs, or if its modification time differs and its hash does too.
+
+        Arguments:
+        self.
+        stored (mapping): the stored signature.
+
+        Returns:
+        bool: True if the data file is unchanged.
+        '''
+        source = os.stat(self.dataPath)
+        if int(stored['sourceSize']) != source.st_size:
+            return False
+        return int(stored['sourceMtime']) == source.st_mtime_ns or str(stored['sourceHash']) == self._file_hash(self.dataPath)
+
+    # Define _write_cache; save the columns to auto-mpg.cache.npz along with the signature of the data file
+    def _write_cache(self):
+        '''
+        Description:
+        Writes the columns to the binary cache (auto-mpg.cache.npz), together with the size, modification
+        time and hash of the data file they were parsed from.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.
+        '''
+        logger = logging.getLogger()
+        cachePath = self._sibling_path('.cache.npz')
+
+        try:
+            # Write to a temporary file first so that readers never see a partial cache
+            with open(cachePath + '.tmp', 'wb') as file:
+                np.savez(file, version=CACHE_VERSION, makes=np.array(self._makes, dtype=str), models=np.array(self._models, dtype=str),
+                         **self._source_signature(), **self._columns)
+            os.replace(cachePath + '.tmp', cachePath)
+            logger.info(f"Wrote cache {cachePath}")
+        except OSError as error:
+            # The cache is only an optimization; carry on without it
+            logger.warning(f"Could not write cache {cachePath}: {error}")
+
+        return None
+
+    # Define _clean_data method to read original data file (auto-mpg.data.txt) line by line and use expandtabs method to convert TAB character to spaces
+    def _clean_data(self):
+        '''
+        Description:
+        Reads the original data file (auto-mpg.data.txt) and converts tab characters to spaces.
+        Cleans line by line to create a cleaned file (auto-mpg.clean.txt). Loading does not need it,
+        since _load_data parses the data file directly.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.
+        '''
+
+        # Call logger
+        logger = logging.getLogger()
+        logger.info("Cleaning data...")
+
+        # Define an input and output path; the clean file sits next to the raw file
+        inPath = self.dataPath
+        outPath = self._sibling_path('.clean.txt')
+
+        # Read auto-mpg.data.txt line by line, write auto-mpg.clean.txt with expanded tabs
+        with PROFILER.stage('clean') as stage, open(inPath, 'r') as inFile, open(outPath, 'w') as outFile:
+            # Read the line in the auto-mpg-data.txt, clean it using expand tabs, write the cleaned line to auto-mpg.clean.txt
+            stage.rows = 0
+            for line in inFile:
+                cleanedLine = str(line).expandtabs()
+                outFile.write(cleanedLine)
+                stage.rows += 1
 
         # End logger
         logger.info("Finished Cleaning Data")
         return None
-    
-    # Define sort_by_default method (sort the data list in place by default order)
-    def sort_by_default(self):
+    
+    # Define sort_by method for sorting the data by any columns
+    def sort_by(self, *columns):
+        '''
+        Description:
+        Sorts the data by the given columns, most significant first (e.g. sort_by('weight', 'mpg')).
+        Missing values sort last. Only the row order is changed; the columns stay in place, and the
+        sort index is reused on later calls.
+
+        Arguments:
+        self.
+        *columns (str): column names out of COLUMNS.
+
+        Returns:
+        None.
+        '''
+        logger = logging.getLogger()
+        logger.info(f"sort_by function used: {', '.join(columns)}")
+        self._order = self._sort_order(*columns)
+        return None
+
+    # Define sort_by_default method (sort the data list in place by default order)
+    def sort_by_default(self):
+        '''
+        Description:
+        Sorts the data by default order. Only the row order is changed; the columns stay in place, and the sort index is reused on later calls.
+        
+        Arguments:
+        self.
+        
+        Returns:
+        None.
+        '''
+        logger = logging.getLogger()
+        logger.info("sort_by_default function used")
+        # Order the rows by make, model, year, then mpg (the same order as AutoMPG.__lt__)
+        self._order = self._sort_order(*SORT_ORDERS['default'])
+        return None
+    
+    # Define sort_by_year method for sorting the data by year
+    def sort_by_year(self):
+        '''
+        Description:
+        Sorts the data by year, make, model, then mpg. Only the row order is changed; the columns stay in place, and the sort index is reused on later calls.
+        
+        Arguments:
+        self.
+
+        Returns:
+        None
+        '''
+        logger = logging.getLogger()
+        logger.info("sort_by_year function used")
+        # Order the rows by the columns year, make, model, mpg
+        self._order = self._sort_order(*SORT_ORDERS['year'])
+        return None
+    
+    # Define sort_by_mpg method for sorting the data by MPG
+    def sort_by_mpg(self):
+        '''
+        Description:
+        Sorts the data by mpg, make, model, then year. Only the row order is changed; the columns stay in place, and the sort index is reused on later calls.
+        
+        Arguments:
+        self.
+        
+        Returns:
+        None.
+        '''
+        logger = logging.getLogger()
+        logger.info("sort_by_mpg function used")
+        # Order the rows by the columns mpg, make, model, year
+        self._order = self._sort_order(*SORT_ORDERS['mpg'])
+        return None
+
+    # Define external_sort; sort the data file for print in bounded memory
+    def external_sort(self, sortOrder='default', memoryBudget=EXTERNAL_SORT_BUDGET, directory=None):
+        '''
+        Description:
+        Sorts the rows of the data file in one of the sort orders of SORT_ORDERS without loading the
+        dataset: the record stream is cut into runs that fit the memory budget, each run is sorted and
+        spilled to a temporary file, and the runs are merged with a k-way merge (in several passes if
+        there are too many to merge at once). The rows come out as the same (make, model, year, mpg)
+        chunks as AutoMPGView.iter_chunks, in the same order as sort_by_*, so they can go straight
+        into writeCsv. If the rows fit the budget nothing is spilled. The run files are removed when
+        the generator finishes or is closed.
+
+        Arguments:
+        self.
+        sortOrder (str): one of SORT_ORDERS.
+        memoryBudget (int): the bytes the rows being sorted or merged may take, estimated at SPILL_ROW_BYTES per row.
+        directory (str or None): where to put the run files; the system temporary directory if None.
+
+        Returns:
+        A generator of lists of (make, model, year, mpg) tuples.
+        '''
+        if sortOrder not in SORT_ORDERS:
+            raise ValueError(f"Unknown sort order: {sortOrder}")
+        logger = logging.getLogger()
+
+        # Rows are kept as tuples laid out in sort order, so that runs sort and merge with plain tuple comparisons;
+        # mpg is preceded by whether it is missing, so that missing values sort last as they do in np.lexsort
+        fields = {'make': (0,), 'model': (1,), 'year': (2,), 'mpg': (3, 4)}
+        layout = [position for column in SORT_ORDERS[sortOrder] for position in fields[column]]
+        toKeyed = operator.itemgetter(*layout)
+        fromKeyed = operator.itemgetter(*[layout.index(fields[column][-1]) for column in ('make', 'model', 'year', 'mpg')])
+
+        # Rows per run, and runs merged at once, so that either phase stays within the budget
+        rowsPerRun = max(SPILL_BLOCK_ROWS, memoryBudget // SPILL_ROW_BYTES)
+        fanIn = max(2, memoryBudget // (SPILL_BLOCK_ROWS * SPILL_ROW_BYTES))
+
+        with tempfile.TemporaryDirectory(dir=directory, prefix='autompg-sort-') as workDirectory:
+            runs = []
+            runNames = (os.path.join(workDirectory, f"run{number}.pkl") for number in itertools.count())
+
+            # Define the function that sorts the current run and writes it to a new run file
+            def spill(run):
+                with PROFILER.stage('sort', rows=len(run)):
+                    run.sort()
+                runs.append(_write_run(next(runNames), run))
+                PROFILER.count('sort_runs_spilled')
+
+            # Read the data file once, cutting it into sorted runs
+            started = time.perf_counter()
+            self._corrections = Counter()
+            canonical = {}
+            run, rows = [], 0
+            with PROFILER.stage('parse') as stage:
+                for rows, record in enumerate(self.iter_records(), 1):
+                    if self._where and not self._record_matches(record, self._where):
+                        continue
+
+                    # Normalize each make as written once
+                    make, model = self._split_car_name(record.carName)
+                    if make not in canonical:
+                        canonical[make] = self.normalizer.normalize(make)
+                    if canonical[make] != make:
+                        self._corrections[make] += 1
+
+                    mpg = self._parse_value('mpg', record.mpg)
+                    run.append(toKeyed((canonical[make], model, self._parse_value('year', record.modelYear), mpg != mpg, mpg)))
+                    if len(run) >= rowsPerRun:
+                        spill(run)
+                        run = []
+                stage.rows = rows
+            self._log_load_summary("Streamed", started, rows)
+
+            # Rows that fit the budget are sorted in memory; otherwise merge the runs until few enough are left
+            if not runs:
+                with PROFILER.stage('sort', rows=len(run)):
+                    run.sort()
+                merged = iter(run)
+            else:
+                if run:
+                    spill(run)
+                run = None
+                logger.info(f"Spilled {len(runs)} sorted runs of up to {rowsPerRun} rows to {workDirectory}")
+                while len(runs) > fanIn:
+                    with PROFILER.stage('sort'):
+                        path = _write_run(next(runNames), heapq.merge(*map(_read_run, runs[:fanIn])))
+                    for done in runs[:fanIn]:
+                        os.remove(done)
+                    runs = runs[fanIn:] + [path]
+                merged = heapq.merge(*map(_read_run, runs))
+
+            # Hand out the merged rows in chunks, converted back to (make, model, year, mpg)
+            while True:
+                chunk = [fromKeyed(row) for row in itertools.islice(merged, min(AutoMPGView.CHUNK_SIZE, rowsPerRun))]
+                if not chunk:
+                    break
+                yield chunk
+
+    # Define _get_data method for getting information from the internet
+    def _get_data(self):
+        '''
+        Description:
+        Gets auto-mpg.data.txt from the internet, trying the mirrors in DATA_URLS in order. The download
+        streams to disk, resumes after dropped connections, is checked against DATA_SHA256, and is skipped
+        if the server reports that the file has not changed since the last download (see fetchFile).
+
+        Arguments:
+        self.
+
+        Returns:
+        bool: True if the file was downloaded, False if the local copy is still current.
+        '''
+        # Get the logger, and the HTTP library (only imported when a download is needed)
+        logger = logging.getLogger()
+        import requests
+
+        # Get data from internet; move on to the next mirror if one fails
+        logger.info("Requesting data from internet")
+        failure = None
+        with PROFILER.stage('fetch'):
+            for url in DATA_URLS:
+                try:
+                    downloaded = fetchFile(url, self.dataPath, DATA_SHA256, self._sibling_path('.fetch.json'))
+                except (requests.RequestException, ValueError) as error:
+                    logger.warning(f"Data request to {url} failed: {error}")
+                    failure = error
+                    continue
+                logger.info("Data successfully scraped" if downloaded else "Data file is up to date")
+                return downloaded
+
+        # If data is unsuccessfully scraped from every mirror, stop instead of parsing a missing file
+        logger.critical("Data unsuccessfully scraped")
+        if failure is None:
+            raise RuntimeError("no data mirrors configured")
+        raise failure
+
+    # Define _grouping; map a key column onto dense group codes and the labels they stand for
+    def _grouping(self, key):
+        '''
+        Description:
+        Maps a key column onto dense integer group codes and the label of each group. The codes are
+        produced per block of rows, so that memory-mapped columns never have to be read in full.
+
+        Arguments:
+        self.
+        key (str): the column to group on; one of COLUMNS.
+
+        Returns:
+        tuple (labels, codesFor): labels is a list with the key value of each group code, codesFor is a
+        function returning the group codes (numpy.ndarray) for a slice of rows.
+        '''
+        # Make and model are already dictionary-encoded
+        if key == 'make':
+            return self._makes, lambda rows: self._columns['makeCodes'][rows]
+        if key == 'model':
+            return self._models, lambda rows: self._columns['modelCodes'][rows]
+        if key not in NUMERIC_COLUMNS:
+            raise ValueError(f"Cannot group by unknown column: {key}")
+
+        values = self._columns[key]
+        if len(values) == 0:
+            return [], lambda rows: values[rows].astype(np.intp)
+
+        # Integer columns are encoded by their offset from the smallest value; values without cars get no rows
+        if np.issubdtype(values.dtype, np.integer):
+            lowest = int(values.min())
+            return list(range(lowest, int(values.max()) + 1)), lambda rows: values[rows].astype(np.intp) - lowest
+
+        # Other columns are encoded by their position among the distinct values (missing values are a group of their own)
+        labels = np.unique(values)
+        return labels.tolist(), lambda rows: np.searchsorted(labels, values[rows])
+
+    # Define aggregate; the shared group-by engine behind mpg_by_year and mpg_by_make
+    def aggregate(self, key, column='mpg'):
+        '''
+        Description:
+        Groups the data on a key column and computes the count, sum, mean, min, max and (population)
+        variance of a numeric column for every group. Missing values of the column are not counted.
+        Each statistic is computed with np.bincount and ufunc.at over blocks of AGGREGATE_CHUNK_SIZE
+        rows rather than row by row, so memory-mapped columns are read block by block. The result is
+        kept, so asking again for the same key and column (e.g. by later steps of a batch) is free. A
+        dataset read by from_partitioned answers mpg grouped by a partition column from its manifest;
+        where a group spans several partitions (e.g. by make in a dataset partitioned by year and make)
+        the partition sums are added in another order than the rows, so the sum and mean can differ
+        from those of the rows in the last digits (34.974999999999994 instead of 34.975).
+
+        Arguments:
+        self.
+        key (str): the column to group on; one of COLUMNS.
+        column (str): the numeric column to aggregate; one of NUMERIC_COLUMNS.
+
+        Returns:
+        dictionary where the keys are the values of the key column present in the data and the values are
+        dictionaries with the keys 'count', 'sum', 'mean', 'min', 'max' and 'var'.
+        '''
+        if column not in NUMERIC_COLUMNS:
+            raise ValueError(f"Cannot aggregate unknown column: {column}")
+
+        # Reuse a kept result, or answer from the manifest of a partitioned dataset; callers get their own copies of the statistics
+        if (key, column) in self._aggregates:
+            PROFILER.count('aggregates_reused')
+        elif self._manifest_covers(key, column):
+            PROFILER.count('aggregates_from_manifest')
+            self._aggregates[key, column] = self._manifest_aggregate(key)
+        else:
+            with PROFILER.stage('aggregate', rows=len(self)):
+                self._aggregates[key, column] = self._compute_aggregate(key, column)
+        return {label: dict(stats) for label, stats in self._aggregates[key, column].items()}
+
+    # Define _compute_aggregate; the work behind aggregate
+    def _compute_aggregate(self, key, column):
+        '''
+        Description:
+        Computes the statistics of aggregate without looking at the kept results.
+
+        Arguments:
+        self.
+        key (str): the column to group on; one of COLUMNS.
+        column (str): the numeric column to aggregate; one of NUMERIC_COLUMNS.
+
+        Returns:
+        dictionary as returned by aggregate.
+        '''
+        labels, codesFor = self._grouping(key)
+        numGroups = len(labels)
+        blocks = [slice(start, start + AGGREGATE_CHUNK_SIZE) for start in range(0, len(self), AGGREGATE_CHUNK_SIZE)]
+
+        # Define the function that reads the group codes and values of a block, leaving out missing values
+        def block(rows):
+            codes, values = codesFor(rows), self._columns[column][rows].astype(np.float64)
+            present = ~np.isnan(values)
+            if present.all():
+                return codes, values
+            return codes[present], values[present]
+
+        # Count, total, min and max per group
+        counts = np.zeros(numGroups, dtype=np.int64)
+        sums = np.zeros(numGroups)
+        mins = np.full(numGroups, np.inf)
+        maxs = np.full(numGroups, -np.inf)
+        for rows in blocks:
+            codes, values = block(rows)
+            counts += np.bincount(codes, minlength=numGroups)
+            sums += np.bincount(codes, weights=values, minlength=numGroups)
+            np.minimum.at(mins, codes, values)
+            np.maximum.at(maxs, codes, values)
+
+        # Mean per group; groups without rows (e.g. unused dictionary entries) are left out below
+        present = counts > 0
+        means = np.zeros(numGroups)
+        means[present] = sums[present] / counts[present]
+
+        # Variance per group from the deviations around the group mean (a second pass over the blocks)
+        squares = np.zeros(numGroups)
+        for rows in blocks:
+            codes, values = block(rows)
+            squares += np.bincount(codes, weights=(values - means[codes]) ** 2, minlength=numGroups)
+        variances = np.zeros(numGroups)
+        variances[present] = squares[present] / counts[present]
+
+        # Assemble the result with plain Python values
+        stats = zip(labels, counts.tolist(), sums.tolist(), means.tolist(), mins.tolist(), maxs.tolist(), variances.tolist())
+        return {label: {'count': count, 'sum': total, 'mean': mean, 'min': low, 'max': high, 'var': var}
+                for label, count, total, mean, low, high, var in stats if count > 0}
+
+    # Define rollup; the persisted cube of mpg over make, year, origin and cylinders
+    def rollup(self):
+        '''
+        Description:
+        Returns the RollupCube of the data file: read from auto-mpg.cube.npz if that was built from the
+        current data file with the same make aliases, otherwise built from every row of the data file
+        (whatever the filters of this dataset) and saved for later runs. A loaded dataset without filters
+        is built from directly; others load the data file first. With cache=False the cube is built in
+        memory every time, and auto-mpg.cube.npz is neither read nor written.
+
+        Arguments:
+        self.
+
+        Returns:
+        RollupCube object.
+        '''
+        if self.dataPath is None:
+            raise ValueError("A rollup is built from the data file; this dataset has none")
+        self._ensure_data()
+
+        cube = self._load_rollup() if self.cache else None
+        if cube is None:
+            if len(self) and not self._where:
+                source = self
+            else:
+                source = type(self)(self.dataPath, cache=self.cache, normalizer=self.normalizer)
+            with PROFILER.stage('aggregate', rows=len(source)):
+                cube = RollupCube.from_dataset(source)
+            PROFILER.count('rollups_built')
+            if self.cache:
+                self._write_rollup(cube)
+        return cube
+
+    # Define _load_rollup; read auto-mpg.cube.npz if it is up to date
+    def _load_rollup(self):
+        '''
+        Description:
+        Reads the rollup cube (auto-mpg.cube.npz) if it was built from the current data file with the current make aliases.
+
+        Arguments:
+        self.
+
+        Returns:
+        RollupCube object, or None if there is no up-to-date cube.
+        '''
+        logger = logging.getLogger()
+        cubePath = self._sibling_path('.cube.npz')
+        if not os.path.exists(cubePath):
+            return None
+
+        try:
+            with np.load(cubePath, allow_pickle=False) as arrays:
+                if int(arrays['version']) != ROLLUP_VERSION or str(arrays['aliases']) != self.normalizer.fingerprint() or not self._source_unchanged(arrays):
+                    logger.info(f"Rollup {cubePath} is stale")
+                    return None
+                cube = RollupCube.from_arrays(arrays)
+        except (OSError, ValueError, KeyError) as error:
+            # An unreadable cube is rebuilt from the data file
+            logger.warning(f"Ignoring unreadable rollup {cubePath}: {error}")
+            return None
+
+        PROFILER.count('rollup_hits')
+        return cube
+
+    # Define _write_rollup; save the cube to auto-mpg.cube.npz along with the signature of the data file
+    def _write_rollup(self, cube):
+        '''
+        Description:
+        Writes the rollup cube (auto-mpg.cube.npz), together with the signature of the data file and the
+        fingerprint of the make aliases it was built with.
+
+        Arguments:
+        self.
+        cube (RollupCube): the cube.
+
+        Returns:
+        None.
+        '''
+        logger = logging.getLogger()
+        cubePath = self._sibling_path('.cube.npz')
+
+        try:
+            # Write to a temporary file first so that readers never see a partial cube
+            with open(cubePath + '.tmp', 'wb') as file:
+                np.savez(file, version=ROLLUP_VERSION, aliases=self.normalizer.fingerprint(), **self._source_signature(), **cube.to_arrays())
+            os.replace(cubePath + '.tmp', cubePath)
+            logger.info(f"Wrote rollup {cubePath}")
+        except OSError as error:
+            # The cube is only an optimization; carry on without it
+            logger.warning(f"Could not write rollup {cubePath}: {error}")
+
+        return None
+
+    # Define mpg_by_year
+    def mpg_by_year(self, stream=False, workers=1, incremental=False, rollup=False):
+        '''
+        Description:
+        Returns a dictionary where the keys are the years that are present in the data and the 
+        values are the average MPG for all cars in that year.
+
+        Arguments:
+        self.
+        stream (bool): aggregate straight from the record stream instead of the loaded columns.
+        workers (int): when above 1, aggregate the data file in that many processes instead.
+        incremental (bool): update the persisted aggregates with the rows appended since the last call instead.
+        rollup (bool): answer from the rollup cube (see rollup) instead, if the filters are on its columns only.
+
+        Returns:
+        dictionary where the keys are years that are present in the data set and the values 
+        are the average MPG for all cars in that year.
+        '''
+        if incremental:
+            stats = self.incremental_aggregate('year')
+        elif workers > 1:
+            stats = self.parallel_aggregate('year', workers)
+        elif rollup and RollupCube.covers(['year'], self._where):
+            stats = self.rollup().aggregate('year', self._where)
+        else:
+            stats = self.stream_aggregate('year') if stream else self.aggregate('year')
+        return {year: yearStats['mean'] for year, yearStats in stats.items()}
+
+    # Define mpg_by_make
+    def mpg_by_make(self, stream=False, workers=1, incremental=False, rollup=False):
+        '''
+        Description:
+        Returns a dictionary where the keys are the makes that are present in the data and the values are the 
+        average MPG for all cars of that make.
+
+        Arguments:
+        self.
+        stream (bool): aggregate straight from the record stream instead of the loaded columns.
+        workers (int): when above 1, aggregate the data file in that many processes instead.
+        incremental (bool): update the persisted aggregates with the rows appended since the last call instead.
+        rollup (bool): answer from the rollup cube (see rollup) instead, if the filters are on its columns only.
+
+        Returns:
+        dictionary where the keys are the makes that are present in the data and the values are the 
+        average MPG for all cars of that make
+        '''
+        if incremental:
+            stats = self.incremental_aggregate('make')
+        elif workers > 1:
+            stats = self.parallel_aggregate('make', workers)
+        elif rollup and RollupCube.covers(['make'], self._where):
+            stats = self.rollup().aggregate('make', self._where)
+        else:
+            stats = self.stream_aggregate('make') if stream else self.aggregate('make')
+        return {make: makeStats['mean'] for make, makeStats in stats.items()}
+
+# Define AutoMPGQuery class; filters, groups and aggregates the columns of an AutoMPGData object
+class AutoMPGQuery:
+    """
+    Description:
+    A query over an AutoMPGData object, built by chaining where, group_by and agg:
+    data.where("year>=76", "origin==1").group_by(["make", "year"]).agg(mpg="mean").
+    Queries are evaluated over whole columns; no AutoMPG objects are built unless the
+    query itself is iterated over.
+
+    Arguments:
+        dataset (AutoMPGData): the data to query.
+        predicates (tuple): Predicate objects that rows must match.
+        keys (tuple): the columns to group on.
+
+    Methods:
+        where(self, *predicates):
+            Returns a query with more filters.
+
+        group_by(self, keys):
+            Returns a query grouping on keys.
+
+        rows(self):
+            Returns the indexes of the matching rows.
+
+        __iter__(self), __len__(self):
+            Iterate over and count the matching rows as AutoMPG objects.
+
+        agg(self, **aggregations):
+            Computes statistics of numeric columns per group.
+    """
+
+    # Statistics that agg can compute
+    STATISTICS = ('count', 'sum', 'mean', 'min', 'max', 'var')
+
+    # Define __init__; store the dataset, filters and group keys
+    def __init__(self, dataset, predicates=(), keys=()):
+        '''
+        Description:
+        Initializes an AutoMPGQuery.
+
+        Arguments:
+        dataset (AutoMPGData): the data to query.
+        predicates (tuple): Predicate objects that rows must match.
+        keys (tuple): the columns to group on.
+
+        Returns:
+        None.
+        '''
+        self._dataset = dataset
+        self._predicates = tuple(predicates)
+        self._keys = tuple(keys)
+        return None
+
+    # Define where; add filters
+    def where(self, *predicates):
+        '''
+        Description:
+        Returns a query that also requires rows to match predicates.
+
+        Arguments:
+        self.
+        *predicates (str or Predicate): the filters.
+
+        Returns:
+        AutoMPGQuery object.
+        '''
+        return AutoMPGQuery(self._dataset, self._predicates + tuple(parsePredicate(predicate) for predicate in predicates), self._keys)
+
+    # Define group_by; set the group keys
+    def group_by(self, keys):
+        '''
+        Description:
+        Returns a query grouping on keys.
+
+        Arguments:
+        self.
+        keys (str or list): the column(s) to group on.
+
+        Returns:
+        AutoMPGQuery object.
+        '''
+        keys = (keys,) if isinstance(keys, str) else tuple(keys)
+        for key in keys:
+            if key not in COLUMNS:
+                raise ValueError(f"Cannot group by unknown column: {key}")
+        return AutoMPGQuery(self._dataset, self._predicates, keys)
+
+    # Define rows; the indexes of the rows matching the filters
+    def rows(self):
+        '''
+        Description:
+        Returns the indexes (in file order) of the rows matching every filter.
+
+        Arguments:
+        self.
+
+        Returns:
+        numpy.ndarray of row indexes.
+        '''
+        return np.flatnonzero(self._dataset._mask(self._predicates))
+
+    # Define __iter__; the matching rows as AutoMPG objects
+    def __iter__(self):
+        '''
+        Description:
+        Lazily yields the matching rows as AutoMPG objects, in file order.
+
+        Arguments:
+        self.
+
+        Returns:
+        An iterator of AutoMPG objects.
+        '''
+        return iter(AutoMPGView(self._dataset, self.rows()))
+
+    # Define __len__; the number of matching rows
+    def __len__(self):
+        '''
+        Description:
+        Returns the number of rows matching every filter.
+
+        Arguments:
+        self.
+
+        Returns:
+        int: the number of matching rows.
+        '''
+        return int(self._dataset._mask(self._predicates).sum())
+
+    # Define agg; compute statistics per group
+    def agg(self, **aggregations):
+        '''
+        Description:
+        Computes statistics of numeric columns over the matching rows, per group. Each keyword names a
+        numeric column and gives one statistic ('count', 'sum', 'mean', 'min', 'max', 'var') or a list
+        of them, e.g. agg(mpg="mean", weight=["min", "max"]). Missing values are left out.
+
+        Arguments:
+        self.
+        **aggregations (str or list): statistics per column.
+
+        Returns:
+        dictionary where the keys are the groups (a tuple of key values, or the value itself when grouping
+        on one column, or None without group_by) and the values are dictionaries of results. A result is
+        named after its column for a single statistic, and "<column>_<statistic>" for a list.
+        '''
+        with PROFILER.stage('aggregate', rows=len(self._dataset)):
+            return self._compute_agg(aggregations)
+
+    # Define _compute_agg; the work behind agg
+    def _compute_agg(self, aggregations):
+        '''
+        Description:
+        Computes the results of agg.
+
+        Arguments:
+        self.
+        aggregations (dict): statistics per column, as passed to agg.
+
+        Returns:
+        dictionary as returned by agg.
+        '''
+        dataset = self._dataset
+
+        # Find the matching rows, then combine the codes of every group key into a single group code
+        rows = self.rows()
+        groupings = [dataset._grouping(key) for key in self._keys]
+        dims = [max(len(labels), 1) for labels, _ in groupings]
+        combined = np.ravel_multi_index([codesFor(rows) for _, codesFor in groupings], dims) if groupings else np.zeros(len(rows), dtype=np.intp)
+        groupCodes, codes = np.unique(combined, return_inverse=True)
+        numGroups = len(groupCodes)
+
+        # Name the groups by their key values
+        if groupings:
+            keyCodes = np.unravel_index(groupCodes, dims)
+            groups = [tuple(labels[code] for (labels, _), code in zip(groupings, codesOfGroup))
+                      for codesOfGroup in zip(*[keyCode.tolist() for keyCode in keyCodes])]
+            if len(self._keys) == 1:
+                groups = [group[0] for group in groups]
+        else:
+            groups = [None] * numGroups
+        results = {group: {} for group in groups}
+
+        for column, statistics in aggregations.items():
+            if column not in NUMERIC_COLUMNS:
+                raise ValueError(f"Cannot aggregate unknown column: {column}")
+            single = isinstance(statistics, str)
+            wanted = [statistics] if single else list(statistics)
+            for statistic in wanted:
+                if statistic not in self.STATISTICS:
+                    raise ValueError(f"Unknown statistic: {statistic}; expected one of {', '.join(self.STATISTICS)}")
+
+            # Leave out missing values of this column
+            values = dataset._columns[column][rows].astype(np.float64)
+            present = ~np.isnan(values)
+            columnCodes, values = codes[present], values[present]
+
+            # Compute every statistic per group in one pass each
+            counts = np.bincount(columnCodes, minlength=numGroups)
+            sums = np.bincount(columnCodes, weights=values, minlength=numGroups)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                means = sums / counts
+            computed = {'count': counts, 'sum': sums, 'mean': means}
+            if 'min' in wanted or 'max' in wanted:
+                computed['min'] = np.full(numGroups, np.nan)
+                computed['max'] = np.full(numGroups, np.nan)
+                computed['min'][counts > 0] = np.inf
+                computed['max'][counts > 0] = -np.inf
+                np.fmin.at(computed['min'], columnCodes, values)
+                np.fmax.at(computed['max'], columnCodes, values)
+            if 'var' in wanted:
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    computed['var'] = np.bincount(columnCodes, weights=(values - means[columnCodes]) ** 2, minlength=numGroups) / counts
+
+            # Store the results under the names of the statistics
+            for statistic in wanted:
+                name = column if single else f"{column}_{statistic}"
+                for group, value in zip(groups, computed[statistic].tolist()):
+                    results[group][name] = value
+
+        return results
+
+# Define QuantileSketch class; a mergeable, bounded-memory estimate of the distribution of a stream of numbers
+class QuantileSketch:
+    """
+    Description:
+    Estimates quantiles of a stream of numbers in memory that does not depend on its length. Values
+    are counted in logarithmic buckets (as in DDSketch), so every quantile is returned within a
+    relative error of relativeAccuracy of a value of the stream; min and max are exact. Two sketches
+    with the same accuracy can be merged, e.g. the sketches of byte ranges aggregated in parallel.
+
+    Arguments:
+        relativeAccuracy (float): the largest relative error of a quantile.
+
+    Methods:
+        add(self, value):
+            Counts a value.
+
+        merge(self, other):
+            Adds the counts of another sketch.
+
+        quantile(self, q):
+            Returns the estimated q-quantile.
+    """
+
+    # Define __init__; empty buckets
+    def __init__(self, relativeAccuracy=0.01):
+        '''
+        Description:
+        Initializes an empty QuantileSketch.
+
+        Arguments:
+        self.
+        relativeAccuracy (float): the largest relative error of a quantile, between 0 and 1.
+
+        Returns:
+        None.
+        '''
+        self.relativeAccuracy = relativeAccuracy
+        self._gamma = (1 + relativeAccuracy) / (1 - relativeAccuracy)
+        self._logGamma = math.log(self._gamma)
+
+        # Counts per bucket of positive values and of the magnitudes of negative values, and the count of zeros
+        self._positive = Counter()
+        self._negative = Counter()
+        self._zeros = 0
+        self.count = 0
+        self.min = float('inf')
+        self.max = float('-inf')
+        return None
+
+    # Define add; count a value
+    def add(self, value):
         '''
         Description:
-        Sorts the data by default order.
-        
+        Counts a value.
+
         Arguments:
         self.
-        
+        value (float): the value.
+
         Returns:
         None.
         '''
-        logger = logging.getLogger()
-        logger.info("sort_by_default function used")
-        list.sort(self.data)
+        if value > 0:
+            self._positive[math.ceil(math.log(value) / self._logGamma)] += 1
+        elif value < 0:
+            self._negative[math.ceil(math.log(-value) / self._logGamma)] += 1
+        else:
+            self._zeros += 1
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
         return None
-    
-    # Define sort_by_year method for sorting the data by year
-    def sort_by_year(self):
+
+    # Define merge; add the counts of another sketch
+    def merge(self, other):
         '''
         Description:
-        Sorts the data by year, make, model, then mpg. Creates keyword parameters to ensure proper sorting pattern.
-        
+        Adds the counts of another sketch with the same relative accuracy.
+
         Arguments:
         self.
+        other (QuantileSketch): the sketch to add.
 
         Returns:
-        None
+        None.
         '''
-        logger = logging.getLogger()
-        logger.info("sort_by_year function used")
-        # Creating a tuple holdin the keys for year, make, model, mpg
-        list.sort(self.data, key=lambda x: (x.year, x.make, x.model, x.mpg))
+        if other.relativeAccuracy != self.relativeAccuracy:
+            raise ValueError("Cannot merge sketches with different accuracies")
+        self._positive.update(other._positive)
+        self._negative.update(other._negative)
+        self._zeros += other._zeros
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
         return None
-    
-    # Define sort_by_mpg method for sorting the data by MPG
-    def sort_by_mpg(self):
+
+    # Define quantile; walk the buckets in order up to the rank of q
+    def quantile(self, q):
         '''
         Description:
-        Sorts the data by mpg, make, model, then year. Creates keyword parameters to ensure proper sorting pattern.
-        
+        Returns the estimated q-quantile (the value of rank q * (count - 1)), or NaN for an empty sketch.
+
         Arguments:
         self.
-        
+        q (float): the quantile, between 0 and 1.
+
+        Returns:
+        float.
+        '''
+        if self.count == 0:
+            return float('nan')
+        if q <= 0:
+            return self.min
+        rank = q * (self.count - 1)
+
+        # Bucket values are clamped to the exact min and max
+        def clamp(value):
+            return min(self.max, max(self.min, value))
+
+        # Buckets in increasing order of value: negative buckets by decreasing magnitude, zeros, then positive buckets
+        seen = 0
+        for index in sorted(self._negative, reverse=True):
+            seen += self._negative[index]
+            if seen > rank:
+                return clamp(-2 * self._gamma ** index / (self._gamma + 1))
+        seen += self._zeros
+        if seen > rank:
+            return clamp(0.0)
+        for index in sorted(self._positive):
+            seen += self._positive[index]
+            if seen > rank:
+                return clamp(2 * self._gamma ** index / (self._gamma + 1))
+        return self.max
+
+# Define RollupCube class; count, sum, min and max of mpg pre-aggregated over make, year, origin and cylinders
+class RollupCube:
+    """
+    Description:
+    The count, sum, min and max of mpg for every combination of the ROLLUP_COLUMNS values present in
+    the data (the cells), and the statistics of each of those columns on its own (the margins). Any
+    grouping on some of ROLLUP_COLUMNS, filtered on them, is derived by adding up cells, which takes
+    microseconds because there are at most a few thousand of them; sums added up from cells can
+    differ from aggregate in the last digits. The margins are computed from the rows by aggregate,
+    so mpg by one column without filters is identical to aggregate.
+
+    Methods:
+        __init__(self, labels, keys, stats, margins):
+            Initializes a cube from its cells and margins.
+
+        from_dataset(cls, dataset):
+            Builds the cube of a loaded dataset.
+
+        from_arrays(cls, arrays):
+            Rebuilds a cube from the arrays of to_arrays.
+
+        to_arrays(self):
+            Returns the cube as NumPy arrays, for np.savez.
+
+        covers(keys, where):
+            Returns whether a grouping and filters can be answered from a cube.
+
+        aggregate(self, keys, where=()):
+            Returns the count, sum, mean, min and max of mpg per group.
+    """
+
+    # Define __init__
+    def __init__(self, labels, keys, stats, margins):
+        '''
+        Description:
+        Initializes a cube from its cells and margins.
+
+        Arguments:
+        self.
+        labels (dict): per column of ROLLUP_COLUMNS, the list of values its codes stand for.
+        keys (numpy.ndarray): one row of codes (one per column of ROLLUP_COLUMNS) per cell.
+        stats (numpy.ndarray): one row of count, sum, min and max of mpg per cell.
+        margins (dict): per column, a dictionary of the count, sum, mean, min and max of mpg per value.
+
         Returns:
         None.
         '''
-        logger = logging.getLogger()
-        logger.info("sort_by_mpg function used")
-        # Creating a tuple holdin the keys for mpg, make, model, year
-        list.sort(self.data, key=lambda x: (x.mpg, x.make, x.model, x.year))
+        self.labels = labels
+        self.keys = keys
+        self.stats = stats
+        self.margins = margins
         return None
 
-    # Define _get_data method for getting information from the internet
-    def _get_data(self):
+    # Define from_dataset
+    @classmethod
+    def from_dataset(cls, dataset):
+        '''
+        Description:
+        Builds the cube of a loaded dataset in one pass of np.unique and np.bincount over the rows with an mpg.
+
+        Arguments:
+        cls.
+        dataset (AutoMPGData): the loaded dataset.
+
+        Returns:
+        RollupCube object.
+        '''
+        # The codes of every row in each column, for the rows with an mpg
+        mpg = np.asarray(dataset._columns['mpg'], dtype=np.float64)
+        present = ~np.isnan(mpg)
+        groupings = [dataset._grouping(column) for column in ROLLUP_COLUMNS]
+        codes = np.stack([np.asarray(codesFor(slice(None)), dtype=np.intp)[present] for _, codesFor in groupings], axis=1)
+        values = mpg[present]
+
+        # One cell per distinct combination of codes
+        keys, cells = np.unique(codes, axis=0, return_inverse=True)
+        cells = cells.reshape(-1)
+        mins = np.full(len(keys), np.inf)
+        maxs = np.full(len(keys), -np.inf)
+        np.minimum.at(mins, cells, values)
+        np.maximum.at(maxs, cells, values)
+        stats = np.column_stack([np.bincount(cells, minlength=len(keys)), np.bincount(cells, weights=values, minlength=len(keys)), mins, maxs])
+
+        # The margins come straight from the rows
+        margins = {column: {label: {name: groupStats[name] for name in ('count', 'sum', 'mean', 'min', 'max')}
+                            for label, groupStats in dataset.aggregate(column).items()} for column in ROLLUP_COLUMNS}
+        return cls({column: list(labels) for column, (labels, _) in zip(ROLLUP_COLUMNS, groupings)}, keys, stats, margins)
+
+    # Define from_arrays
+    @classmethod
+    def from_arrays(cls, arrays):
+        '''
+        Description:
+        Rebuilds a cube from the arrays written by to_arrays.
+
+        Arguments:
+        cls.
+        arrays (mapping): the arrays, e.g. an opened .npz file.
+
+        Returns:
+        RollupCube object.
+        '''
+        margins = {}
+        for column in ROLLUP_COLUMNS:
+            rows = arrays[column + 'MarginStats'].tolist()
+            margins[column] = {label: {'count': int(row[0]), 'sum': row[1], 'mean': row[2], 'min': row[3], 'max': row[4]}
+                               for label, row in zip(arrays[column + 'MarginLabels'].tolist(), rows)}
+        return cls({column: arrays[column + 'Labels'].tolist() for column in ROLLUP_COLUMNS}, arrays['keys'], arrays['stats'], margins)
+
+    # Define to_arrays
+    def to_arrays(self):
+        '''
+        Description:
+        Returns the cube as NumPy arrays (make values as strings), so that it can be saved with np.savez.
+
+        Arguments:
+        self.
+
+        Returns:
+        dictionary of numpy.ndarray objects.
+        '''
+        arrays = {'keys': self.keys, 'stats': self.stats}
+        for column in ROLLUP_COLUMNS:
+            dtype = str if column == 'make' else np.int64
+            margin = self.margins[column]
+            arrays[column + 'Labels'] = np.array(self.labels[column], dtype=dtype)
+            arrays[column + 'MarginLabels'] = np.array(list(margin), dtype=dtype)
+            arrays[column + 'MarginStats'] = np.array([[stats['count'], stats['sum'], stats['mean'], stats['min'], stats['max']]
+                                                       for stats in margin.values()], dtype=np.float64).reshape(-1, 5)
+        return arrays
+
+    # Define covers
+    @staticmethod
+    def covers(keys, where):
+        '''
+        Description:
+        Returns whether a grouping and filters only involve ROLLUP_COLUMNS, so that a cube can answer them.
+
+        Arguments:
+        keys (iterable): the columns to group on.
+        where (iterable): predicates (Predicate objects or text).
+
+        Returns:
+        bool.
+        '''
+        return all(key in ROLLUP_COLUMNS for key in keys) and all(parsePredicate(predicate).column in ROLLUP_COLUMNS for predicate in where)
+
+    # Define aggregate
+    def aggregate(self, keys, where=()):
+        '''
+        Description:
+        Returns the count, sum, mean, min and max of mpg per group of some of ROLLUP_COLUMNS, over the
+        rows matching filters on ROLLUP_COLUMNS. One column without filters is read from the margins;
+        anything else is added up from the matching cells.
+
+        Arguments:
+        self.
+        keys (str or list): the column, or list of columns, to group on.
+        where (iterable): predicates (Predicate objects or text) on ROLLUP_COLUMNS.
+
+        Returns:
+        dictionary where the keys are the groups (the value, or a tuple of values for a list of columns)
+        and the values are dictionaries with the keys 'count', 'sum', 'mean', 'min' and 'max'.
+        '''
+        single = isinstance(keys, str)
+        keys = [keys] if single else list(keys)
+        predicates = [parsePredicate(predicate) for predicate in where]
+        if not self.covers(keys, predicates):
+            raise ValueError(f"A rollup can only group and filter on {', '.join(ROLLUP_COLUMNS)}")
+        if single and not predicates:
+            return {label: dict(stats) for label, stats in self.margins[keys[0]].items()}
+
+        # Keep the cells whose values match every filter
+        keep = np.ones(len(self.keys), dtype=bool)
+        for predicate in predicates:
+            labels = self.labels[predicate.column]
+            matching = np.array([PREDICATE_OPERATORS[predicate.op](label, predicate.value) for label in labels], dtype=bool)
+            keep &= matching[self.keys[:, ROLLUP_COLUMNS.index(predicate.column)]] if len(labels) else False
+
+        # Add up the kept cells per group, numbering the groups by their codes raveled into one integer
+        shape = tuple(max(len(self.labels[key]), 1) for key in keys)
+        codes = np.ravel_multi_index(tuple(self.keys[keep][:, ROLLUP_COLUMNS.index(key)] for key in keys), shape)
+        groupCodes, groups = np.unique(codes, return_inverse=True)
+        groupKeys = np.stack(np.unravel_index(groupCodes, shape), axis=1)
+        stats = self.stats[keep]
+        counts = np.bincount(groups, weights=stats[:, 0], minlength=len(groupKeys))
+        sums = np.bincount(groups, weights=stats[:, 1], minlength=len(groupKeys))
+        mins = np.full(len(groupKeys), np.inf)
+        maxs = np.full(len(groupKeys), -np.inf)
+        np.minimum.at(mins, groups, stats[:, 2])
+        np.maximum.at(maxs, groups, stats[:, 3])
+
+        results = {}
+        labels = [self.labels[key] for key in keys]
+        for codes, count, total, low, high in zip(groupKeys.tolist(), counts.tolist(), sums.tolist(), mins.tolist(), maxs.tolist()):
+            group = tuple(columnLabels[code] for columnLabels, code in zip(labels, codes))
+            results[group[0] if single else group] = {'count': int(count), 'sum': total, 'mean': total / count, 'min': low, 'max': high}
+        return results
+
+# Define AutoMPGServer class; keeps the dataset loaded and answers the commands over HTTP
+class AutoMPGServer:
+    """
+    Description:
+    Loads an AutoMPGData object once and answers the print, mpg_by_year, mpg_by_make and query
+    commands with the same CSV output as the command line. Each answer is kept, keyed by the command
+    and its parameters, and reused until the data file changes (a different size or modification
+    time), when the dataset is loaded again and the kept answers are dropped.
+
+    Requests are GET /<command>?<parameters>, with the parameters of the command line:
+    sort (print), where (may be repeated), group_by and agg (query, may be repeated), e.g.
+    GET /query?where=year>=76&group_by=make&agg=mpg=mean,max.
+
+    Arguments:
+        dataPath (str): path of the raw data file.
+        cache (bool): read and write the binary cache of the parsed columns.
+        normalizer (MakeNormalizer or None): the make-normalization stage.
+        where (iterable): predicates every answer is restricted to, before the where parameters of a request.
+
+    Methods:
+        answer(self, command, parameters):
+            Returns the output of a command as bytes, computing it only if it is not kept.
+
+        make_server(self, host, port):
+            Returns an HTTP server that answers requests through this object.
+
+        serve(self, host, port):
+            Answers requests until interrupted.
+    """
+
+    # Commands the server answers
+    COMMANDS = ('print', 'mpg_by_year', 'mpg_by_make', 'query')
+
+    # Define __init__; nothing is loaded until the first request
+    def __init__(self, dataPath='auto-mpg.data.txt', cache=True, normalizer=None, where=()):
+        '''
+        Description:
+        Initializes an AutoMPGServer.
+
+        Arguments:
+        self.
+        dataPath (str): path of the raw data file.
+        cache (bool): read and write the binary cache of the parsed columns.
+        normalizer (MakeNormalizer or None): the make-normalization stage.
+        where (iterable): predicates (Predicate objects or text) every answer is restricted to.
+
+        Returns:
+        None.
+        '''
+        self.dataPath = dataPath
+        self.cache = cache
+        self.normalizer = normalizer
+        self.where = tuple(where)
+
+        # The loaded dataset, the (size, mtime) of the data file it was loaded from, and the kept answers
+        self._dataset = None
+        self._signature = None
+        self._answers = {}
+
+        # Requests are answered by several threads; loading and the kept answers are shared between them
+        self._lock = threading.Lock()
+        return None
+
+    # Define _current; the dataset, loaded again if the data file changed
+    def _current(self):
+        '''
+        Description:
+        Returns the loaded dataset, loading it (again) if the data file changed since it was loaded,
+        in which case the kept answers are dropped. Must be called with the lock held.
+
+        Arguments:
+        self.
+
+        Returns:
+        AutoMPGData object.
+        '''
+        signature = None
+        if os.path.exists(self.dataPath):
+            status = os.stat(self.dataPath)
+            signature = (status.st_size, status.st_mtime_ns)
+
+        if self._dataset is None or signature != self._signature:
+            logging.getLogger().info(f"Loading {self.dataPath} for the server")
+            self._dataset = AutoMPGData(self.dataPath, cache=self.cache, normalizer=self.normalizer, where=self.where)
+            status = os.stat(self.dataPath)
+            self._signature = (status.st_size, status.st_mtime_ns)
+            self._answers = {}
+        return self._dataset
+
+    # Define answer; the output of a command, kept for the next identical request
+    def answer(self, command, parameters):
+        '''
+        Description:
+        Returns the CSV output of a command, computing it only the first time it is asked for since the
+        data file last changed. Raises ValueError for an unknown command or bad parameters.
+
+        Arguments:
+        self.
+        command (str): one of COMMANDS.
+        parameters (dict): lists of values per parameter name, as returned by urllib.parse.parse_qs.
+
+        Returns:
+        bytes: the output, encoded as UTF-8.
+        '''
+        if command not in self.COMMANDS:
+            raise ValueError(f"Unknown command: {command}")
+        key = (command, tuple(sorted((name, tuple(values)) for name, values in parameters.items())))
+
+        with self._lock:
+            dataset = self._current()
+            if key not in self._answers:
+                self._answers[key] = self._run(dataset, command, parameters).encode('utf-8')
+            return self._answers[key]
+
+    # Define _run; compute the output of a command
+    def _run(self, dataset, command, parameters):
+        '''
+        Description:
+        Computes the CSV output of a command over the rows of the dataset matching the where parameters.
+
+        Arguments:
+        self.
+        dataset (AutoMPGData): the loaded dataset.
+        command (str): one of COMMANDS.
+        parameters (dict): lists of values per parameter name.
+
+        Returns:
+        str: the output.
+        '''
+        # Work on the matching rows only; the loaded dataset itself is left as it is
+        predicates = [parsePredicate(predicate) for predicate in parameters.get('where', [])]
+        if predicates:
+            loaded, dataset = dataset, AutoMPGData(dataPath=None, load=False)
+            dataset._columns, dataset._makes, dataset._models = loaded._columns, loaded._makes, loaded._models
+            dataset._keep_rows(loaded._mask(predicates))
+
+        output = io.StringIO()
+        if command == 'print':
+            sortOrder = parameters.get('sort', ['default'])[-1]
+            if sortOrder not in SORT_ORDERS:
+                raise ValueError(f"Unknown sort order: {sortOrder}")
+            writeCsv(output, ['Make', 'Model', 'Year', 'MPG'], dataset.ordered(sortOrder).iter_chunks())
+        elif command == 'mpg_by_year':
+            writeAverages(output, ['Year', 'Average MPG'], dataset.mpg_by_year())
+        elif command == 'mpg_by_make':
+            writeAverages(output, ['Make', 'Average MPG'], dataset.mpg_by_make())
+        else:
+            keys = [key for keys in parameters.get('group_by', []) for key in keys.split(',') if key]
+            aggregations = parseAggregations(parameters.get('agg', []))
+            writeQuery(output, keys, aggregations, dataset.group_by(keys).agg(**aggregations))
+        return output.getvalue()
+
+    # Define make_server; an HTTP server answering through this object
+    def make_server(self, host='127.0.0.1', port=8000):
+        '''
+        Description:
+        Returns a threading HTTP server bound to host and port (0 picks a free port) that answers
+        requests through this object; call serve_forever on it to start answering.
+
+        Arguments:
+        self.
+        host (str): the address to listen on.
+        port (int): the port to listen on.
+
+        Returns:
+        http.server.ThreadingHTTPServer object.
+        '''
+        # http.server is only imported by the serve command, since it adds to the start-up time of every other command
+        import http.server
+        autoMPGServer = self
+
+        # Define AutoMPGRequestHandler class; turns HTTP requests into calls of answer
+        class AutoMPGRequestHandler(http.server.BaseHTTPRequestHandler):
+            """
+            Description:
+            Answers GET /<command>?<parameters> with the CSV output of AutoMPGServer.answer: 404 for an
+            unknown command and 400 for bad parameters.
+
+            Methods:
+                do_GET(self):
+                    Answers a GET request.
+
+                log_message(self, format, *args):
+                    Logs requests at DEBUG level instead of writing them to stderr.
+            """
+
+            # Define do_GET; answer a request
+            def do_GET(self):
+                '''
+                Description:
+                Answers a GET request.
+
+                Arguments:
+                self.
+
+                Returns:
+                None.
+                '''
+                url = urlsplit(self.path)
+                command = url.path.strip('/')
+                if command not in AutoMPGServer.COMMANDS:
+                    self.send_error(404, f"Unknown command: {command}")
+                    return None
+                try:
+                    body = autoMPGServer.answer(command, parse_qs(url.query))
+                except ValueError as error:
+                    self.send_error(400, str(error))
+                    return None
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/csv; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return None
+
+            # Define log_message; requests go to the log file rather than stderr
+            def log_message(self, format, *args):
+                '''
+                Description:
+                Logs requests at DEBUG level instead of writing them to stderr.
+
+                Arguments:
+                self.
+                format (str): the message format.
+                *args: the values of the message.
+
+                Returns:
+                None.
+                '''
+                logging.getLogger().debug(f"{self.address_string()} - {format % args}")
+                return None
+
+        return http.server.ThreadingHTTPServer((host, port), AutoMPGRequestHandler)
+
+    # Define serve; answer requests until interrupted
+    def serve(self, host='127.0.0.1', port=8000):
         '''
         Description:
-        Gets auto-mpg.data.txt from the internet if the dataset is not locally present.
+        Loads the dataset and answers requests on host and port until interrupted.
 
         Arguments:
         self.
+        host (str): the address to listen on.
+        port (int): the port to listen on.
+
+        Returns:
+        None.
+        '''
+        logger = logging.getLogger()
+        with self._lock:
+            self._current()
+        with self.make_server(host, port) as server:
+            logger.info(f"Serving {self.dataPath} on http://{host}:{server.server_address[1]}")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                logger.info("Server stopped")
+        return None
+
+# Define the worker function of AutoMPGData.parallel_aggregate (module level so that it can be pickled)
+def _stream_aggregate_range(dataPath, key, start, end, column='mpg', where=(), normalizer=None):
+    '''
+    Description:
+    Aggregates one byte range of a data file; runs in a worker process of AutoMPGData.parallel_aggregate.
+
+    Arguments:
+    dataPath (str): path of the raw data file.
+    key (str): the column to group on; one of COLUMNS.
+    start (int): byte offset to start reading at.
+    end (int): byte offset to stop reading at.
+    column (str): the numeric column to aggregate.
+    where (tuple): predicates that rows must match.
+
+    Returns:
+    dictionary of statistics per group, as returned by AutoMPGData.stream_aggregate.
+    '''
+    return AutoMPGData(dataPath, load=False, where=where, normalizer=normalizer).stream_aggregate(key, start, end, column)
+
+# Define the function that downloads a file
+def fetchFile(url, path, sha256=None, metadataPath=None, timeout=FETCH_TIMEOUT, retries=FETCH_RETRIES):
+    '''
+    Description:
+    Downloads url to path, streaming the body to disk in FETCH_CHUNK_SIZE blocks:
+    - the body goes to path + '.part', which replaces path only once it is complete and its SHA-256
+      hash matches sha256 (if given); on a mismatch the partial file is removed and ValueError is raised;
+    - a dropped connection, a timeout or a 5xx response is retried up to retries times with exponential
+      backoff, resuming with an HTTP Range request (and If-Range) from the bytes already on disk; a 416
+      response (the partial file does not fit) restarts the download, which also counts as a retry;
+    - the ETag and Last-Modified of the download are saved in metadataPath, and sent as If-None-Match
+      and If-Modified-Since the next time, so an unchanged file is not downloaded again.
+
+    Arguments:
+    url (str): the file to download.
+    path (str): where to store it.
+    sha256 (str or None): the expected hex digest of the file.
+    metadataPath (str or None): the JSON file of the validators; path + '.fetch.json' if None.
+    timeout (float): seconds to wait for the server to connect or send data.
+    retries (int): the number of retries.
+
+    Returns:
+    bool: True if the file was downloaded, False if the server reported it unchanged.
+    '''
+    import requests
+    logger = logging.getLogger()
+    partPath = path + '.part'
+    metadataPath = metadataPath or path + '.fetch.json'
+
+    # Validators of the complete file, and of the partial download under 'partial'
+    metadata = {}
+    if os.path.exists(metadataPath):
+        try:
+            with open(metadataPath) as file:
+                metadata = json.load(file)
+        except (OSError, ValueError):
+            metadata = {}
+
+    # Define the function that saves the validators
+    def saveMetadata():
+        with open(metadataPath, 'w') as file:
+            json.dump(metadata, file)
+
+    attempt = 0
+    while True:
+        # Ask for the raw bytes, so that byte offsets of a resumed download match the file
+        headers = {'Accept-Encoding': 'identity'}
+        offset = os.path.getsize(partPath) if os.path.exists(partPath) else 0
+        if offset:
+            # Resume the partial download, unless the file changed since it started
+            headers['Range'] = f"bytes={offset}-"
+            validator = metadata.get('partial', {}).get('etag') or metadata.get('partial', {}).get('lastModified')
+            if validator:
+                headers['If-Range'] = validator
+        elif os.path.exists(path):
+            # Only download the file again if it changed
+            if metadata.get('etag'):
+                headers['If-None-Match'] = metadata['etag']
+            if metadata.get('lastModified'):
+                headers['If-Modified-Since'] = metadata['lastModified']
+
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 304:
+                    logger.info(f"{url} is not modified since the last download")
+                    return False
+                if response.status_code == 416 and attempt < retries:
+                    # The partial file does not fit the file on the server; start over
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(partPath)
+                    attempt += 1
+                    continue
+                response.raise_for_status()
+
+                # 206 continues the partial file; any other success starts it over
+                if response.status_code == 206:
+                    mode = 'ab'
+                    logger.info(f"Resuming download of {url} at byte {offset}")
+                else:
+                    mode = 'wb'
+                    metadata['partial'] = {'etag': response.headers.get('ETag'), 'lastModified': response.headers.get('Last-Modified')}
+                    saveMetadata()
+
+                with open(partPath, mode) as file:
+                    for chunk in response.iter_content(FETCH_CHUNK_SIZE):
+                        file.write(chunk)
+            break
+
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError, requests.HTTPError) as error:
+            # Client errors will not go away by retrying
+            if isinstance(error, requests.HTTPError) and error.response.status_code < 500 or attempt >= retries:
+                raise
+            logger.warning(f"Download of {url} failed ({error}); retrying")
+            time.sleep(FETCH_BACKOFF * 2 ** attempt)
+            attempt += 1
+
+    # Check the complete file before it replaces the old one
+    if sha256 is not None:
+        digest = AutoMPGData._file_hash(partPath)
+        if digest != sha256:
+            os.remove(partPath)
+            raise ValueError(f"Checksum mismatch for {url}: expected {sha256}, got {digest}")
+    os.replace(partPath, path)
+
+    # The validators of the partial download now belong to the complete file
+    metadata = metadata.get('partial', {})
+    saveMetadata()
+    logger.info(f"Downloaded {url} to {path} ({os.path.getsize(path)} bytes)")
+    return True
+
+# Define the function that downloads the shards of a file at the same time
+def fetchShards(urls, path, sha256=None, timeout=FETCH_TIMEOUT, retries=FETCH_RETRIES):
+    '''
+    Description:
+    Downloads the shards of a file concurrently, each with fetchFile in a thread of an asyncio event
+    loop, then joins them in the order of urls into path. The SHA-256 hash (if given) is checked on the
+    joined file; the shards and their validators are removed afterwards.
+
+    Arguments:
+    urls (list): the shards, in order.
+    path (str): where to store the joined file.
+    sha256 (str or None): the expected hex digest of the joined file.
+    timeout (float): seconds to wait for a server to connect or send data.
+    retries (int): the number of retries per shard.
+
+    Returns:
+    None.
+    '''
+    import asyncio
+    shardPaths = [f"{path}.shard{index}" for index in range(len(urls))]
+
+    # Download every shard at the same time; the first failure is raised once all have finished
+    async def fetchAll():
+        return await asyncio.gather(*(asyncio.to_thread(fetchFile, url, shardPath, None, None, timeout, retries)
+                                      for url, shardPath in zip(urls, shardPaths)), return_exceptions=True)
+    for result in asyncio.run(fetchAll()):
+        if isinstance(result, BaseException):
+            raise result
+
+    # Join the shards, checking the hash before the joined file replaces the old one
+    digest = hashlib.sha256()
+    with open(path + '.part', 'wb') as joined:
+        for shardPath in shardPaths:
+            with open(shardPath, 'rb') as shard:
+                for chunk in iter(lambda: shard.read(FETCH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    joined.write(chunk)
+    for shardPath in shardPaths:
+        os.remove(shardPath)
+        os.remove(shardPath + '.fetch.json')
+    if sha256 is not None and digest.hexdigest() != sha256:
+        os.remove(path + '.part')
+        raise ValueError(f"Checksum mismatch for {path}: expected {sha256}, got {digest.hexdigest()}")
+    os.replace(path + '.part', path)
 
-        Returns:
-        None.
-        '''
-        # Get the logger
-        logger = logging.getLogger()
+    logging.getLogger().info(f"Downloaded {len(urls)} shards to {path}")
+    return None
 
-        # Get data from internet
-        logger.info("Requesting data from internet")
-        dataFromInternet = requests.get("https://archive.ics.uci.edu/ml/machine-learning-databases/auto-mpg/auto-mpg.data")
-        logger.info(f"Status of data request: {dataFromInternet.status_code}")
-
-        if dataFromInternet:
-            logger.info("Data successfully scraped")
-            # Write the file new file if the data scraping was successful
-            with open('auto-mpg.data.txt', 'w') as file:
-                file.write(dataFromInternet.text)
-                logger.info("Data from internet successfully written into file")
-        # If data is unsuccessfully
-        else:
-            logger.critical("Data unsuccessfully scraped")
-        
-        return None
+# Define the function that imports the optional pyarrow package
+def _pyarrow():
+    '''
+    Description:
+    Imports pyarrow and its Feather and Parquet modules, which only write_arrow and from_arrow need.
 
-    # Define mpg_by_year
-    def mpg_by_year(self):
-        '''
-        Description:
-        Returns a dictionary where the keys are the years that are present in the data and the 
-        values are the average MPG for all cars in that year using a defaultdict.
+    Arguments:
+    None.
 
-        Arguments:
-        self.
+    Returns:
+    tuple (pyarrow, pyarrow.feather, pyarrow.parquet).
+    '''
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        logging.getLogger().critical("Arrow and Parquet files require the pyarrow package")
+        raise
+    return pyarrow, pyarrow.feather, pyarrow.parquet
 
-        Returns:
-        dictionary (defaultdict) where the keys are years that are present in the data set and the values 
-        are the average MPG for all cars in that year.
-        '''
-        # Initialize default dict to store total mpg per year and total count of cars per year; initialize the dictionary to be returned
-        yearData = defaultdict(lambda: {'totalMpg': 0, 'count': 0})
-        avgMPGByYear = {}
+# Define the function that writes a run of the external sort
+def _write_run(path, rows):
+    '''
+    Description:
+    Writes rows to a run file as pickled blocks of SPILL_BLOCK_ROWS rows, so that the run can be read
+    back one block at a time.
 
-        # Iterate through each objcet in the data
-        for car in self.data:
-            yearData[car.year]['totalMpg'] += car.mpg  # Add car's mpg to the total mpg for its year
-            yearData[car.year]['count'] += 1           # Add 1 to the number of cars in the year
+    Arguments:
+    path (str): the run file.
+    rows (iterable): the rows, in sorted order.
 
-        # Calculate average MPG for each year
-        for year, data in yearData.items():
-            if data['count'] > 0:                                       # Avoid division by zero error
-                avgMPGByYear[year] = data['totalMpg'] / data['count']   # Calculate average MPG and assign it to the avgMPGByYear dictionary
+    Returns:
+    str: the path of the run file.
+    '''
+    rows = iter(rows)
+    with open(path, 'wb') as file:
+        while True:
+            block = list(itertools.islice(rows, SPILL_BLOCK_ROWS))
+            if not block:
+                break
+            pickle.dump(block, file, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
 
-        # Return the dictionary
-        return avgMPGByYear
+# Define the function that reads a run of the external sort
+def _read_run(path):
+    '''
+    Description:
+    Yields the rows of a run file written by _write_run, holding one block in memory at a time.
 
-    # Define mpg_by_make
-    def mpg_by_make(self):
-        '''
-        Description:
-        Returns a dictionary where the keys are the makes that are present in the data and the values are the 
-        average MPG for all cars of that make.
+    Arguments:
+    path (str): the run file.
 
-        Arguments:
-        self.
+    Returns:
+    A generator of rows.
+    '''
+    with open(path, 'rb') as file:
+        while True:
+            try:
+                block = pickle.load(file)
+            except EOFError:
+                return
+            yield from block
 
-        Returns:
-        dictionary where the keys are the makes that are present in the data and the values are the 
-        average MPG for all cars of that make
-        '''
+# Define the function that merges the statistics of the same group from two parts of the data
+def _merge_stats(first, second):
+    '''
+    Description:
+    Merges the count, sum, mean, min, max and variance of one group computed over two disjoint parts
+    of the data. The variances are combined with the parallel formula of Chan et al.
 
-        # Initialize default dict to store total mpg per make and total count of cars per make
-        makeData = defaultdict(lambda: {'totalMpg': 0, 'count': 0})
-        # Initialize Dictionary: keys = makes, values = avg MPG for all cars of the make
-        avgMPGByMake = {}
+    Arguments:
+    first (dict): statistics of the group in the first part.
+    second (dict): statistics of the group in the second part.
 
-        # Iterate through each object in the data
-        for car in self.data:
-            makeData[car.make]['totalMpg'] += car.mpg
-            makeData[car.make]['count'] += 1
-        
-        # Calculate average MPG for each make
-        for make, data in makeData.items():
-            if data['count'] >0:
-                avgMPGByMake[make] = data['totalMpg'] / data['count']
-        
-        # Return the dictionary
-        return avgMPGByMake
+    Returns:
+    dictionary with the keys 'count', 'sum', 'mean', 'min', 'max' and 'var' for both parts together.
+    '''
+    count = first['count'] + second['count']
+    total = first['sum'] + second['sum']
+    delta = second['mean'] - first['mean']
+    squares = first['var'] * first['count'] + second['var'] * second['count'] + delta * delta * first['count'] * second['count'] / count
+    return {'count': count, 'sum': total, 'mean': total / count, 'min': min(first['min'], second['min']),
+            'max': max(first['max'], second['max']), 'var': squares / count}
 
 # Define Main funciton
 def main():
@@ -491,9 +4256,38 @@ def main():
     logger = loggingAutoMPG()
     logger.info("Main function started")
 
+    # Create the argument parser and parse the arguments
+    parser = buildParser()
+    args = parser.parse_args()
+
+    # Turn on per-record tracing if asked for
+    global TRACE_RECORDS
+    TRACE_RECORDS = args.trace
+
+    # Run the command, timing its stages if asked for
+    if args.profile:
+        profileCommand(args, parser)
+    else:
+        runCommand(args, parser)
+
+    logger.info("Main function ended")
+    return None
+
+# Define the function that creates the command line parser
+def buildParser():
+    '''
+    Description:
+    Creates the argument parser of the command line, shared by main and the steps of the batch command.
+
+    Arguments:
+    None.
+
+    Returns:
+    argparse.ArgumentParser object.
+    '''
     # Create argparse object, add arguments
     parser = argparse.ArgumentParser(description='Analyzing the AutoMPG datset')
-    parser.add_argument("command", help="command to execute (print, mpg_by_year, mpg_by_make)", metavar= "<command>")
+    parser.add_argument("command", help="command to execute (print, mpg_by_year, mpg_by_make, query, top_k, quantiles, write_binary, write_arrow, write_partitioned, fetch, serve, batch); mpg_by_year and mpg_by_make persist a rollup cube (auto-mpg.cube.npz) next to the data file unless --no-cache is given", metavar= "<command>")
     
     # Add sort argument; call the default sort order by default, set the variable to equal "<sort order>"
     parser.add_argument("-s", "--sort", help="sort the list before printing; options: <year>, <mpg>, <default>", default="default", metavar="<sort order>")
@@ -504,69 +4298,139 @@ def main():
     # Add plot argument; allows the user to specify that graphical output using matplotlib should be created
     parser.add_argument("-p", "--plot", action="store_true", help="produce graphical output; usage: python3 autompg3.py <command> -p. Arguments: mpg_by_make, mpg_by_year")
 
-    # Parse arguments
-    args = parser.parse_args()
+    # Add stream argument; mpg_by_year and mpg_by_make aggregate while reading the file instead of loading it first
+    parser.add_argument("--stream", action="store_true", help="aggregate while streaming the data file, in constant memory; applies to mpg_by_year, mpg_by_make, top_k, quantiles (estimated)")
+
+    # Add workers argument; mpg_by_year and mpg_by_make split the data file between that many processes
+    parser.add_argument("-w", "--workers", type=int, default=1, help="number of processes that parse and aggregate the data file in parallel; applies to mpg_by_year, mpg_by_make", metavar="N")
+
+    # Add incremental argument; mpg_by_year and mpg_by_make only parse rows appended since the last run
+    parser.add_argument("-i", "--incremental", action="store_true", help="update aggregates saved in auto-mpg.state.json with the rows appended since the last run; applies to mpg_by_year, mpg_by_make")
+
+    # Add trace argument; log every record (slow, for debugging only)
+    parser.add_argument("--trace", action="store_true", help="log every record built and every make alias applied to autompg3.log at DEBUG level")
+
+    # Add partitioned arguments; read (or write, with write_partitioned) the dataset partitioned by year and optionally make
+    parser.add_argument("--partitioned", help="read the data from a directory written by write_partitioned, only the partitions the --where filters can match; averages answered from its manifest can differ in the last digits", metavar="<directory>")
+    parser.add_argument("--partition-by", default="year", help="write_partitioned: comma-separated columns to partition on, out of year, make, origin, cylinders (default year)", metavar="<columns>")
+
+    # Add external sort arguments; print sorts the data file in bounded memory instead of loading it
+    parser.add_argument("--external", action="store_true", help="print: sort with an external merge sort that spills sorted runs to temporary files, in bounded memory")
+    parser.add_argument("--memory-budget", type=int, default=EXTERNAL_SORT_BUDGET >> 20, help="memory budget of --external in MiB (default %(default)s)", metavar="<MiB>")
+
+    # Add profile arguments; time the stages of the run and write a JSON report, or a cProfile dump for .pstats/.prof files
+    parser.add_argument("--profile", help="write the wall time, rows/s and peak memory of every stage as JSON, or a cProfile dump if the name ends in .pstats or .prof", metavar="<file>")
+    parser.add_argument("--profile-memory", action="store_true", help="with --profile, also trace the peak memory allocated by each stage (slower)")
+
+    # Add no-cache argument; always parse the data file instead of using the binary cache next to it
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the binary cache of the parsed data (auto-mpg.cache.npz) or the rollup cube (auto-mpg.cube.npz)")
+
+    # Add binary argument; directory of the memory-mapped binary form, read by the other commands and written by write_binary
+    parser.add_argument("-b", "--binary", help="directory of the memory-mapped binary form of the data; read instead of the data file, or written by the write_binary command", metavar="<directory>")
+
+    # Add arrow argument; Arrow IPC or Parquet file, read by the other commands (only the columns they need) and written by write_arrow
+    parser.add_argument("--arrow", help="Arrow IPC (Feather) or Parquet (.parquet) file of the data; read instead of the data file, or written by the write_arrow command (requires pyarrow)", metavar="<file>")
+
+    # Add aliases argument; the alias table of the make-normalization stage
+    parser.add_argument("--aliases", help="file of make aliases, one alias,make pair per line, used instead of the built-in typo corrections", metavar="<file>")
+
+    # Add where argument; filters pushed down into the loader, so rows that fail them are never stored
+    parser.add_argument("--where", action="append", default=[], help="keep only rows matching a filter such as year>=76, origin==1 or make=ford; may be given several times", metavar="<filter>")
 
-    # Create a variable to handle --ofile usage (whether or not it is used)
-    outputDestination = open(args.ofile, "w", newline='') if args.ofile else sys.stdout
+    # Add group-by and agg arguments for the query command
+    parser.add_argument("-g", "--group-by", default="", help="comma-separated columns the query command groups on, e.g. make,year", metavar="<columns>")
+    parser.add_argument("-a", "--agg", action="append", default=[], help="statistics the query command computes, e.g. mpg=mean or weight=min,max; may be given several times", metavar="<column>=<statistics>")
 
-    # Create a CSV writer that writes to outputDestination
-    writer = csv.writer(outputDestination)
+    # Add arguments of the top_k and quantiles commands
+    parser.add_argument("-k", type=int, default=10, help="number of cars the top_k command returns, per group with --by (default 10)", metavar="N")
+    parser.add_argument("--column", default="mpg", help="numeric column top_k ranks by and quantiles describes (default mpg)", metavar="<column>")
+    parser.add_argument("--smallest", action="store_true", help="make top_k return the lowest values instead of the highest")
+    parser.add_argument("-q", "--quantiles", default="0.25,0.5,0.75", help="comma-separated quantiles the quantiles command computes (default 0.25,0.5,0.75)", metavar="<quantiles>")
+    parser.add_argument("--by", help="column top_k and quantiles group on, e.g. year or make", metavar="<column>")
+
+    # Add host and port arguments for the serve command
+    parser.add_argument("--host", default="127.0.0.1", help="address the serve command listens on (default 127.0.0.1)", metavar="<address>")
+    parser.add_argument("--port", type=int, default=8000, help="port the serve command listens on (default 8000)", metavar="<port>")
+
+    # Add step and job arguments for the batch command
+    parser.add_argument("--step", action="append", default=[], help="a command line the batch command runs, e.g. \"print -s year -o year.csv\"; may be given several times", metavar="<command line>")
+    parser.add_argument("--job", help="file of command lines the batch command runs, one per line (# starts a comment)", metavar="<file>")
+
+    return parser
+
+# Define the function that runs one command
+def runCommand(args, parser, openData=None, outputDestination=None):
+    '''
+    Description:
+    Runs one command of the command line and writes its output.
+
+    Arguments:
+    args (argparse.Namespace): the parsed command line.
+    parser (argparse.ArgumentParser): the parser, for usage messages and batch steps.
+    openData (function or None): returns the AutoMPGData object for args; openAutoMPGData if None.
+    outputDestination (file or None): where to write without -o/--ofile; stdout if None.
+
+    Returns:
+    None.
+    '''
+    openData = openData or openAutoMPGData
+    logger = logging.getLogger()
+
+    # Create a variable to handle --ofile usage (whether or not it is used); .gz and .zst files are compressed.
+    # Without --ofile the output goes to the destination passed in (the output of a batch), or to stdout
+    ownOutput = bool(args.ofile) or outputDestination is None
+    if ownOutput:
+        outputDestination = openOutput(args.ofile)
 
     # Check for input == "print"
     if args.command.lower() == "print":
         # Instantiate an AutoMPGData object
-        autoMPGDataObject = AutoMPGData()
+        autoMPGDataObject = openData(args)
+
+        # With --external, sort the data file in bounded memory and merge the sorted runs straight into the output
+        if args.external and not fromFile(args):
+            sortOrder = args.sort if args.sort in SORT_ORDERS else "default"
+            if sortOrder != args.sort:
+                logger.warning(f"Warning - Improper Usage. Usage: {parser.format_usage()}")
+            logger.info(f"Sorting data by {sortOrder} with an external merge sort...")
+            logger.info("Ofile called. Writing header")
+            writeCsv(outputDestination, ['Make', 'Model', 'Year', 'MPG'], autoMPGDataObject.external_sort(sortOrder, args.memory_budget << 20))
 
-        # Choose sorting option
-        if args.sort == "year":
-            logger.info("Sorting data by year...")
-            autoMPGDataObject.sort_by_year()
-            logger.info("Sorted data by year")
+        else:
+            # Choose sorting option
+            if args.sort == "year":
+                logger.info("Sorting data by year...")
+                autoMPGDataObject.sort_by_year()
+                logger.info("Sorted data by year")
             
-        elif args.sort == "mpg":
-            logger.info("Sorting data by mpg...")
-            autoMPGDataObject.sort_by_mpg()
-            logger.info("Sorted data by mpg")
+            elif args.sort == "mpg":
+                logger.info("Sorting data by mpg...")
+                autoMPGDataObject.sort_by_mpg()
+                logger.info("Sorted data by mpg")
 
-        elif args.sort == "default":
-            logger.info("Sorting data by default order...")
-            autoMPGDataObject.sort_by_default()
-            logger.info("Sorted data by default order")
+            elif args.sort == "default":
+                logger.info("Sorting data by default order...")
+                autoMPGDataObject.sort_by_default()
+                logger.info("Sorted data by default order")
 
-        else:
-            logger.warning(f"Warning - Improper Usage. Usage: {parser.format_usage()}")
-            logger.warning("Sorting by default...")
-            autoMPGDataObject.sort_by_default()
-            logger.warning("Sorted by default")
-
-        # Create headers if -ofile called
-        if writer:
-            writer.writerow(['Make', 'Model','Year','MPG'])
-            logger.info("Ofile called. Writing header")
-        
-        # Iterate over autoMPGDataObject, write each autompg object
-        for car in autoMPGDataObject:
-            if writer:
-                writer.writerow([car.make, car.model,car.year, car.mpg])
             else:
-                print(f"{car.make},{car.model},{car.year},{car.mpg}")
+                logger.warning(f"Warning - Improper Usage. Usage: {parser.format_usage()}")
+                logger.warning("Sorting by default...")
+                autoMPGDataObject.sort_by_default()
+                logger.warning("Sorted by default")
+
+            # Write the header, then the rows in large formatted blocks
+            logger.info("Ofile called. Writing header")
+            writeCsv(outputDestination, ['Make', 'Model', 'Year', 'MPG'], autoMPGDataObject.data.iter_chunks())
     
     elif args.command.lower() == "mpg_by_year":
         # Instantiate an AutoMPGData object
-        autoMPGDataObject = AutoMPGData()
-        data = autoMPGDataObject.mpg_by_year()
+        autoMPGDataObject = openData(args)
+        data = autoMPGDataObject.mpg_by_year(stream=args.stream and not fromFile(args), workers=1 if fromFile(args) else args.workers,
+                                             incremental=args.incremental and not fromFile(args), rollup=useRollup(args))
 
-        # Output in CSV format
-        if writer:
-            writer.writerow(['Year', 'Average MPG'])  # Header
-
-        # Write rows if -ofile used, print if not
-        for year, mpg in sorted(data.items()):
-            if writer:
-                writer.writerow([year, mpg])
-            else:
-                print(f"{year},{mpg}")
+        # Output in CSV format, one row per year in sorted order
+        writeAverages(outputDestination, ['Year', 'Average MPG'], data)
 
         # Plotting
         if args.plot:
@@ -578,30 +4442,25 @@ def main():
             years = list(sortedData.keys())
             avgMpg = list(sortedData.values()) 
 
-            # Plotting
-            plt.bar(years, avgMpg)
-            plt.title("MPG By Year")
-            plt.xlabel("Year")
-            plt.ylabel("Average MPG")
-            plt.tight_layout()
-            plt.show()
+            # Plotting; matplotlib is only imported when a plot is asked for
+            with PROFILER.stage('plot', rows=len(data)):
+                import matplotlib.pyplot as plt
+                plt.bar(years, avgMpg)
+                plt.title("MPG By Year")
+                plt.xlabel("Year")
+                plt.ylabel("Average MPG")
+                plt.tight_layout()
+                plt.show()
 
 
     elif args.command.lower() == "mpg_by_make":
         # Instantiate an AutoMPGData object
-        autoMPGDataObject = AutoMPGData()
-        data = autoMPGDataObject.mpg_by_make()
+        autoMPGDataObject = openData(args)
+        data = autoMPGDataObject.mpg_by_make(stream=args.stream and not fromFile(args), workers=1 if fromFile(args) else args.workers,
+                                             incremental=args.incremental and not fromFile(args), rollup=useRollup(args))
         
-        # Output in CSV format
-        if writer:
-            writer.writerow(['Make', 'Average MPG'])  # Header
-
-        # Write rows if -ofile used, print if not
-        for make, mpg in sorted(data.items()):
-            if writer:
-                writer.writerow([make, mpg])
-            else:
-                print(f"{make},{mpg}")
+        # Output in CSV format, one row per make in sorted order
+        writeAverages(outputDestination, ['Make', 'Average MPG'], data)
             
         # Plotting
         if args.plot:
@@ -613,22 +4472,459 @@ def main():
             model = list(sortedData.keys())
             avgMpg = list(sortedData.values()) 
 
-            # Plotting
-            plt.bar(model, avgMpg)
-            plt.title("MPG By Make")
-            plt.xlabel("Make")
-            plt.ylabel("Average MPG")
-            plt.xticks(rotation=75)
-            plt.tight_layout()
-            plt.show()
+            # Plotting; matplotlib is only imported when a plot is asked for
+            with PROFILER.stage('plot', rows=len(data)):
+                import matplotlib.pyplot as plt
+                plt.bar(model, avgMpg)
+                plt.title("MPG By Make")
+                plt.xlabel("Make")
+                plt.ylabel("Average MPG")
+                plt.xticks(rotation=75)
+                plt.tight_layout()
+                plt.show()
+
+    elif args.command.lower() == "write_binary":
+        # Parse the data file and write its memory-mappable binary form
+        if not args.binary:
+            logger.warning("write_binary requires -b/--binary <directory>")
+        else:
+            AutoMPGData(cache=not args.no_cache, normalizer=openNormalizer(args), where=args.where).write_binary(args.binary)
+
+    elif args.command.lower() == "write_partitioned":
+        # Parse the data file and write it partitioned by --partition-by
+        if not args.partitioned:
+            logger.warning("write_partitioned requires --partitioned <directory>")
+        else:
+            AutoMPGData(cache=not args.no_cache, normalizer=openNormalizer(args), where=args.where).write_partitioned(args.partitioned, args.partition_by.split(','))
+
+    elif args.command.lower() == "fetch":
+        # Download the data file, or only check with the server that the local copy is still current
+        AutoMPGData(load=False)._get_data()
+
+    elif args.command.lower() == "write_arrow":
+        # Parse the data file and write it as an Arrow IPC or Parquet file
+        if not args.arrow:
+            logger.warning("write_arrow requires --arrow <file>")
+        else:
+            AutoMPGData(cache=not args.no_cache, normalizer=openNormalizer(args), where=args.where).write_arrow(args.arrow)
+
+    elif args.command.lower() == "query":
+        # Instantiate an AutoMPGData object holding only the rows that pass --where
+        autoMPGDataObject = openData(args)
+
+        # Read the group keys and the statistics per column
+        keys = [key for key in args.group_by.split(',') if key]
+        aggregations = parseAggregations(args.agg)
+        results = autoMPGDataObject.group_by(keys).agg(**aggregations)
+
+        # Write a header of the keys and result names, then one row per group in sorted order
+        writeQuery(outputDestination, keys, aggregations, results)
+
+    elif args.command.lower() == "top_k":
+        # Select the best cars without sorting the data
+        autoMPGDataObject = openData(args)
+        results = autoMPGDataObject.top_k(args.column, args.k, by=args.by, largest=not args.smallest, stream=args.stream and not fromFile(args))
+        writeTopK(outputDestination, args.column, args.by, results)
+
+    elif args.command.lower() == "quantiles":
+        # Compute the quantiles, exactly or (with --stream) estimated while reading the data file
+        autoMPGDataObject = openData(args)
+        qs = [float(q) for q in args.quantiles.split(',') if q.strip()]
+        results = autoMPGDataObject.quantiles(args.column, qs, by=args.by, stream=args.stream and not fromFile(args))
+        writeQuantiles(outputDestination, args.column, args.by, qs, results)
+
+    elif args.command.lower() == "batch":
+        # Run every step over one load of the data
+        runBatch(args, parser, outputDestination)
+
+    elif args.command.lower() == "serve":
+        # Keep the dataset loaded and answer queries over HTTP until interrupted
+        AutoMPGServer(cache=not args.no_cache, normalizer=openNormalizer(args), where=args.where).serve(args.host, args.port)
 
     # If print was not inputted 
     else:
         logger.warning("Must use a command")
     
-    logger.info("Main function ended")
+    # Flush and close the output file (compressed files are only complete once closed)
+    if ownOutput and outputDestination is not sys.stdout:
+        outputDestination.close()
+    return None
+
+
+# Define the function that runs the steps of the batch command over one load of the data
+def runBatch(args, parser, outputDestination):
+    '''
+    Description:
+    Runs the command lines of --step and --job in order over a single AutoMPGData object. Steps take
+    the options of the batch command line (e.g. --where, --aliases, -b) unless they give their own;
+    --where filters of a step are added to those of the batch. Steps that read the same data share
+    one load, and with it the sort indexes and aggregates computed by earlier steps; a step with
+    other filters or another source opens its own. Each step writes to its own -o file, or to the
+    output of the batch.
+
+    Arguments:
+    args (argparse.Namespace): the parsed batch command line.
+    parser (argparse.ArgumentParser): the parser of the steps.
+    outputDestination (file): the output of steps without -o.
+
+    Returns:
+    None.
+    '''
+    logger = logging.getLogger()
+
+    # Read the steps; a job file holds one command line per line
+    steps = list(args.step)
+    if args.job:
+        with open(args.job) as file:
+            steps += [line for line in file if shlex.split(line, comments=True)]
+
+    # The data is opened by the first step that needs it, and shared by every step that reads the same data
+    shared = {}
+    def dataOptions(stepArgs):
+        return (tuple(stepArgs.where), stepArgs.binary, stepArgs.arrow, stepArgs.partitioned, stepArgs.aliases, stepArgs.no_cache)
+    def openShared(stepArgs):
+        if dataOptions(stepArgs) != dataOptions(args):
+            logger.info(f"Step {stepArgs.command} reads other data than the batch; opening it separately")
+            return openAutoMPGData(stepArgs)
+        if 'data' not in shared:
+            shared['data'] = AutoMPGData.from_binary(args.binary, where=args.where) if args.binary else \
+                AutoMPGData.from_arrow(args.arrow, where=args.where) if args.arrow else \
+                AutoMPGData.from_partitioned(args.partitioned, where=args.where) if args.partitioned else \
+                AutoMPGData(cache=not args.no_cache, where=args.where, normalizer=openNormalizer(args))
+        return shared['data']
+
+    for number, step in enumerate(steps, 1):
+        # Parse the step with the options of the batch as defaults; lists are copied so that steps do not share them
+        defaults = {name: list(value) if isinstance(value, list) else value for name, value in vars(args).items()
+                    if name not in ('command', 'ofile', 'step', 'job')}
+        stepLine = shlex.split(step, comments=True)
+        stepArgs = parser.parse_args(stepLine, namespace=argparse.Namespace(**defaults))
+        if stepArgs.command.lower() == "batch":
+            raise ValueError("A batch step cannot be another batch")
+
+        started = time.perf_counter()
+        runCommand(stepArgs, parser, openShared, outputDestination)
+        logger.info(f"Batch step {number}/{len(steps)} ({shlex.join(stepLine)}) took {time.perf_counter() - started:.3f} s")
+
+    return None
+
+# Define the function that runs a command with its stages timed
+def profileCommand(args, parser):
+    '''
+    Description:
+    Runs a command with PROFILER enabled and writes the result to the --profile file: a cProfile dump
+    (read it with pstats) if the name ends in .pstats or .prof, otherwise a JSON report of the wall
+    time, rows/s and peak memory of every stage and the counters. The stages are also logged.
+
+    Arguments:
+    args (argparse.Namespace): the parsed command line.
+    parser (argparse.ArgumentParser): the parser, passed on to runCommand.
+
+    Returns:
+    None.
+    '''
+    logger = logging.getLogger()
+    PROFILER.enable(memory=args.profile_memory)
+    try:
+        if args.profile.endswith(('.pstats', '.prof')):
+            # Profile every function call as well; cProfile is only imported when asked for
+            import cProfile
+            profile = cProfile.Profile()
+            profile.runcall(runCommand, args, parser)
+            profile.dump_stats(args.profile)
+        else:
+            runCommand(args, parser)
+    finally:
+        PROFILER.disable()
+
+    # Log the stages, and write the report unless a cProfile dump was written
+    PROFILER.log_summary()
+    if not args.profile.endswith(('.pstats', '.prof')):
+        with open(args.profile, 'w') as file:
+            json.dump(dict(PROFILER.report(), command=args.command), file, indent=2)
+    logger.info(f"Wrote profile to {args.profile}")
+    return None
+
+# Define the function that opens the output of a command
+def openOutput(path):
+    '''
+    Description:
+    Opens the text output of a command: sys.stdout if no path is given, a gzip-compressed file if the
+    path ends in .gz, a zstd-compressed file if it ends in .zst (needs the zstandard package), and a
+    plain file otherwise. Files are opened with a large buffer and newline='' for the csv module.
+
+    Arguments:
+    path (str or None): the output file.
+
+    Returns:
+    A writable text file object.
+    '''
+    if not path:
+        return sys.stdout
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', newline='')
+    if path.endswith('.zst'):
+        try:
+            import zstandard
+        except ImportError:
+            logging.getLogger().critical("Writing .zst output requires the zstandard package")
+            raise
+        return zstandard.open(path, 'wt', newline='')
+    return open(path, 'w', newline='', buffering=OUTPUT_BUFFER_SIZE)
+
+# Define the function that writes CSV output in large blocks
+def writeCsv(destination, header, chunks):
+    '''
+    Description:
+    Writes a header row and then chunks of rows as CSV. Each chunk is formatted in memory with
+    csv.writer.writerows and written with a single call, so the output is byte-identical to
+    writing the rows one by one with csv.writer.writerow, but far fewer writes are made.
+
+    Arguments:
+    destination (file): a writable text file object.
+    header (list): the header row.
+    chunks (iterable): lists of rows, e.g. AutoMPGView.iter_chunks().
+
+    Returns:
+    None.
+    '''
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    with PROFILER.stage('write') as stage:
+        stage.rows = 0
+        for chunk in chunks:
+            writer.writerows(chunk)
+            destination.write(buffer.getvalue())
+            buffer.seek(0)
+            buffer.truncate()
+            stage.rows += len(chunk)
+        destination.write(buffer.getvalue())
+    return None
+
+# Define the function that writes the output of mpg_by_year and mpg_by_make
+def writeAverages(destination, header, data):
+    '''
+    Description:
+    Writes a header row and then one CSV row per key of data, in sorted order.
+
+    Arguments:
+    destination (file): a writable text file object.
+    header (list): the header row.
+    data (dict): the average per year or make.
+
+    Returns:
+    None.
+    '''
+    with PROFILER.stage('write', rows=len(data)):
+        writer = csv.writer(destination)
+        writer.writerow(header)
+        writer.writerows(sorted(data.items()))
+    return None
+
+# Define the function that reads the statistics asked for by the query command
+def parseAggregations(specs):
+    '''
+    Description:
+    Turns specifications such as "mpg=mean" or "weight=min,max" into the keyword arguments of
+    AutoMPGQuery.agg; the mean of mpg if there are none.
+
+    Arguments:
+    specs (list): the specifications.
+
+    Returns:
+    dictionary of the statistics (list) per column.
+    '''
+    aggregations = {}
+    for aggregation in specs or ["mpg=mean"]:
+        column, _, statistics = aggregation.partition('=')
+        aggregations[column.strip()] = [statistic.strip() for statistic in statistics.split(',')]
+    return aggregations
+
+# Define the function that writes the output of the query command
+def writeQuery(destination, keys, aggregations, results):
+    '''
+    Description:
+    Writes a header of the group keys and result names, then one CSV row per group in sorted order.
+
+    Arguments:
+    destination (file): a writable text file object.
+    keys (list): the group keys.
+    aggregations (dict): the statistics per column, as returned by parseAggregations.
+    results (dict): the result of AutoMPGQuery.agg.
+
+    Returns:
+    None.
+    '''
+    with PROFILER.stage('write', rows=len(results)):
+        writer = csv.writer(destination)
+        names = [f"{column}_{statistic}" for column, statistics in aggregations.items() for statistic in statistics]
+        writer.writerow(keys + names)
+        for group in sorted(results, key=lambda group: group if isinstance(group, tuple) else (group,)):
+            groupValues = list(group) if isinstance(group, tuple) else ([] if group is None else [group])
+            writer.writerow(groupValues + [results[group][name] for name in names])
+    return None
+
+# Define the function that writes the output of the top_k command
+def writeTopK(destination, column, by, results):
+    '''
+    Description:
+    Writes the cars returned by AutoMPGData.top_k as CSV, best first (per group in sorted order
+    with by): the group, make, model, year and mpg, and the ranking column if it is not mpg.
+
+    Arguments:
+    destination (file): a writable text file object.
+    column (str): the column ranked by.
+    by (str or None): the column grouped on.
+    results (list or dict): the result of top_k.
+
+    Returns:
+    None.
+    '''
+    with PROFILER.stage('write', rows=len(results)):
+        writer = csv.writer(destination)
+        extra = [] if column == 'mpg' else [column]
+        writer.writerow(([by] if by else []) + ['Make', 'Model', 'Year', 'MPG'] + extra)
+        groups = sorted(results.items()) if by else [(None, results)]
+        for group, cars in groups:
+            for value, car in cars:
+                writer.writerow(([group] if by else []) + [car.make, car.model, car.year, car.mpg] + ([value] if extra else []))
+    return None
+
+# Define the function that writes the output of the quantiles command
+def writeQuantiles(destination, column, by, qs, results):
+    '''
+    Description:
+    Writes the result of AutoMPGData.quantiles as CSV: one column per quantile, named e.g. mpg_q0.5,
+    and one row (per group in sorted order with by).
+
+    Arguments:
+    destination (file): a writable text file object.
+    column (str): the column described.
+    by (str or None): the column grouped on.
+    qs (list): the quantiles.
+    results (dict): the result of quantiles.
+
+    Returns:
+    None.
+    '''
+    with PROFILER.stage('write', rows=len(results)):
+        writer = csv.writer(destination)
+        writer.writerow(([by] if by else []) + [f"{column}_q{q:g}" for q in qs])
+        groups = sorted(results.items()) if by else [(None, results)]
+        for group, values in groups:
+            writer.writerow(([group] if by else []) + [values[q] for q in qs])
     return None
 
+# Define the function that tells whether the data comes from a binary or Arrow file
+def fromFile(args):
+    '''
+    Description:
+    Returns whether the command line reads the data from -b/--binary, --arrow or --partitioned rather than the data
+    file, in which case streaming, parallel and incremental aggregation do not apply.
+
+    Arguments:
+    args (argparse.Namespace): the parsed command line.
+
+    Returns:
+    bool.
+    '''
+    return bool(args.binary or args.arrow or args.partitioned)
+
+# Define the function that tells whether mpg_by_year and mpg_by_make are answered from the rollup cube
+def useRollup(args):
+    '''
+    Description:
+    Returns whether the command is mpg_by_year or mpg_by_make over the whole data file, which is answered
+    from the persisted rollup cube (auto-mpg.cube.npz) without loading the rows. --no-cache turns the cube
+    off; filtered, streamed, parallel, incremental and file-based runs do not use it, so that the output
+    is always the same as computing from the rows.
+
+    Arguments:
+    args (argparse.Namespace): the parsed command line.
+
+    Returns:
+    bool.
+    '''
+    return (args.command.lower() in ("mpg_by_year", "mpg_by_make") and not (args.no_cache or args.where or fromFile(args))
+            and not (args.stream or args.workers > 1 or args.incremental))
+
+# Define the function that lists the columns a command reads
+def commandColumns(args):
+    '''
+    Description:
+    Returns the columns a command needs, so that columnar files are read with a projection:
+    year and mpg for mpg_by_year, make and mpg for mpg_by_make, the group keys and aggregated
+    columns for query, the column and group key for quantiles, and make, model, year and mpg
+    (plus the column and group key of top_k) otherwise.
+
+    Arguments:
+    args (argparse.Namespace): the parsed command line.
+
+    Returns:
+    tuple of column names out of COLUMNS.
+    '''
+    command = args.command.lower()
+    if command == "mpg_by_year":
+        return ('year', 'mpg')
+    if command == "mpg_by_make":
+        return ('make', 'mpg')
+    if command == "top_k":
+        return tuple(column for column in COLUMNS if column in ('make', 'model', 'year', 'mpg', args.column, args.by))
+    if command == "quantiles":
+        return tuple(column for column in COLUMNS if column in (args.column, args.by))
+    if command == "query":
+        keys = [key for key in args.group_by.split(',') if key]
+        aggregated = parseAggregations(args.agg)
+        return tuple(column for column in COLUMNS if column in keys or column in aggregated)
+    return ('make', 'model', 'year', 'mpg')
+
+# Define the function that opens the make-normalization stage of the command line
+def openNormalizer(args):
+    '''
+    Description:
+    Returns the MakeNormalizer of the --aliases file, or None (the built-in corrections) if it is not used.
+
+    Arguments:
+    args (argparse.Namespace): the parsed command line.
+
+    Returns:
+    MakeNormalizer object or None.
+    '''
+    return MakeNormalizer.from_file(args.aliases) if args.aliases else None
+
+# Define the function that opens the dataset for a command
+def openAutoMPGData(args):
+    '''
+    Description:
+    Opens the dataset the way the command line asks for: the memory-mapped binary form if
+    -b/--binary is used, the columns the command needs from an Arrow or Parquet file if --arrow is used, the
+    partitions the filters can match if --partitioned is used (none for averages the manifest answers), only the data file for streaming if --stream, --workers, --incremental or --external is used or for averages the rollup cube answers, and otherwise
+    the loaded columns (through the binary cache unless --no-cache is used). The --where
+    filters are applied while loading or streaming, and the makes are normalized with the --aliases table.
+
+    Arguments:
+    args (argparse.Namespace): the parsed command line.
+
+    Returns:
+    AutoMPGData object.
+    '''
+    if args.binary:
+        return AutoMPGData.from_binary(args.binary, where=args.where)
+    if args.arrow:
+        return AutoMPGData.from_arrow(args.arrow, columns=commandColumns(args), where=args.where)
+    command = args.command.lower()
+    if args.partitioned:
+        # Rows are only read when the manifest cannot answer the command
+        dataset = AutoMPGData.from_partitioned(args.partitioned, where=args.where, load=False)
+        key = {"mpg_by_year": "year", "mpg_by_make": "make"}.get(command)
+        if key is None or not dataset._manifest_covers(key, 'mpg'):
+            dataset._load_partitions(commandColumns(args))
+        return dataset
+    streaming = ((args.stream or args.workers > 1 or args.incremental) and command in ("mpg_by_year", "mpg_by_make")
+                 or args.stream and command in ("top_k", "quantiles") or args.external and command == "print" or useRollup(args))
+    return AutoMPGData(load=not streaming, cache=not args.no_cache, where=args.where, normalizer=openNormalizer(args))
+
 # Define logging function
 def loggingAutoMPG():
     '''
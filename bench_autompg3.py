@@ -0,0 +1,251 @@
+# Import libraries for later use
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+import numpy as np
+import autompg3
+from autompg3 import AutoMPGData
+
+# Makes used for the synthetic car names; includes the misspellings that AutoMPGData corrects
+MAKES = ["amc", "buick", "chevrolet", "chevroelt", "chevy", "datsun", "dodge", "ford", "honda", "maxda", "mazda",
+         "mercedes-benz", "plymouth", "pontiac", "toyota", "toyouta", "vokswagen", "volkswagen", "vw", "volvo"]
+
+# Words used for the synthetic models
+MODEL_WORDS = ["malibu", "skylark", "satellite", "rebel", "torino", "galaxie", "impala", "fury", "catalina", "ambassador",
+               "corolla", "civic", "pinto", "maverick", "dart", "sw", "custom", "brougham", "deluxe", "wagon", "gl", "320"]
+
+# Modules that importing autompg3 must not load, because only some commands need them and they are slow to import
+HEAVY_MODULES = ('matplotlib', 'requests', 'asyncio', 'concurrent.futures', 'http.server', 'pyarrow')
+
+# Define the function that writes a synthetic auto-mpg file
+def generateData(path, rows, seed=0):
+    '''
+    Description:
+    Writes a synthetic data file in the format of auto-mpg.data.txt: eight space-aligned numeric fields,
+    a TAB and the quoted car name. About 1.5% of the horsepower values are '?', and the makes include
+    the typos that AutoMPGData corrects.
+
+    Arguments:
+    path (str): the file to write.
+    rows (int): the number of rows to write.
+    seed (int): the seed of the random generator, so that runs are repeatable.
+
+    Returns:
+    None.
+    '''
+    generator = random.Random(seed)
+    chunkSize = 100000
+
+    with open(path, 'w') as file:
+        for start in range(0, rows, chunkSize):
+            lines = []
+            for _ in range(min(chunkSize, rows - start)):
+                # Draw the numeric fields
+                mpg = round(generator.uniform(9.0, 46.6), 1)
+                cylinders = generator.choice((3, 4, 4, 4, 5, 6, 6, 8, 8))
+                displacement = round(generator.uniform(68.0, 455.0), 1)
+                horsepower = '?' if generator.random() < 0.015 else f"{generator.randint(46, 230)}.0"
+                weight = generator.randint(1613, 5140)
+                acceleration = round(generator.uniform(8.0, 24.8), 1)
+                year = generator.randint(70, 82)
+                origin = generator.randint(1, 3)
+
+                # Build a car name of a make and one to three model words
+                name = ' '.join([generator.choice(MAKES)] + generator.sample(MODEL_WORDS, generator.randint(1, 3)))
+
+                lines.append(f"{mpg:<7}{cylinders:<4}{displacement:<11}{horsepower:<11}{weight}.{'':<6}{acceleration:<7}{year:<4}{origin}\t\"{name}\"\n")
+            file.writelines(lines)
+
+    return None
+
+# Define the function that writes the print output the way main does
+def writePrintOutput(autoMPGDataObject, path):
+    '''
+    Description:
+    Writes the data as CSV (header, then make, model, year and mpg per row), as the print command does.
+
+    Arguments:
+    autoMPGDataObject (AutoMPGData): the data to write.
+    path (str): the file to write.
+
+    Returns:
+    None.
+    '''
+    with autompg3.openOutput(path) as file:
+        autompg3.writeCsv(file, ['Make', 'Model', 'Year', 'MPG'], autoMPGDataObject.data.iter_chunks())
+    return None
+
+# Define the function that lists the stages to benchmark
+def benchmarkStages(dataPath, csvPath):
+    '''
+    Description:
+    Returns the stages to time, in order. Each stage is a (name, function) pair; the functions share
+    one AutoMPGData object, which the load stage creates. The legacy_clean_data stage times
+    _clean_data, which no command runs any more (loading parses the data file directly); it is kept
+    for comparison with older results.
+
+    Arguments:
+    dataPath (str): the synthetic data file.
+    csvPath (str): the file the CSV output stage writes to.
+
+    Returns:
+    list of (str, function) pairs.
+    '''
+    state = {}
+
+    # Load without the binary cache, so that every run measures parsing
+    def load():
+        state['data'] = AutoMPGData(dataPath, cache=False)
+
+    return [
+        ('legacy_clean_data', lambda: AutoMPGData(dataPath, load=False)._clean_data()),
+        ('_load_data', load),
+        ('sort_by_default', lambda: state['data'].sort_by_default()),
+        ('sort_by_year', lambda: state['data'].sort_by_year()),
+        ('sort_by_mpg', lambda: state['data'].sort_by_mpg()),
+        ('mpg_by_year', lambda: state['data'].mpg_by_year()),
+        ('mpg_by_make', lambda: state['data'].mpg_by_make()),
+        ('csv_output', lambda: writePrintOutput(state['data'], csvPath)),
+    ]
+
+# Define the function that runs the benchmark for one size
+def runBenchmark(rows, seed=0, allocations=True, directory=None):
+    '''
+    Description:
+    Generates a synthetic file of the given size and times every stage on it. Time and peak RSS are
+    measured in a first pass; if allocations is True the stages are run a second time under
+    tracemalloc to measure the peak memory allocated by each stage, so that tracing does not distort
+    the timings.
+
+    Arguments:
+    rows (int): the number of rows of the synthetic file.
+    seed (int): the seed of the random generator.
+    allocations (bool): also measure allocations in a second pass.
+    directory (str or None): where to write the synthetic files; a temporary directory if None.
+
+    Returns:
+    dictionary with the size of the input and one entry per stage.
+    '''
+    with tempfile.TemporaryDirectory(dir=directory) as workDirectory:
+        dataPath = os.path.join(workDirectory, 'auto-mpg.data.txt')
+        csvPath = os.path.join(workDirectory, 'output.csv')
+        generateData(dataPath, rows, seed)
+
+        # First pass: wall time, throughput and peak RSS (ru_maxrss is in KiB on Linux)
+        stages = {}
+        for name, stage in benchmarkStages(dataPath, csvPath):
+            started = time.perf_counter()
+            stage()
+            seconds = time.perf_counter() - started
+            stages[name] = {'seconds': seconds, 'rowsPerSecond': rows / seconds if seconds else None,
+                            'peakRssBytes': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+
+        # Second pass: peak bytes allocated by each stage
+        if allocations:
+            for name, stage in benchmarkStages(dataPath, csvPath):
+                tracemalloc.start()
+                stage()
+                stages[name]['peakAllocatedBytes'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+        return {'rows': rows, 'inputBytes': os.path.getsize(dataPath), 'stages': stages}
+
+# Define the function that measures how long importing autompg3 takes
+def measureStartup(repeat=5):
+    '''
+    Description:
+    Imports autompg3 in fresh interpreters and reports the fastest wall time, which is what every
+    command pays before doing any work, together with the modules of HEAVY_MODULES that the import
+    loaded (there should be none).
+
+    Arguments:
+    repeat (int): the number of interpreters to start.
+
+    Returns:
+    dictionary with the seconds of the fastest import and the list of heavy modules loaded.
+    '''
+    directory = os.path.dirname(os.path.abspath(autompg3.__file__))
+    script = f"import sys, autompg3; print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+
+    # Time the interpreter with and without the import, so that only the import itself is counted
+    def fastest(code):
+        times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=directory, check=True).stdout
+            times.append(time.perf_counter() - started)
+        return min(times), output.strip()
+
+    seconds, heavyModules = fastest(script)
+    baseline, _ = fastest("pass")
+    return {'seconds': seconds - baseline, 'interpreterSeconds': baseline, 'heavyModules': heavyModules.split(',') if heavyModules else []}
+
+# Define the function that describes the environment, so that results can be compared across commits
+def environment():
+    '''
+    Description:
+    Returns the git commit and the versions the benchmark ran with.
+
+    Arguments:
+    None.
+
+    Returns:
+    dictionary describing the environment.
+    '''
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(autompg3.__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+            'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+# Define Main function
+def main():
+    '''
+    Description:
+    Runs the benchmark for each requested size and writes the results as JSON.
+
+    Arguments:
+    None.
+
+    Returns:
+    None.
+    '''
+    # Create argparse object, add arguments
+    parser = argparse.ArgumentParser(description='Benchmark autompg3 on synthetic auto-mpg data')
+    parser.add_argument("-r", "--rows", type=int, action="append", help="number of rows of a synthetic file; may be given several times (default 1000)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the synthetic data generator")
+    parser.add_argument("--no-allocations", action="store_true", help="skip the tracemalloc pass that measures allocations")
+    parser.add_argument("-d", "--directory", help="directory for the synthetic files (default: system temporary directory)")
+    parser.add_argument("-o", "--ofile", help="file to write the JSON report to (default: stdout)")
+    args = parser.parse_args()
+
+    # Run every size and collect the results
+    report = {'environment': environment(), 'seed': args.seed, 'startup': measureStartup(),
+              'results': [runBenchmark(rows, args.seed, not args.no_allocations, args.directory) for rows in args.rows or [1000]]}
+
+    # Write the report
+    if args.ofile:
+        with open(args.ofile, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    return None
+
+# Call main if run from __main__
+if __name__ == "__main__":
+
+    # Call main
+    main()
@@ -1,5 +1,20 @@
+import io
+import os
+import csv
+import gzip
+import hashlib
+import threading
+import importlib.util
+import pickle
+import pstats
+import json
+import shutil
+import tempfile
 import unittest
-from autompg3 import AutoMPG, AutoMPGData
+from unittest import mock
+import numpy as np
+from autompg3 import AutoMPG, AutoMPGData, MakeNormalizer, QuantileSketch, RollupCube, Predicate, col, parsePredicate, openOutput, writeCsv, fetchFile, fetchShards, AutoMPGServer, buildParser, runCommand, profileCommand, Profiler, NULL_STAGE
+from bench_autompg3 import generateData, runBenchmark, measureStartup
 
 # Define test_autompg class for testing the AutoMPG function
 class test_AutoMPG(unittest.TestCase):
@@ -28,6 +43,9 @@ class test_AutoMPG(unittest.TestCase):
         
         test_hash(self):
             Tests the __hash__ method of AutoMPG.
+
+        test_immutable(self):
+            Tests that AutoMPG objects cannot be changed.
     """
 
 
@@ -154,6 +172,30 @@ class test_AutoMPG(unittest.TestCase):
         # Test hash output
         self.assertEqual(hash(car1), hash(AutoMPG('Dodge', 'Dart', 1990, 20.0)))
 
+    # Create test for immutability
+    def test_immutable(self):
+        '''
+        Description:
+        Tests that AutoMPG objects cannot be changed.
+
+        Arguments:
+        self
+
+        Returns:
+        None
+        '''
+        # Create object
+        car1 = AutoMPG("Dodge", "Dart", 1990, 20)
+        # Objects have no __dict__ and refuse changes
+        self.assertFalse(hasattr(car1, '__dict__'))
+        with self.assertRaises(AttributeError):
+            car1.mpg = 30
+        with self.assertRaises(AttributeError):
+            del car1.make
+        # Copies made by pickling compare and hash equal
+        self.assertEqual(pickle.loads(pickle.dumps(car1)), car1)
+        self.assertEqual(hash(pickle.loads(pickle.dumps(car1))), hash(car1))
+
 class test_AutoMPGData(unittest.TestCase):
     """
     Description:
@@ -171,6 +213,72 @@ class test_AutoMPGData(unittest.TestCase):
         
         test__clean_data(self):
             Tests the _clean_data method of AutoMPGData.
+
+        test__log_load_summary(self):
+            Tests that loading logs one summary instead of one line per record.
+
+        test_sort_by_default(self):
+            Tests the sort_by_default method of AutoMPGData.
+
+        test_sort_by_year(self):
+            Tests the sort_by_year method of AutoMPGData.
+
+        test_ordered(self):
+            Tests the ordered method of AutoMPGData.
+
+        test_column(self):
+            Tests the column method of AutoMPGData.
+
+        test_sort_by(self):
+            Tests the sort_by method of AutoMPGData.
+
+        test_aggregate(self):
+            Tests the aggregate method of AutoMPGData.
+
+        test_mpg_by_make(self):
+            Tests the mpg_by_make method of AutoMPGData.
+
+        test_iter_records(self):
+            Tests the iter_records method of AutoMPGData.
+
+        test_stream_aggregate(self):
+            Tests the stream_aggregate method of AutoMPGData.
+
+        test_aggregate_missing(self):
+            Tests aggregating a column with missing values.
+
+        test_parallel_aggregate(self):
+            Tests the parallel_aggregate method of AutoMPGData.
+
+        test_incremental_aggregate(self):
+            Tests the incremental_aggregate method of AutoMPGData.
+
+        test__load_cache(self):
+            Tests the _load_cache and _write_cache methods of AutoMPGData.
+
+        test_from_binary(self):
+            Tests the write_binary and from_binary methods of AutoMPGData.
+
+        test_from_partitioned(self):
+            Tests the write_partitioned and from_partitioned methods of AutoMPGData.
+
+        test_writeCsv(self):
+            Tests the bulk CSV output of the print command.
+
+        test_from_arrow(self):
+            Tests the write_arrow and from_arrow methods of AutoMPGData.
+
+        test_top_k(self):
+            Tests the top_k method of AutoMPGData.
+
+        test_quantiles(self):
+            Tests the quantiles method of AutoMPGData and the QuantileSketch class.
+
+        test_external_sort(self):
+            Tests that the external sort spills and merges runs into the order of sort_by_*.
+
+        test_rollup(self):
+            Tests the rollup cube of AutoMPGData and the RollupCube class.
     """
 
     # Create test for init
@@ -234,12 +342,1326 @@ class test_AutoMPGData(unittest.TestCase):
         
         Returns:
         None.'''
-        # Test if there are any tabs in the lines of the data
-        with open('auto-mpg.clean.txt', 'r') as file:
-            lines = file.readlines
-            for line in file:
-                self.assertNotIn('\t', line)
-    
+        with tempfile.TemporaryDirectory() as directory:
+            dataPath = os.path.join(directory, 'auto-mpg.data.txt')
+            shutil.copy('auto-mpg.data.txt', dataPath)
+            AutoMPGData(dataPath, load=False)._clean_data()
+
+            # The cleaned file has the lines of the data file with the tabs expanded to spaces
+            with open(dataPath) as file:
+                expected = [line.expandtabs() for line in file]
+            with open(os.path.join(directory, 'auto-mpg.clean.txt')) as file:
+                lines = file.readlines()
+            self.assertEqual(lines, expected)
+            self.assertFalse(any('\t' in line for line in lines))
+
+    # Create test for _log_load_summary
+    def test__log_load_summary(self):
+        '''
+        Description:
+        Tests that loading logs one summary instead of one line per record.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Load and iterate with all log levels captured
+        with self.assertLogs(level='DEBUG') as logs:
+            autoMPGDataTest = AutoMPGData(cache=False)
+            cars = list(autoMPGDataTest)
+        # Only the summary is logged, and it counts the typo corrections
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn(f"Loaded {len(cars)} rows", logs.output[0])
+        self.assertIn("vw -> volkswagen: 6", logs.output[0])
+
+        # Loading from a warm cache logs the same summary
+        with tempfile.TemporaryDirectory() as directory:
+            dataPath = os.path.join(directory, 'auto-mpg.data.txt')
+            shutil.copy('auto-mpg.data.txt', dataPath)
+            AutoMPGData(dataPath)
+            with self.assertLogs(level='DEBUG') as logs:
+                AutoMPGData(dataPath)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn(f"Loaded {len(cars)} rows from cache of {dataPath}", logs.output[0])
+        self.assertIn("vw -> volkswagen: 6", logs.output[0])
+
+    # Create test for sort_by_default
+    def test_sort_by_default(self):
+        '''
+        Description:
+        Tests the sort_by_default method of AutoMPGData.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object
+        autoMPGDataTest = AutoMPGData()
+        # The column sort should match sorting the AutoMPG objects themselves
+        expected = sorted(autoMPGDataTest)
+        autoMPGDataTest.sort_by_default()
+        self.assertEqual(list(autoMPGDataTest), expected)
+
+    # Create test for sort_by_year
+    def test_sort_by_year(self):
+        '''
+        Description:
+        Tests the sort_by_year method of AutoMPGData.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object
+        autoMPGDataTest = AutoMPGData()
+        # Sort the AutoMPG objects with the documented key, then compare with the column sort
+        expected = sorted(autoMPGDataTest, key=lambda x: (x.year, x.make, x.model, x.mpg))
+        autoMPGDataTest.sort_by_year()
+        self.assertEqual(list(autoMPGDataTest), expected)
+        self.assertEqual(autoMPGDataTest.data[0], expected[0])
+        self.assertEqual(len(autoMPGDataTest.data), len(expected))
+
+    # Create test for ordered
+    def test_ordered(self):
+        '''
+        Description:
+        Tests the ordered method of AutoMPGData.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object
+        autoMPGDataTest = AutoMPGData()
+        fileOrder = list(autoMPGDataTest)
+        # Two orderings can be held at once without changing the order of the dataset
+        byYear = autoMPGDataTest.ordered('year')
+        byMpg = autoMPGDataTest.ordered('mpg')
+        self.assertEqual(list(byYear), sorted(fileOrder, key=lambda x: (x.year, x.make, x.model, x.mpg)))
+        self.assertEqual(list(byMpg), sorted(fileOrder, key=lambda x: (x.mpg, x.make, x.model, x.year)))
+        self.assertEqual(list(autoMPGDataTest), fileOrder)
+        # The sort index is computed once and shared with sort_by_year
+        autoMPGDataTest.sort_by_year()
+        self.assertIs(autoMPGDataTest.data._order, byYear._order)
+        self.assertEqual(list(autoMPGDataTest), list(byYear))
+
+    # Create test for column
+    def test_column(self):
+        '''
+        Description:
+        Tests the column method of AutoMPGData.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object
+        autoMPGDataTest = AutoMPGData()
+        records = list(autoMPGDataTest.iter_records())
+        # All nine fields are kept, in compact types, with '?' horsepower as NaN
+        self.assertEqual(autoMPGDataTest.column('cylinders').dtype, np.int8)
+        self.assertEqual(autoMPGDataTest.column('weight')[0], float(records[0].weight))
+        self.assertEqual(autoMPGDataTest.column('origin').tolist(), [int(record.origin) for record in records])
+        self.assertEqual(int(np.isnan(autoMPGDataTest.column('horsepower')).sum()), [record.horsepower for record in records].count('?'))
+        self.assertEqual(autoMPGDataTest.column('make')[1], 'buick')
+        # Columns are read-only
+        with self.assertRaises(ValueError):
+            autoMPGDataTest.column('mpg')[0] = 0
+
+    # Create test for sort_by
+    def test_sort_by(self):
+        '''
+        Description:
+        Tests the sort_by method of AutoMPGData.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object
+        autoMPGDataTest = AutoMPGData()
+        weights = autoMPGDataTest.column('weight')
+        # Sorting by weight, then mpg, orders the rows by weight
+        autoMPGDataTest.sort_by('weight', 'mpg')
+        sortedWeights = weights[autoMPGDataTest.data._order]
+        self.assertTrue((np.diff(sortedWeights) >= 0).all())
+        # Missing horsepower values sort last
+        autoMPGDataTest.sort_by('horsepower')
+        self.assertTrue(np.isnan(autoMPGDataTest.column('horsepower')[autoMPGDataTest.data._order[-1]]))
+
+    # Create test for aggregate
+    def test_aggregate(self):
+        '''
+        Description:
+        Tests the aggregate method of AutoMPGData.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object
+        autoMPGDataTest = AutoMPGData()
+        # Collect the mpg values of each year by hand
+        mpgByYear = {}
+        for car in autoMPGDataTest:
+            mpgByYear.setdefault(car.year, []).append(car.mpg)
+
+        # Compare every statistic of every group
+        stats = autoMPGDataTest.aggregate('year')
+        self.assertEqual(set(stats), set(mpgByYear))
+        for year, values in mpgByYear.items():
+            mean = sum(values) / len(values)
+            self.assertEqual(stats[year]['count'], len(values))
+            self.assertAlmostEqual(stats[year]['sum'], sum(values))
+            self.assertAlmostEqual(stats[year]['mean'], mean)
+            self.assertEqual(stats[year]['min'], min(values))
+            self.assertEqual(stats[year]['max'], max(values))
+            self.assertAlmostEqual(stats[year]['var'], sum((v - mean) ** 2 for v in values) / len(values))
+
+    # Create test for mpg_by_make
+    def test_mpg_by_make(self):
+        '''
+        Description:
+        Tests the mpg_by_make method of AutoMPGData.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object
+        autoMPGDataTest = AutoMPGData()
+        # The typo corrections should have merged the misspelled makes
+        averages = autoMPGDataTest.mpg_by_make()
+        self.assertNotIn('chevroelt', averages)
+        self.assertIn('chevrolet', averages)
+        # Check one make against a hand computed average
+        values = [car.mpg for car in autoMPGDataTest if car.make == 'toyota']
+        self.assertAlmostEqual(averages['toyota'], sum(values) / len(values))
+
+    # Create test for iter_records
+    def test_iter_records(self):
+        '''
+        Description:
+        Tests the iter_records method of AutoMPGData.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object without loading the columns
+        autoMPGDataTest = AutoMPGData(load=False)
+        self.assertEqual(len(autoMPGDataTest), 0)
+        # Every line of the raw file should come back as one record, with the quotes and tab removed
+        records = list(autoMPGDataTest.iter_records())
+        with open('auto-mpg.data.txt', 'r') as file:
+            self.assertEqual(len(records), len(file.readlines()))
+        self.assertEqual(records[1].carName, "buick skylark 320")
+        self.assertEqual((records[1].mpg, records[1].modelYear), ("15.0", "70"))
+
+    # Create test for stream_aggregate
+    def test_stream_aggregate(self):
+        '''
+        Description:
+        Tests the stream_aggregate method of AutoMPGData.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object
+        autoMPGDataTest = AutoMPGData()
+        # Streaming should give the same statistics as the column engine
+        for key in ('year', 'make'):
+            streamed = autoMPGDataTest.stream_aggregate(key)
+            loaded = autoMPGDataTest.aggregate(key)
+            self.assertEqual(set(streamed), set(loaded))
+            for group in loaded:
+                for statistic in ('count', 'sum', 'mean', 'min', 'max', 'var'):
+                    self.assertAlmostEqual(streamed[group][statistic], loaded[group][statistic])
+
+    # Create test for aggregating a column with missing values
+    def test_aggregate_missing(self):
+        '''
+        Description:
+        Tests aggregating a column with missing values.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object
+        autoMPGDataTest = AutoMPGData()
+        # Average horsepower per number of cylinders, leaving out the '?' values
+        stats = autoMPGDataTest.aggregate('cylinders', 'horsepower')
+        horsepower = autoMPGDataTest.column('horsepower')
+        cylinders = autoMPGDataTest.column('cylinders')
+        for count, groupStats in stats.items():
+            values = horsepower[(cylinders == count) & ~np.isnan(horsepower)]
+            self.assertEqual(groupStats['count'], len(values))
+            self.assertAlmostEqual(groupStats['mean'], values.mean())
+        # The streaming engine agrees
+        streamed = autoMPGDataTest.stream_aggregate('cylinders', column='horsepower')
+        self.assertEqual({count: stats[count]['count'] for count in stats}, {count: streamed[count]['count'] for count in streamed})
+
+    # Create test for parallel_aggregate
+    def test_parallel_aggregate(self):
+        '''
+        Description:
+        Tests the parallel_aggregate method of AutoMPGData.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object without loading the columns
+        autoMPGDataTest = AutoMPGData(load=False)
+        # Byte ranges that cut lines in the middle must still yield every record exactly once
+        size = os.path.getsize('auto-mpg.data.txt')
+        bounds = [0, 1, 100, 101, size // 2, size]
+        records = [record for start, end in zip(bounds, bounds[1:]) for record in autoMPGDataTest.iter_records(start, end)]
+        self.assertEqual(records, list(autoMPGDataTest.iter_records()))
+
+        # The merged partial results should match a single stream
+        streamed = autoMPGDataTest.stream_aggregate('make')
+        parallel = autoMPGDataTest.parallel_aggregate('make', 3)
+        self.assertEqual(set(parallel), set(streamed))
+        for make in streamed:
+            for statistic in ('count', 'sum', 'mean', 'min', 'max', 'var'):
+                self.assertAlmostEqual(parallel[make][statistic], streamed[make][statistic])
+
+    # Create test for incremental_aggregate
+    def test_incremental_aggregate(self):
+        '''
+        Description:
+        Tests the incremental_aggregate method of AutoMPGData.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        with tempfile.TemporaryDirectory() as directory:
+            dataPath = os.path.join(directory, 'auto-mpg.data.txt')
+            shutil.copy('auto-mpg.data.txt', dataPath)
+            size = os.path.getsize(dataPath)
+
+            # The first call aggregates the whole file and saves the state
+            autoMPGDataTest = AutoMPGData(dataPath, load=False)
+            first = autoMPGDataTest.incremental_aggregate('make')
+            self.assertEqual(first, autoMPGDataTest.stream_aggregate('make'))
+            self.assertTrue(os.path.exists(os.path.join(directory, 'auto-mpg.state.json')))
+
+            # Append one complete row and one row still being written; only the complete row is parsed
+            with open(dataPath, 'a') as file:
+                file.write('30.0   4   98.00      ?          2046.      19.0   83  1\t"ford pinto"\n')
+                file.write('31.0   4   98.00      70.0       2046.      19.0   83  1\t"ford')
+            with mock.patch.object(AutoMPGData, 'stream_aggregate', wraps=autoMPGDataTest.stream_aggregate) as streamed:
+                second = AutoMPGData(dataPath, load=False).incremental_aggregate('make')
+                self.assertEqual(streamed.call_args.args[1], size)
+            self.assertEqual(second['ford']['count'], first['ford']['count'] + 1)
+            self.assertAlmostEqual(second['ford']['mean'], (first['ford']['sum'] + 30.0) / (first['ford']['count'] + 1))
+            self.assertEqual(second['ford']['max'], max(first['ford']['max'], 30.0))
+
+            # Rewriting the file (instead of appending) recomputes everything
+            shutil.copy('auto-mpg.data.txt', dataPath)
+            self.assertEqual(AutoMPGData(dataPath, load=False).incremental_aggregate('make'), first)
+
+    # Create test for _load_cache
+    def test__load_cache(self):
+        '''
+        Description:
+        Tests the _load_cache and _write_cache methods of AutoMPGData.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        with tempfile.TemporaryDirectory() as directory:
+            # Copy the data file so the cache is written into the temporary directory
+            dataPath = os.path.join(directory, 'auto-mpg.data.txt')
+            shutil.copy('auto-mpg.data.txt', dataPath)
+            parsed = list(AutoMPGData(dataPath))
+            self.assertTrue(os.path.exists(os.path.join(directory, 'auto-mpg.cache.npz')))
+
+            # A second load must come from the cache without parsing
+            with mock.patch.object(AutoMPGData, 'iter_records', side_effect=AssertionError("parsed")):
+                self.assertEqual(list(AutoMPGData(dataPath)), parsed)
+
+                # Touching the file changes the modification time but not the hash, so the cache stays valid
+                os.utime(dataPath, ns=(0, 0))
+                self.assertEqual(list(AutoMPGData(dataPath)), parsed)
+
+            # Appending a row makes the cache stale
+            with open(dataPath, 'a') as file:
+                file.write('25.0   4   98.00      ?          2046.      19.0   71  1\t"ford pinto"\n')
+            self.assertEqual(len(AutoMPGData(dataPath)), len(parsed) + 1)
+
+    # Create test for from_binary
+    def test_from_binary(self):
+        '''
+        Description:
+        Tests the write_binary and from_binary methods of AutoMPGData.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object
+        autoMPGDataTest = AutoMPGData()
+        with tempfile.TemporaryDirectory() as directory:
+            # Write the binary form and map it back in
+            autoMPGDataTest.write_binary(directory)
+            mapped = AutoMPGData.from_binary(directory)
+            self.assertIsInstance(mapped._columns['mpg'], np.memmap)
+
+            # Iteration, sorting and aggregation work over the mapped columns
+            self.assertEqual(list(mapped), list(autoMPGDataTest))
+            self.assertEqual(mapped.mpg_by_make(), autoMPGDataTest.mpg_by_make())
+            mapped.sort_by_mpg()
+            autoMPGDataTest.sort_by_mpg()
+            self.assertEqual(list(mapped), list(autoMPGDataTest))
+            del mapped
+
+            # The write_binary command writes only the rows that pass --where
+            parser = buildParser()
+            filteredDirectory = os.path.join(directory, 'filtered')
+            runCommand(parser.parse_args(['write_binary', '-b', filteredDirectory, '--where', 'year>=80']), parser, outputDestination=io.StringIO())
+            self.assertEqual(list(AutoMPGData.from_binary(filteredDirectory)), list(AutoMPGData(where=['year>=80'])))
+
+    # Create test for from_partitioned
+    def test_from_partitioned(self):
+        '''
+        Description:
+        Tests the write_partitioned and from_partitioned methods of AutoMPGData.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object
+        autoMPGDataTest = AutoMPGData()
+        with tempfile.TemporaryDirectory() as directory:
+            autoMPGDataTest.write_partitioned(directory, by=['year', 'make'])
+            with open(os.path.join(directory, 'manifest.json')) as file:
+                manifest = json.load(file)
+            self.assertEqual(sum(partition['rows'] for partition in manifest['partitions']), len(autoMPGDataTest))
+            self.assertEqual(len(manifest['partitions']), len({(car.year, car.make) for car in autoMPGDataTest}))
+
+            # Every partition read back gives the rows in file order
+            self.assertEqual(list(AutoMPGData.from_partitioned(directory)), list(autoMPGDataTest))
+
+            # Filters on partition columns and on mpg leave partitions out without reading them
+            where = ['year>=80', 'make!=ford', 'mpg>30']
+            pruned = AutoMPGData.from_partitioned(directory, where=where)
+            self.assertEqual(list(pruned), list(AutoMPGData(where=where)))
+            self.assertEqual(len(pruned._manifest['partitions']), len({(car.year, car.make) for car in AutoMPGData(where=where[:2]) if car.mpg > 30}))
+
+            # Averages by a partition column come from the manifest, without reading rows
+            manifestOnly = AutoMPGData.from_partitioned(directory, where=['year<75'], load=False)
+            with mock.patch.object(AutoMPGData, '_compute_aggregate', side_effect=AssertionError("rows read")):
+                byYear, byMake = manifestOnly.mpg_by_year(), manifestOnly.mpg_by_make()
+            filtered = AutoMPGData(where=['year<75'])
+            for expected, result in ((filtered.mpg_by_year(), byYear), (filtered.mpg_by_make(), byMake)):
+                self.assertEqual(set(result), set(expected))
+                for group, mean in expected.items():
+                    self.assertAlmostEqual(result[group], mean)
+            with self.assertRaises(ValueError):
+                autoMPGDataTest.write_partitioned(directory, by=['mpg'])
+
+    # Create test for writeCsv
+    def test_writeCsv(self):
+        '''
+        Description:
+        Tests the bulk CSV output of the print command.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object, sorted so that the chunks follow the sort order
+        autoMPGDataTest = AutoMPGData()
+        autoMPGDataTest.sort_by_mpg()
+        header = ['Make', 'Model', 'Year', 'MPG']
+
+        # The bulk writer should be byte-identical to writing row by row, with several chunks
+        expected = io.StringIO()
+        writer = csv.writer(expected)
+        writer.writerow(header)
+        for car in autoMPGDataTest:
+            writer.writerow([car.make, car.model, car.year, car.mpg])
+        written = io.StringIO()
+        with mock.patch.object(type(autoMPGDataTest.data), 'CHUNK_SIZE', 50):
+            writeCsv(written, header, autoMPGDataTest.data.iter_chunks())
+        self.assertEqual(written.getvalue(), expected.getvalue())
+
+        # A .gz output file is compressed and reads back the same
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'output.csv.gz')
+            with openOutput(path) as file:
+                writeCsv(file, header, autoMPGDataTest.data.iter_chunks())
+            with gzip.open(path, 'rt', newline='') as file:
+                self.assertEqual(file.read(), expected.getvalue())
+
+    # Create test for from_arrow
+    @unittest.skipUnless(importlib.util.find_spec('pyarrow'), "pyarrow is not installed")
+    def test_from_arrow(self):
+        '''
+        Description:
+        Tests the write_arrow and from_arrow methods of AutoMPGData.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object
+        autoMPGDataTest = AutoMPGData()
+        with tempfile.TemporaryDirectory() as directory:
+            for name in ('auto-mpg.arrow', 'auto-mpg.parquet'):
+                # Every column comes back with its own type and values
+                path = os.path.join(directory, name)
+                autoMPGDataTest.write_arrow(path)
+                readBack = AutoMPGData.from_arrow(path)
+                for column in ('mpg', 'horsepower', 'year', 'make', 'model'):
+                    self.assertEqual(readBack.column(column).dtype, autoMPGDataTest.column(column).dtype)
+                    np.testing.assert_array_equal(readBack.column(column), autoMPGDataTest.column(column))
+                self.assertEqual(list(readBack), list(autoMPGDataTest))
+
+                # A projection reads only the columns asked for, plus those of the filters
+                projected = AutoMPGData.from_arrow(path, columns=('year', 'mpg'), where=["origin==1"])
+                self.assertEqual(set(projected._columns), {'year', 'mpg', 'origin'})
+                self.assertEqual(projected.mpg_by_year(), AutoMPGData(where=["origin==1"]).mpg_by_year())
+                with self.assertRaises(ValueError):
+                    projected.column('weight')
+
+    # Create test for top_k
+    def test_top_k(self):
+        '''
+        Description:
+        Tests the top_k method of AutoMPGData.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object
+        autoMPGDataTest = AutoMPGData()
+        streamed = AutoMPGData(load=False)
+
+        # The best cars match a full sort by mpg (highest first, ties in file order)
+        mpg = autoMPGDataTest.column('mpg')
+        expected = np.argsort(-mpg, kind='stable')[:5]
+        self.assertEqual([car for _, car in autoMPGDataTest.top_k('mpg', 5)], [autoMPGDataTest._row(row) for row in expected])
+        self.assertEqual(streamed.top_k('mpg', 5, stream=True), autoMPGDataTest.top_k('mpg', 5))
+
+        # Per group, lowest first, leaving out missing horsepower values
+        lowest = autoMPGDataTest.top_k('horsepower', 3, by='origin', largest=False)
+        self.assertEqual(set(lowest), {1, 2, 3})
+        for origin, cars in lowest.items():
+            values = autoMPGDataTest.column('horsepower')[autoMPGDataTest.column('origin') == origin]
+            self.assertEqual([value for value, _ in cars], sorted(values[~np.isnan(values)])[:3])
+        self.assertEqual(streamed.top_k('horsepower', 3, by='origin', largest=False, stream=True), lowest)
+
+    # Create test for quantiles
+    def test_quantiles(self):
+        '''
+        Description:
+        Tests the quantiles method of AutoMPGData and the QuantileSketch class.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object
+        autoMPGDataTest = AutoMPGData()
+        mpg = autoMPGDataTest.column('mpg')
+
+        # Exact quantiles from the columns
+        quantiles = autoMPGDataTest.quantiles('mpg', [0, 0.5, 0.9, 1])
+        self.assertEqual(quantiles, dict(zip([0, 0.5, 0.9, 1], np.quantile(mpg, [0, 0.5, 0.9, 1]).tolist())))
+        byYear = autoMPGDataTest.quantiles('mpg', [0.5], by='year')
+        self.assertEqual(byYear[70][0.5], np.median(mpg[autoMPGDataTest.column('year') == 70]))
+
+        # Streamed quantiles are within the sketch's relative accuracy of a value of the data
+        streamed = AutoMPGData(load=False).quantiles('mpg', [0, 0.25, 0.5, 0.75, 1], stream=True)
+        self.assertEqual((streamed[0], streamed[1]), (mpg.min(), mpg.max()))
+        for q in (0.25, 0.5, 0.75):
+            exact = np.quantile(mpg, q, method='lower')
+            self.assertLessEqual(abs(streamed[q] - exact), 0.02 * exact)
+
+        # Sketches of two halves merge into the sketch of the whole
+        first, second, whole = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for index, value in enumerate(mpg.tolist() + [-3.0, 0.0]):
+            (first if index % 2 else second).add(value)
+            whole.add(value)
+        first.merge(second)
+        self.assertEqual([first.quantile(q) for q in (0, 0.1, 0.5, 0.99)], [whole.quantile(q) for q in (0, 0.1, 0.5, 0.99)])
+        self.assertEqual(first.quantile(0), -3.0)
+
+    # Create test for external_sort
+    def test_external_sort(self):
+        '''
+        Description:
+        Tests that the external sort spills and merges runs into the order of sort_by_*.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        autoMPGDataTest = AutoMPGData()
+        streamed = AutoMPGData(load=False, where=['year>=72'])
+        filtered = AutoMPGData(where=['year>=72'])
+        with tempfile.TemporaryDirectory() as directory:
+            # Runs of 32 rows merged two at a time: many runs and several merge passes
+            with mock.patch('autompg3.SPILL_BLOCK_ROWS', 16):
+                for sortOrder in ('default', 'year', 'mpg'):
+                    chunks = list(autoMPGDataTest.external_sort(sortOrder, 2 * 16 * 256, directory))
+                    self.assertGreater(len(chunks), 1)
+                    expected = [row for chunk in autoMPGDataTest.ordered(sortOrder).iter_chunks() for row in chunk]
+                    self.assertEqual([row for chunk in chunks for row in chunk], expected)
+
+                # Filters apply while the file is read
+                expected = [row for chunk in filtered.ordered('mpg').iter_chunks() for row in chunk]
+                self.assertEqual([row for chunk in streamed.external_sort('mpg', 2 * 16 * 256, directory) for row in chunk], expected)
+
+            # Without spilling, and with the run files removed afterwards
+            self.assertEqual(len(list(autoMPGDataTest.external_sort('year', directory=directory))), 1)
+            self.assertEqual(os.listdir(directory), [])
+        with self.assertRaises(ValueError):
+            next(autoMPGDataTest.external_sort('weight'))
+
+    # Create test for rollup
+    def test_rollup(self):
+        '''
+        Description:
+        Tests the rollup cube of AutoMPGData and the RollupCube class.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        with tempfile.TemporaryDirectory() as directory:
+            dataPath = os.path.join(directory, 'auto-mpg.data.txt')
+            shutil.copy('auto-mpg.data.txt', dataPath)
+            autoMPGDataTest = AutoMPGData(dataPath)
+
+            # The first call builds and saves the cube; averages by year or make are the same as from the rows
+            self.assertEqual(AutoMPGData(dataPath, load=False).mpg_by_year(rollup=True), autoMPGDataTest.mpg_by_year())
+            self.assertTrue(os.path.exists(os.path.join(directory, 'auto-mpg.cube.npz')))
+
+            # Later calls read the saved cube without building it again
+            with mock.patch.object(RollupCube, 'from_dataset', side_effect=AssertionError("cube rebuilt")):
+                cube = AutoMPGData(dataPath, load=False).rollup()
+                self.assertEqual(AutoMPGData(dataPath, load=False).mpg_by_make(rollup=True), autoMPGDataTest.mpg_by_make())
+
+            # Coarser groupings with filters are added up from the cells
+            mpgByGroup = {}
+            columns = AutoMPGData(dataPath, where=['year>=76', 'make!=ford'])._columns
+            for origin, cylinders, mpg in zip(columns['origin'].tolist(), columns['cylinders'].tolist(), columns['mpg'].tolist()):
+                mpgByGroup.setdefault((origin, cylinders), []).append(mpg)
+            stats = cube.aggregate(['origin', 'cylinders'], ['year>=76', 'make!=ford'])
+            self.assertEqual(set(stats), set(mpgByGroup))
+            for group, values in mpgByGroup.items():
+                self.assertEqual(stats[group]['count'], len(values))
+                self.assertAlmostEqual(stats[group]['mean'], sum(values) / len(values))
+                self.assertEqual((stats[group]['min'], stats[group]['max']), (min(values), max(values)))
+            with self.assertRaises(ValueError):
+                cube.aggregate('model')
+
+            # A loaded dataset without filters builds the cube from its own rows instead of loading them again
+            os.remove(os.path.join(directory, 'auto-mpg.cube.npz'))
+            with mock.patch.object(AutoMPGData, '_load_data', side_effect=AssertionError("data loaded again")):
+                self.assertEqual(autoMPGDataTest.rollup().aggregate('make'), {make: {name: stats[name] for name in ('count', 'sum', 'mean', 'min', 'max')}
+                                                                             for make, stats in autoMPGDataTest.aggregate('make').items()})
+
+            # Without the cache the cube is built in memory and nothing is written
+            os.remove(os.path.join(directory, 'auto-mpg.cube.npz'))
+            self.assertEqual(AutoMPGData(dataPath, load=False, cache=False).mpg_by_make(rollup=True), autoMPGDataTest.mpg_by_make())
+            self.assertFalse(os.path.exists(os.path.join(directory, 'auto-mpg.cube.npz')))
+
+            # Changing the data file rebuilds the cube
+            with open(dataPath, 'a') as file:
+                file.write('30.0   4   98.00      ?          2046.      19.0   82  1\t"ford pinto"\n')
+            with mock.patch.object(RollupCube, 'from_dataset', wraps=RollupCube.from_dataset) as built:
+                stats = AutoMPGData(dataPath, load=False).rollup().aggregate('year')
+                self.assertEqual(built.call_count, 1)
+            self.assertEqual(stats[82]['count'], autoMPGDataTest.aggregate('year')[82]['count'] + 1)
+
+class test_AutoMPGQuery(unittest.TestCase):
+    """
+    Description:
+    Tests the filter and group-by query API.
+
+    Methods:
+        test_parsePredicate(self):
+            Tests parsing predicates written as text or with col.
+
+        test_agg(self):
+            Tests grouping on several columns with filters.
+
+        test_pushdown(self):
+            Tests filters pushed down into the loader.
+
+        test_missing_values(self):
+            Tests that rows with a missing value never match a filter on it.
+    """
+
+    # Create test for parsePredicate
+    def test_parsePredicate(self):
+        '''
+        Description:
+        Tests parsing predicates written as text or with col.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        self.assertEqual(parsePredicate("year>=76"), Predicate('year', '>=', 76.0))
+        self.assertEqual(parsePredicate(" make = 'ford' "), Predicate('make', '==', 'ford'))
+        self.assertEqual(col('origin') != 1, Predicate('origin', '!=', 1))
+        with self.assertRaises(ValueError):
+            parsePredicate("colour==red")
+
+    # Create test for agg
+    def test_agg(self):
+        '''
+        Description:
+        Tests grouping on several columns with filters.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # Create object
+        autoMPGDataTest = AutoMPGData()
+        results = autoMPGDataTest.where("year>=76", col('origin') == 1).group_by(["make", "year"]).agg(mpg="mean", weight=["min", "count"])
+
+        # Compute the same groups by hand
+        origins = autoMPGDataTest.column('origin')
+        weights = autoMPGDataTest.column('weight')
+        groups = {}
+        for row, car in enumerate(autoMPGDataTest):
+            if car.year >= 76 and origins[row] == 1:
+                groups.setdefault((car.make, car.year), []).append((car.mpg, weights[row]))
+
+        self.assertEqual(set(results), set(groups))
+        for group, values in groups.items():
+            self.assertAlmostEqual(results[group]['mpg'], sum(mpg for mpg, _ in values) / len(values))
+            self.assertEqual(results[group]['weight_min'], min(weight for _, weight in values))
+            self.assertEqual(results[group]['weight_count'], len(values))
+
+    # Create test for predicate pushdown
+    def test_pushdown(self):
+        '''
+        Description:
+        Tests filters pushed down into the loader.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        with tempfile.TemporaryDirectory() as directory:
+            dataPath = os.path.join(directory, 'auto-mpg.data.txt')
+            shutil.copy('auto-mpg.data.txt', dataPath)
+            everything = AutoMPGData(dataPath, cache=False)
+
+            # Only the matching rows are stored, and a filtered load does not write the cache
+            filtered = AutoMPGData(dataPath, where=["year>=76", "make==ford"])
+            self.assertEqual(list(filtered), list(everything.where("year>=76", "make==ford")))
+            self.assertTrue(all(car.make == 'ford' and car.year >= 76 for car in filtered))
+            self.assertFalse(os.path.exists(os.path.join(directory, 'auto-mpg.cache.npz')))
+
+            # The same filters applied to a cached load give the same rows
+            AutoMPGData(dataPath)
+            self.assertEqual(list(AutoMPGData(dataPath, where=["year>=76", "make==ford"])), list(filtered))
+
+            # Streaming aggregation honours the filters too
+            streamed = AutoMPGData(dataPath, load=False, where=["make==ford"]).mpg_by_year(stream=True)
+            queried = everything.where("make==ford").group_by("year").agg(mpg="mean")
+            self.assertEqual(set(streamed), set(queried))
+            for year in queried:
+                self.assertAlmostEqual(streamed[year], queried[year]['mpg'])
+
+    # Create test for filters on missing values
+    def test_missing_values(self):
+        '''
+        Description:
+        Tests that rows with a missing value never match a filter on it.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        everything = AutoMPGData()
+        horsepower = everything._columns['horsepower']
+        self.assertGreater(int(np.isnan(horsepower).sum()), 0)
+        for predicate, expected in (("horsepower!=100", horsepower != 100), ("horsepower<100", horsepower < 100)):
+            expected &= ~np.isnan(horsepower)
+
+            # Masks over loaded columns, filters pushed into the loader and streaming all leave the missing values out
+            self.assertEqual(len(everything.where(predicate)), int(expected.sum()))
+            self.assertEqual(len(AutoMPGData(cache=False, where=[predicate])), int(expected.sum()))
+            streamed = AutoMPGData(load=False, where=[predicate]).stream_aggregate('year')
+            self.assertEqual(sum(stats['count'] for stats in streamed.values()), int(expected.sum()))
+
+class test_bench_autompg3(unittest.TestCase):
+    """
+    Description:
+    Tests the synthetic data generator and the benchmark harness.
+
+    Methods:
+        test_generateData(self):
+            Tests that generated files load like the real dataset.
+
+        test_runBenchmark(self):
+            Tests that every stage is reported.
+
+        test_measureStartup(self):
+            Tests that importing autompg3 does not load the modules only some commands need.
+    """
+
+    # Create test for generateData
+    def test_generateData(self):
+        '''
+        Description:
+        Tests that generated files load like the real dataset.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        with tempfile.TemporaryDirectory() as directory:
+            dataPath = os.path.join(directory, 'auto-mpg.data.txt')
+            generateData(dataPath, 500, seed=1)
+            autoMPGDataTest = AutoMPGData(dataPath, cache=False)
+            # Every row loads, '?' horsepower appears, and the typo makes have been corrected
+            self.assertEqual(len(autoMPGDataTest), 500)
+            self.assertIn('?', [record.horsepower for record in autoMPGDataTest.iter_records()])
+            self.assertNotIn('vw', autoMPGDataTest.mpg_by_make())
+
+    # Create test for runBenchmark
+    def test_runBenchmark(self):
+        '''
+        Description:
+        Tests that every stage is reported.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        result = runBenchmark(200, allocations=True)
+        self.assertEqual(result['rows'], 200)
+        for stage in ('legacy_clean_data', '_load_data', 'sort_by_default', 'sort_by_year', 'sort_by_mpg', 'mpg_by_year', 'mpg_by_make', 'csv_output'):
+            self.assertIn('seconds', result['stages'][stage])
+            self.assertIn('peakAllocatedBytes', result['stages'][stage])
+
+    # Create test for measureStartup
+    def test_measureStartup(self):
+        '''
+        Description:
+        Tests that importing autompg3 does not load the modules only some commands need.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        result = measureStartup(repeat=1)
+        self.assertEqual(result['heavyModules'], [])
+        self.assertGreater(result['seconds'], 0)
+
+# Define test_MakeNormalizer class for testing the make-normalization stage
+class test_MakeNormalizer(unittest.TestCase):
+    """
+    Description:
+    Tests the MakeNormalizer class.
+
+    Methods:
+        test_apply(self):
+            Tests mapping a make dictionary and its codes onto canonical makes.
+
+        test_from_file(self):
+            Tests loading with an alias file.
+    """
+
+    # Create test for apply
+    def test_apply(self):
+        '''
+        Description:
+        Tests mapping a make dictionary and its codes onto canonical makes.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        normalizer = MakeNormalizer()
+        makes, codes, hits = normalizer.apply(['vw', 'ford', 'volkswagen', 'chevy'], np.array([0, 1, 2, 0, 3, 0], dtype=np.int32))
+        # Aliases share the code of their canonical make, which keeps the position of its first alias
+        self.assertEqual(makes, ['volkswagen', 'ford', 'chevrolet'])
+        self.assertEqual(codes.tolist(), [0, 1, 0, 0, 2, 0])
+        self.assertEqual(hits, {'vw': 3, 'chevy': 1})
+
+    # Create test for from_file
+    def test_from_file(self):
+        '''
+        Description:
+        Tests loading with an alias file.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        with tempfile.TemporaryDirectory() as directory:
+            aliasPath = os.path.join(directory, 'aliases.csv')
+            with open(aliasPath, 'w') as file:
+                file.write("# make aliases\nvw,volkswagen\n\nchevrolet,chevy\n")
+            normalizer = MakeNormalizer.from_file(aliasPath)
+            self.assertEqual(normalizer.aliases, {'vw': 'volkswagen', 'chevrolet': 'chevy'})
+
+            # The table replaces the built-in corrections, for loaded and streamed data alike
+            autoMPGDataTest = AutoMPGData(normalizer=normalizer)
+            averages = autoMPGDataTest.mpg_by_make()
+            self.assertIn('chevy', averages)
+            self.assertIn('vokswagen', averages)
+            self.assertNotIn('chevrolet', averages)
+            self.assertEqual(autoMPGDataTest._corrections['vw'], 6)
+            self.assertEqual(AutoMPGData(load=False, normalizer=normalizer).mpg_by_make(stream=True), averages)
+
+            # Filters on make see the normalized makes
+            self.assertEqual(len(AutoMPGData(cache=False, where=["make==chevy"], normalizer=normalizer)), autoMPGDataTest.aggregate('make')['chevy']['count'])
+
+            # A malformed line is reported
+            with open(aliasPath, 'a') as file:
+                file.write("ford\n")
+            with self.assertRaises(ValueError):
+                MakeNormalizer.from_file(aliasPath)
+
+# Define test_AutoMPGServer class for testing the query server
+class test_AutoMPGServer(unittest.TestCase):
+    """
+    Description:
+    Tests the AutoMPGServer class.
+
+    Methods:
+        test_answer(self):
+            Tests that answers match the command line, are kept, and are dropped when the data file changes.
+
+        test_make_server(self):
+            Tests answering over HTTP.
+    """
+
+    # Create test for answer
+    def test_answer(self):
+        '''
+        Description:
+        Tests that answers match the command line, are kept, and are dropped when the data file changes.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        with tempfile.TemporaryDirectory() as directory:
+            dataPath = os.path.join(directory, 'auto-mpg.data.txt')
+            shutil.copy('auto-mpg.data.txt', dataPath)
+            server = AutoMPGServer(dataPath, cache=False)
+
+            # The answer is the CSV output of the command, and is computed only once
+            lines = server.answer('mpg_by_year', {}).decode().splitlines()
+            self.assertEqual(lines[0], 'Year,Average MPG')
+            self.assertEqual(len(lines), 1 + len(AutoMPGData(dataPath, cache=False).mpg_by_year()))
+            with mock.patch.object(server, '_run') as run:
+                server.answer('mpg_by_year', {})
+                run.assert_not_called()
+
+            # Filters and parameters are part of the question
+            filtered = server.answer('print', {'sort': ['mpg'], 'where': ['year>=80']}).decode().splitlines()
+            self.assertEqual(len(filtered), 1 + len(AutoMPGData(dataPath, cache=False, where=['year>=80'])))
+            with self.assertRaises(ValueError):
+                server.answer('print', {'sort': ['weight']})
+
+            # Appending a row loads the data file again
+            with open(dataPath, 'a') as file:
+                file.write('25.0   4   98.00      ?          2046.      19.0   71  1\t"ford pinto"\n')
+            self.assertEqual(len(server.answer('print', {}).decode().splitlines()), 2 + len(AutoMPGData()))
+
+    # Create test for make_server
+    def test_make_server(self):
+        '''
+        Description:
+        Tests answering over HTTP.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        import urllib.request
+        import urllib.error
+        httpServer = AutoMPGServer().make_server('127.0.0.1', 0)
+        threading.Thread(target=httpServer.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{httpServer.server_address[1]}"
+        try:
+            with urllib.request.urlopen(url + '/query?group_by=origin&agg=mpg=mean,max') as response:
+                self.assertEqual(response.read().decode().splitlines()[0], 'origin,mpg_mean,mpg_max')
+            with self.assertRaises(urllib.error.HTTPError) as raised:
+                urllib.request.urlopen(url + '/plot')
+            self.assertEqual(raised.exception.code, 404)
+        finally:
+            httpServer.shutdown()
+            httpServer.server_close()
+
+# Create class to test the batch command
+class test_batch(unittest.TestCase):
+    """
+    Description:
+    Tests the batch command.
+
+    Methods:
+        test_runBatch(self):
+            Tests that the steps of a batch match separate runs and share one load of the data.
+    """
+
+    # Create test for runBatch
+    def test_runBatch(self):
+        '''
+        Description:
+        Tests that the steps of a batch match separate runs and share one load of the data.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        parser = buildParser()
+        with tempfile.TemporaryDirectory() as directory:
+            path = lambda name: os.path.join(directory, name)
+            steps = ['print -s year -o ' + path('year.csv'), 'mpg_by_year -o ' + path('mpg_by_year.csv'), 'mpg_by_make -o ' + path('mpg_by_make.csv')]
+
+            # Run every step on its own
+            expected = {}
+            for step in steps:
+                stepArgs = parser.parse_args(step.split() + ['--no-cache'])
+                runCommand(stepArgs, parser)
+                with open(stepArgs.ofile) as file:
+                    expected[stepArgs.ofile] = file.read()
+                os.remove(stepArgs.ofile)
+
+            # Run them as one batch, partly from a job file; the data is loaded and each aggregate computed once
+            with open(path('job.txt'), 'w') as file:
+                file.write('# the averages\n' + steps[1] + '\n' + steps[2] + '  # per make\n' + steps[1] + '\n')
+            batchArgs = parser.parse_args(['batch', '--step', steps[0], '--job', path('job.txt'), '--no-cache'])
+            with mock.patch.object(AutoMPGData, '_load_data', autospec=True, side_effect=AutoMPGData._load_data) as loaded, \
+                 mock.patch.object(AutoMPGData, '_compute_aggregate', autospec=True, side_effect=AutoMPGData._compute_aggregate) as computed:
+                runCommand(batchArgs, parser)
+            self.assertEqual(loaded.call_count, 1)
+            self.assertEqual(computed.call_count, 2)
+            for name, text in expected.items():
+                with open(name) as file:
+                    self.assertEqual(file.read(), text)
+
+            # Filters of a step are added to those of the batch, and such a step reads its own data
+            output = io.StringIO()
+            batchArgs = parser.parse_args(['batch', '--step', 'print', '--step', 'print --where make=ford', '--where', 'year>=80', '--no-cache'])
+            with mock.patch('sys.stdout', output):
+                runCommand(batchArgs, parser)
+            lines = output.getvalue().splitlines()
+            self.assertEqual(len(lines), 2 + len(AutoMPGData(cache=False, where=['year>=80'])) + len(AutoMPGData(cache=False, where=['year>=80', 'make=ford'])))
+
+            # A batch cannot run another batch
+            with self.assertRaises(ValueError):
+                runCommand(parser.parse_args(['batch', '--step', 'batch --step print']), parser, outputDestination=io.StringIO())
+
+# Create class to test the Profiler class
+class test_Profiler(unittest.TestCase):
+    """
+    Description:
+    Tests the Profiler class and the --profile option.
+
+    Methods:
+        test_stage(self):
+            Tests that stages and counters are recorded when enabled, and that nothing is when disabled.
+
+        test_profileCommand(self):
+            Tests that a profiled command writes the same output and reports its stages.
+    """
+
+    # Create test for stage
+    def test_stage(self):
+        '''
+        Description:
+        Tests that stages and counters are recorded when enabled, and that nothing is when disabled.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        # A disabled profiler hands out the shared inert stage
+        profiler = Profiler()
+        with profiler.stage('parse') as stage:
+            stage.rows = 10
+        profiler.count('cache_hits')
+        self.assertIs(profiler.stage('parse'), NULL_STAGE)
+        self.assertEqual((profiler.stages, dict(profiler.counters)), ({}, {}))
+
+        # Runs of a stage add up; nested stages keep the allocation peak of their parent
+        profiler.enable(memory=True)
+        try:
+            for _ in range(2):
+                with profiler.stage('parse') as stage:
+                    stage.rows = 100
+            with profiler.stage('aggregate', rows=50):
+                kept = bytearray(1 << 20)
+                with profiler.stage('sort'):
+                    bytearray(1 << 16)
+                del kept
+            profiler.count('cache_hits', 2)
+        finally:
+            profiler.disable()
+        report = profiler.report()
+        self.assertEqual(report['stages']['parse']['calls'], 2)
+        self.assertEqual(report['stages']['parse']['rows'], 200)
+        self.assertGreater(report['stages']['parse']['rowsPerSecond'], 0)
+        self.assertGreaterEqual(report['stages']['aggregate']['peakAllocatedBytes'], 1 << 20)
+        self.assertLess(report['stages']['sort']['peakAllocatedBytes'], 1 << 20)
+        self.assertEqual(report['counters'], {'cache_hits': 2})
+        self.assertIs(profiler.stage('parse'), NULL_STAGE)
+
+    # Create test for profileCommand
+    def test_profileCommand(self):
+        '''
+        Description:
+        Tests that a profiled command writes the same output and reports its stages.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        parser = buildParser()
+        with tempfile.TemporaryDirectory() as directory:
+            path = lambda name: os.path.join(directory, name)
+            runCommand(parser.parse_args(['print', '-s', 'mpg', '--no-cache', '-o', path('plain.csv')]), parser)
+            profileCommand(parser.parse_args(['print', '-s', 'mpg', '--no-cache', '-o', path('profiled.csv'), '--profile', path('profile.json')]), parser)
+            with open(path('plain.csv')) as plain, open(path('profiled.csv')) as profiled:
+                self.assertEqual(plain.read(), profiled.read())
+            with open(path('profile.json')) as file:
+                report = json.load(file)
+            self.assertEqual(report['command'], 'print')
+            self.assertLessEqual({'parse', 'construct', 'normalize', 'sort', 'write'}, set(report['stages']))
+            self.assertEqual(report['stages']['write']['rows'], len(AutoMPGData(cache=False)))
+
+            # A .pstats file is a cProfile dump
+            profileCommand(parser.parse_args(['mpg_by_year', '--no-cache', '-o', path('averages.csv'), '--profile', path('profile.pstats')]), parser)
+            self.assertIn('runCommand', [function for _, _, function in pstats.Stats(path('profile.pstats')).stats])
+
+# Define the function that builds a local HTTP server handler standing in for the dataset mirrors
+def makeDataRequestHandler(files):
+    '''
+    Description:
+    Returns a new request handler class serving files, so that each test starts from a fresh state.
+    http.server is only imported here, so that importing this module does not load the HTTP stack.
+
+    Arguments:
+    files (dict): the bodies to serve, keyed by path.
+
+    Returns:
+    class derived from http.server.BaseHTTPRequestHandler.
+    '''
+    import http.server
+
+    # Define DataRequestHandler class
+    class DataRequestHandler(http.server.BaseHTTPRequestHandler):
+        """
+        Description:
+        Serves files from the class attribute files ({path: bytes}) with an ETag, honouring If-None-Match,
+        Range and If-Range. The first dropConnections responses send only half of the body and then close
+        the connection, and every response is 416 while rangeNotSatisfiable is set. Every request's headers
+        are recorded in requests.
+        """
+        files = {}
+        etag = '"v1"'
+        dropConnections = 0
+        rangeNotSatisfiable = False
+        requests = []
+
+        # Answer a GET request
+        def do_GET(self):
+            handler = type(self)
+            handler.requests.append(dict(self.headers))
+            body = handler.files[self.path]
+
+            # The server cannot send the range asked for
+            if handler.rangeNotSatisfiable:
+                self.send_response(416)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            # The client's copy is current
+            if self.headers.get('If-None-Match') == handler.etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+
+            # Send the rest of the file for a Range request, unless If-Range names another version
+            start = 0
+            if self.headers.get('Range') and self.headers.get('If-Range', handler.etag) == handler.etag:
+                start = int(self.headers['Range'][len('bytes='):-1])
+            self.send_response(206 if start else 200)
+            self.send_header('ETag', handler.etag)
+            self.send_header('Content-Length', str(len(body) - start))
+            if start:
+                self.send_header('Content-Range', f"bytes {start}-{len(body) - 1}/{len(body)}")
+            self.end_headers()
+
+            # Drop the connection half-way through if asked to
+            if handler.dropConnections:
+                handler.dropConnections -= 1
+                self.wfile.write(body[start:start + (len(body) - start) // 2])
+                self.wfile.flush()
+                self.close_connection = True
+                return
+            self.wfile.write(body[start:])
+
+        # Keep the test output quiet
+        def log_message(self, format, *args):
+            return None
+
+    DataRequestHandler.files = files
+    return DataRequestHandler
+
+# Define test_fetch class for testing the download functions
+class test_fetch(unittest.TestCase):
+    """
+    Description:
+    Tests fetchFile and fetchShards against a local HTTP server.
+
+    Methods:
+        test_fetchFile(self):
+            Tests downloading, resuming, conditional requests and checksums.
+
+        test_fetchShards(self):
+            Tests downloading the shards of a file concurrently.
+    """
+
+    # Start the server before each test
+    def setUp(self):
+        with open('auto-mpg.data.txt', 'rb') as file:
+            self.body = file.read()
+        import http.server
+        self.handler = makeDataRequestHandler({'/auto-mpg.data': self.body, '/shard0': self.body[:10000],
+                                               '/shard1': self.body[10000:20000], '/shard2': self.body[20000:]})
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), self.handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.directory = tempfile.mkdtemp()
+        self.backoff = mock.patch('autompg3.FETCH_BACKOFF', 0)
+        self.backoff.start()
+
+    # Stop the server after each test
+    def tearDown(self):
+        self.backoff.stop()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    # Create test for fetchFile
+    def test_fetchFile(self):
+        '''
+        Description:
+        Tests downloading, resuming, conditional requests and checksums.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        path = os.path.join(self.directory, 'auto-mpg.data.txt')
+        sha256 = hashlib.sha256(self.body).hexdigest()
+
+        # A dropped connection is resumed from the blocks already written
+        self.handler.dropConnections = 1
+        with mock.patch('autompg3.FETCH_CHUNK_SIZE', 1024):
+            self.assertTrue(fetchFile(self.url + '/auto-mpg.data', path, sha256))
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), self.body)
+        self.assertEqual(self.handler.requests[1]['Range'], f"bytes={len(self.body) // 2 // 1024 * 1024}-")
+        self.assertFalse(os.path.exists(path + '.part'))
+
+        # Fetching again sends the ETag and leaves the unchanged file alone
+        self.assertFalse(fetchFile(self.url + '/auto-mpg.data', path, sha256))
+        self.assertEqual(self.handler.requests[-1]['If-None-Match'], self.handler.etag)
+
+        # A file that does not match the checksum is not kept
+        otherPath = os.path.join(self.directory, 'other.data.txt')
+        with self.assertRaises(ValueError):
+            fetchFile(self.url + '/auto-mpg.data', otherPath, '0' * 64)
+        self.assertFalse(os.path.exists(otherPath) or os.path.exists(otherPath + '.part'))
+
+        # A partial file the server keeps refusing is restarted at most retries times
+        with open(otherPath + '.part', 'wb') as file:
+            file.write(self.body[:100])
+        self.handler.rangeNotSatisfiable = True
+        self.handler.requests = []
+        import requests
+        with self.assertRaises(requests.HTTPError):
+            fetchFile(self.url + '/auto-mpg.data', otherPath, retries=2)
+        self.assertEqual(len(self.handler.requests), 3)
+        self.assertFalse(os.path.exists(otherPath + '.part'))
+
+        # Without any mirror there is nothing to download from
+        with mock.patch('autompg3.DATA_URLS', ()), self.assertRaises(RuntimeError):
+            AutoMPGData(os.path.join(self.directory, 'missing.data.txt'), load=False)._get_data()
+
+    # Create test for fetchShards
+    def test_fetchShards(self):
+        '''
+        Description:
+        Tests downloading the shards of a file concurrently.
+
+        Arguments:
+        self.
+
+        Returns:
+        None.'''
+        path = os.path.join(self.directory, 'auto-mpg.data.txt')
+        self.handler.dropConnections = 1
+        fetchShards([self.url + '/shard0', self.url + '/shard1', self.url + '/shard2'], path, hashlib.sha256(self.body).hexdigest())
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), self.body)
+        self.assertEqual(os.listdir(self.directory), ['auto-mpg.data.txt'])
+        self.assertEqual(len(AutoMPGData(path, cache=False)), len(AutoMPGData()))
+
 # Call testing program if not imported
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file